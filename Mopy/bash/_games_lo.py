@@ -35,6 +35,7 @@
 import re
 import time
 from collections import defaultdict
+from itertools import imap
 # Local
 import bass
 import bolt
@@ -117,6 +118,16 @@ def _parse_plugins_txt_(path, mod_infos, _star):
             if is_active_: active.append(modname)
     return active, modnames
 
+def _changed_span(old, new):
+    """Return (start, old stop, new stop) so that replacing old[start:old stop]
+    with new[start:new stop] turns old into new. Plugins are compared by
+    identity, GPath returns the same Path for the same name."""
+    start, common = 0, min(len(old), len(new))
+    while start < common and old[start] is new[start]: start += 1
+    end = 0
+    while end < common - start and old[-1 - end] is new[-1 - end]: end += 1
+    return start, len(old) - end, len(new) - end
+
 class FixInfo(object):
     """Encapsulate info on load order and active lists fixups."""
     def __init__(self):
@@ -203,6 +214,12 @@ def __init__(self, mod_infos, plugins_txt_path):
         self.master_path = mod_infos.masterName # type: bolt.Path
         self.mtime_plugins_txt = 0
         self.size_plugins_txt = 0
+        # Last validated load order: (load order tuple, number of pinned
+        # plugins, index of the first esp) - and active plugins validated
+        # against it: [active tuple, active set, number of espms, number of
+        # esls]. See _fix_load_order, _fix_active_plugins, mods_changed
+        self._valid_lo = self._valid_active = None
+        self._lo_index = None # plugin -> index in the validated load order
 
     def _plugins_txt_modified(self):
         exists = self.plugins_txt_path.exists()
@@ -267,13 +284,16 @@ def set_load_order(self, lord, active, previous_lord=None,
             assert previous_active is not None, \
                 'you must pass info on active when setting load order'
             if previous_lord is not None:
-                prev = set(previous_lord)
-                new = set(lord)
+                # both are free of duplicates, so only where they differ
+                # can plugins be deleted or reordered
+                start, prev_stop, stop = _changed_span(previous_lord, lord)
+                prev = set(previous_lord[start:prev_stop])
+                new = set(lord[start:stop])
                 deleted = prev - new
                 common = prev & new
-                reordered = any(x != y for x, y in
-                                zip((x for x in previous_lord if x in common),
-                                    (x for x in lord if x in common)))
+                reordered = any(x != y for x, y in zip(
+                    (x for x in previous_lord[start:prev_stop] if x in common),
+                    (x for x in lord[start:stop] if x in common)))
                 test_active = self._must_update_active(deleted, reordered)
             else:
                 test_active = True
@@ -400,9 +420,13 @@ def _fix_load_order(self, lord, fix_lo):
         set_load_order() to check if a load order passed in is valid. Needs
         rethinking as save load and active should be an atomic operation -
         leads to hacks (like the _selected parameter).
+        If the plugins and their flags did not change since the last load
+        order was validated, only the part of lord that differs from it is
+        checked - see _lo_still_valid.
         :type lord: list[bolt.Path]
         """
         if fix_lo is None: fix_lo = FixInfo() # discard fix info
+        if self._lo_still_valid(lord): return
         old_lord = lord[:]
         # game's master might be out of place (if using timestamps for load
         # ordering or a manually edited loadorder.txt) so move it up
@@ -451,12 +475,14 @@ def _fix_load_order(self, lord, fix_lo):
         lo_order_changed |= self._order_fixed(lord)
         if lo_order_changed:
             fix_lo.lo_reordered = old_lord, lord
+        self._set_valid_lo(lord)
 
     def _fix_active_plugins(self, acti, lord, on_disc, fix_active):
         # filter plugins not present in modInfos - this will disable
         # corrupted too! Preserve acti order
         quiet = fix_active is None
         if quiet: fix_active = FixInfo() # discard fix info
+        if self._active_still_valid(acti, lord): return False
         # Throw out files that aren't on disk as well as .esu files, which must
         # never be active
         acti_filtered = [x for x in acti if x in self.mod_infos
@@ -492,6 +518,7 @@ def _fix_active_plugins(self, acti, lord, on_disc, fix_active):
         before_reorder = acti # with overflowed plugins removed
         if self._order_fixed(acti):
             fix_active.act_reordered = (before_reorder, acti)
+        self._set_valid_active(acti, lord)
         if fix_active.act_changed():
             if on_disc: # used when getting active and found invalid, fix 'em!
                 # Notify user and backup previous plugins.txt
@@ -506,8 +533,102 @@ def _fix_active_plugins(self, acti, lord, on_disc, fix_active):
     def check_active_limit(self, acti_filtered):
         return set(acti_filtered[self.max_espms:]), set()
 
+    def _is_light(self, mod):
+        """Return True if mod counts against max_esls - see
+        check_active_limit."""
+        return False
+
     def _order_fixed(self, lord): return False
 
+    def _pinned_count(self):
+        """Return the number of plugins at the start of the load order that
+        are put there by _fix_load_order/_order_fixed."""
+        return 1 # the game master
+
+    # INCREMENTAL VALIDATION --------------------------------------------------
+    def mods_changed(self):
+        """Forget the last validated load order and active plugins - call it
+        when plugins are added, removed, renamed or their header flags
+        change, validation depends on those."""
+        self._valid_lo = self._valid_active = self._lo_index = None
+
+    def _set_valid_lo(self, lord):
+        self._valid_lo = (tuple(lord), self._pinned_count(),
+                          self._index_of_first_esp(lord))
+        self._valid_active = self._lo_index = None
+
+    def _lo_still_valid(self, lord):
+        """Check if lord is a valid load order, if the plugins did not change
+        since the last load order was validated, checking only the plugins
+        that lord moved compared to it."""
+        if self._valid_lo is None: return False
+        valid, pinned, first_esp = self._valid_lo
+        if len(lord) != len(valid): return False
+        start, stop, _new_stop = _changed_span(valid, lord)
+        if start == stop: return True
+        if start < pinned: return False
+        old_span, new_span = valid[start:stop], tuple(lord[start:stop])
+        # moving a single plugin rotates the span, else check it's shuffled
+        if not (new_span[0] is old_span[-1] and new_span[1:] == old_span[
+                :-1] or new_span[-1] is old_span[0] and new_span[
+                :-1] == old_span[1:]):
+            new_set = set(new_span)
+            if len(new_set) != len(new_span) or new_set != set(old_span):
+                return False
+        if start < first_esp < stop: # masters must still load first
+            for dex, mod in enumerate(new_span, start):
+                if self.in_master_block(self.mod_infos[mod]) != (
+                        dex < first_esp): return False
+        self._valid_lo = (tuple(lord), pinned, first_esp)
+        if self._valid_active is not None: # still valid if active order is
+            active_set = self._valid_active[1]
+            if [x for x in old_span if x in active_set] != [
+                    x for x in new_span if x in active_set]:
+                self._valid_active = self._lo_index = None
+            elif self._lo_index is not None:
+                for dex, mod in enumerate(new_span, start):
+                    self._lo_index[mod] = dex
+        return True
+
+    def _set_valid_active(self, acti, lord):
+        if self._valid_lo is None or tuple(lord) != self._valid_lo[0]: return
+        num_light = sum(imap(self._is_light, acti))
+        self._valid_active = [tuple(acti), frozenset(acti),
+                              len(acti) - num_light, num_light]
+
+    def _active_still_valid(self, acti, lord):
+        """Check if acti is a valid active plugins list when it only
+        activates or deactivates a plugin compared to the active plugins last
+        validated against the same load order and plugins."""
+        if self._valid_active is None or tuple(lord) != self._valid_lo[0]:
+            return False
+        valid, valid_set, espms, esls = self._valid_active
+        start, old_stop, new_stop = _changed_span(valid, acti)
+        removed, added = valid[start:old_stop], acti[start:new_stop]
+        if len(removed) + len(added) > 1: return False
+        if not removed and not added: return True
+        mod = (removed or added)[0]
+        light = self._is_light(mod) if mod in self.mod_infos else False
+        if removed:
+            if mod == self.master_path and not self.allow_deactivate_master \
+                    or mod in self.must_be_active_if_present: return False
+            self._valid_active = [tuple(acti), valid_set - {mod},
+                                  espms - (not light), esls - light]
+            return True
+        if mod in valid_set or mod not in self.mod_infos or \
+                mod.cext == u'.esu' or (esls >= self.max_esls if light else
+                                        espms >= self.max_espms):
+            return False
+        if self._lo_index is None:
+            self._lo_index = {x: i for i, x in enumerate(self._valid_lo[0])}
+        dex = self._lo_index.get(mod)
+        if dex is None or start and self._lo_index[acti[start - 1]] > dex or \
+                start + 1 < len(acti) and self._lo_index[
+                    acti[start + 1]] < dex: return False
+        self._valid_active = [tuple(acti), valid_set | {mod},
+                              espms + (not light), esls + light]
+        return True
+
     @staticmethod
     def _check_active_order(acti, lord):
         dex_dict = {mod: index for index, mod in enumerate(lord)}
@@ -641,6 +762,7 @@ def _fix_load_order(self, lord, fix_lo):
             bolt.deprint(u'Incomplete load order passed in to set_load_order. '
                 u'Missing: ' + u', '.join(x.s for x in fix_lo.lo_added))
             lord[:] = self.__calculate_mtime_order(mods=lord)
+            self._set_valid_lo(lord)
 
 class TextfileGame(Game):
 
@@ -884,11 +1006,17 @@ def check_active_limit(self, acti_filtered):
         acti_filtered_espm = []
         acti_filtered_esl = []
         for x in acti_filtered:
-            (acti_filtered_esl if self.mod_infos[
-                x].is_esl() else acti_filtered_espm).append(x)
+            (acti_filtered_esl if self._is_light(x) else
+             acti_filtered_espm).append(x)
         return set(acti_filtered_espm[self.max_espms:]) , set(
             acti_filtered_esl[self.max_esls:])
 
+    def _is_light(self, mod): return self.mod_infos[mod].is_esl()
+
+    def _pinned_count(self):
+        return 1 + sum(x in self.mod_infos for x in
+                       self.must_be_active_if_present)
+
     # Asterisk game specific: plugins with fixed load order -------------------
     def _readd_in_lists(self, lo, active):
         # add the plugins that should not be in plugins.txt in the lists,
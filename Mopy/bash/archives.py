@@ -21,12 +21,23 @@
 #  https://github.com/wrye-bash
 #
 # =============================================================================
+import collections
+import errno
 import os
 import re
+import shutil
 import subprocess
+import time
+import zipfile
+from binascii import crc32
+from contextlib import closing
+from functools import partial
+from itertools import imap, izip
 
 import bass
-from bolt import startupinfo, GPath, deprint, walkdir
+from bolt import startupinfo, GPath, deprint, walkdir, imap_parallel, \
+    pool_size
+from env import clear_read_only, transfer_files
 from exception import StateError
 
 exe7z = u'7z.exe' if os.name == u'nt' else u'7z'
@@ -80,6 +91,12 @@ def compress7z(command, outDir, destArchive, srcDir, progress=None):
 
 def extract7z(src_archive, extract_dir, progress=None, readExtensions=None,
               recursive=False, filelist_to_extract=None):
+    if not recursive:
+        extracted = _extract_native(src_archive, extract_dir, progress,
+                                    filelist_to_extract)
+        if extracted is not None:
+            return [x for x in imap(GPath, extracted) if
+                    readExtensions and x.cext in readExtensions]
     command = _extract_command(src_archive, extract_dir, recursive,
                                filelist_to_extract)
     proc = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=1,
@@ -108,6 +125,87 @@ def extract7z(src_archive, extract_dir, progress=None, readExtensions=None,
                          % (source_archive, str(returncode), errorLine))
     return subArchives
 
+def _extract_native(src_archive, extract_dir, progress, filelist_to_extract):
+    """Extract the archive in process if we can read it - return the
+    extracted paths or None if 7z must be used instead."""
+    reader = _native_reader(src_archive)
+    if reader is None or not reader.can_extract: return None
+    to_extract = None
+    if filelist_to_extract:
+        with open(filelist_to_extract, 'rb') as ins:
+            to_extract = set(line.strip().lower() for line in
+                             ins.read().decode('utf8').splitlines())
+        to_extract.discard(u'')
+        if u'*' in to_extract: to_extract = None
+        elif any((u'*' in x or u'?' in x) for x in to_extract):
+            return None # leave wildcards to 7z
+    try:
+        with reader:
+            return reader.extract(extract_dir.s, to_extract, progress)
+    except reader.fallback_errors:
+        deprint(u'Extracting %s with 7z' % src_archive, traceback=True)
+        return None
+
+def extract_to_destinations(src_archive, member_dests, progress=None,
+                            parent=None):
+    """Extract the given members of src_archive straight to their final
+    paths, skipping the temp dir, and verify the crc of each while writing
+    it. Return the mtimes of the written files, in order, or None if the
+    archive can't be streamed (no native reader, solid archive, unsupported
+    compression or encryption) - extract it to a temp dir with extract7z
+    instead. All members are checked before anything is written, and each
+    is written next to its destination, which is only replaced once all
+    members were extracted and verified - so a corrupt archive leaves Data
+    untouched. If a file can't be written there (say Data needs elevated
+    permissions) None is returned too, otherwise errors raised while
+    writing are not fallen back from. The verified files are moved in place
+    with env.transfer_files, which retries failed moves through the shell.
+
+    :param member_dests: list of (archive member, destination Path, crc)
+        tuples - members are matched case insensitively."""
+    reader = _native_reader(src_archive)
+    if reader is None or not reader.can_extract: return None
+    writing = False
+    try:
+        with reader:
+            if reader.is_solid(): return None
+            ci_members = dict((path.lower(), path) for path, _s, _c, is_dir
+                              in reader.iter_entries() if not is_dir)
+            if any(m.lower() not in ci_members for m, _d, _c in member_dests):
+                return None
+            members = [ci_members[m.lower()] for m, _d, _c in member_dests]
+            if not all(imap(reader.can_stream, members)): return None
+            writing = True
+            return _stream_members(reader, members, member_dests,
+                                   src_archive, progress, parent)
+    except reader.fallback_errors:
+        if writing: raise
+        deprint(u'Extracting %s with 7z' % src_archive, traceback=True)
+        return None
+
+def _stream_members(reader, members, member_dests, src_archive, progress,
+                    parent):
+    tmp_paths = []
+    try:
+        for dex, (member, (_m, dest, crc)) in enumerate(
+                izip(members, member_dests)):
+            if progress:
+                progress(dex, src_archive.stail + u'\n' + _(
+                    u'Extracting files...') + u'\n' + member)
+            tmp_paths.append(dest + u'.tmp')
+            try:
+                reader.stream_member(member, tmp_paths[-1].s, crc)
+            except EnvironmentError:
+                deprint(u'Failed to write %s, extracting %s to the temp dir'
+                        % (tmp_paths[-1], src_archive), traceback=True)
+                return None
+        # keeps the mtimes - failed moves are retried through the shell
+        return transfer_files(tmp_paths, [d for _m, d, _c in member_dests],
+                              move=True, parent=parent)
+    finally:
+        for tmp_path in tmp_paths: # don't leave garbage in Data
+            if os.path.exists(tmp_path.s): os.remove(tmp_path.s)
+
 def wrapPopenOut(command, wrapper, errorMsg):
     proc = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=-1,
                             stdin=subprocess.PIPE, startupinfo=startupinfo)
@@ -164,18 +262,213 @@ def _extract_command(archivePath, outDirPath, recursive, filelist_to_extract):
     if filelist_to_extract: command += (u' @"%s"' % filelist_to_extract)
     return command
 
-def list_archive(archive_path, parse_archive_line, __reList=reListArchive):
-    """Client is responsible for closing the file ! See uses for
-    _parse_archive_line examples."""
+# Native readers ---------------------------------------------------------------
+class _NativeReader(object):
+    """Reads an archive in process instead of spawning 7z. Readers list the
+    archive entries with their CRCs straight from the archive directory and
+    extract members by streaming them to their destination. If a reader
+    raises one of its fallback_errors (unsupported compression methods,
+    encryption etc) we fall back to 7z."""
+    fallback_errors = ()
+    can_extract = True
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_value, exc_traceback): pass
+
+    def is_solid(self): return False
+
+    def iter_entries(self):
+        """Yield (path, size, crc, is_dir) tuples for the archive entries -
+        path is unicode, using os.sep as separator."""
+        raise NotImplementedError
+
+    def open_member(self, member):
+        """Return a file like object to read the member with the given path,
+        as yielded by iter_entries - the reader should verify the crc."""
+        raise NotImplementedError
+
+    def member_mtime(self, member):
+        """Return the modification time of member, or None if unknown."""
+        return None
+
+    def can_stream(self, member):
+        """Return False if member can't be read in process - for instance
+        if it's encrypted or uses an unsupported compression method."""
+        return True
+
+    def stream_member(self, member, dest, expected_crc):
+        """Write member to the dest path, overwriting it, and return its
+        mtime. Raise a StateError if the written data does not match the
+        expected crc."""
+        dest_dir = os.path.dirname(dest)
+        if not os.path.isdir(dest_dir):
+            try:
+                os.makedirs(dest_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST: raise
+        if os.path.lexists(dest):
+            clear_read_only(dest)
+            os.remove(dest)
+        crc = 0
+        try:
+            with self.open_member(member) as ins:
+                with open(dest, 'wb') as out:
+                    for chunk in iter(partial(ins.read, _chunk_size), b''):
+                        crc = crc32(chunk, crc)
+                        out.write(chunk)
+            if crc & 0xFFFFFFFF != expected_crc:
+                raise StateError(u'%s: CRC mismatch for %s (%08X, expected '
+                    u'%08X)' % (self.archive_path, member, crc & 0xFFFFFFFF,
+                                expected_crc))
+        except:
+            if os.path.exists(dest): os.remove(dest) # don't leave garbage
+            raise
+        mtime = self.member_mtime(member)
+        if mtime is not None:
+            os.utime(dest, (mtime, mtime)) # as if extracted by 7z
+        return int(os.path.getmtime(dest))
+
+    def list_entries(self):
+        """Return the entries in the format of 7z l -slt output (see
+        list_archive)."""
+        listing = [(u'Solid', u'+' if self.is_solid() else u'-')]
+        for path, size, crc, is_dir in self.iter_entries():
+            listing.extend(((u'Path', path.encode('utf8')),
+                            (u'Size', str(size)), (u'CRC', u'%08X' % crc),
+                            (u'Attributes', u'D' if is_dir else u'A'),
+                            (u'Method', u'')))
+        return listing
+
+    def extract(self, extract_dir, to_extract=None, progress=None):
+        """Extract the members whose (lowercase) paths are in to_extract, or
+        all, to extract_dir and return the list of the relative paths of the
+        extracted files."""
+        extracted = []
+        for path, size, crc, is_dir in self.iter_entries():
+            if is_dir or (to_extract is not None and
+                          path.lower() not in to_extract):
+                continue
+            # never write outside extract_dir
+            if os.path.isabs(path) or os.pardir in path.split(os.sep):
+                deprint(u'%s: skipping unsafe path %s' % (self.archive_path,
+                                                         path))
+                continue
+            dest = os.path.join(extract_dir, path)
+            dest_dir = os.path.dirname(dest)
+            if not os.path.isdir(dest_dir): os.makedirs(dest_dir)
+            with self.open_member(path) as ins:
+                with open(dest, 'wb') as out:
+                    shutil.copyfileobj(ins, out, _chunk_size)
+            if progress:
+                progress(len(extracted), self.archive_path.stail + u'\n' + _(
+                    u'Extracting files...') + u'\n' + path)
+            extracted.append(path)
+        return extracted
+
+_chunk_size = 1024 * 1024
+
+class _ZipReader(_NativeReader):
+    fallback_errors = (zipfile.BadZipfile, zipfile.LargeZipFile,
+                       NotImplementedError, RuntimeError) # encrypted
+
+    def __init__(self, archive_path):
+        super(_ZipReader, self).__init__(archive_path)
+        self._zip = None
+        self._path_info = collections.OrderedDict() # keep archive order
+
+    def __enter__(self):
+        self._zip = zipfile.ZipFile(self.archive_path.s)
+        for info in self._zip.infolist():
+            path = info.filename
+            if not isinstance(path, unicode): # no utf-8 flag
+                path = path.decode('cp437')
+            self._path_info[path.replace(u'/', os.sep).rstrip(os.sep)] = info
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self._zip.close()
+
+    def iter_entries(self):
+        for path, info in self._path_info.iteritems():
+            yield path, info.file_size, info.CRC, \
+                  info.filename.endswith(u'/') or info.external_attr & 0x10
+
+    def open_member(self, member):
+        return closing(self._zip.open(self._path_info[member]))
+
+    def can_stream(self, member):
+        info = self._path_info[member]
+        return info.compress_type in (zipfile.ZIP_STORED,
+            zipfile.ZIP_DEFLATED) and not info.flag_bits & 0x1 # encrypted
+
+    def member_mtime(self, member):
+        try:
+            return time.mktime(self._path_info[member].date_time + (0, 0, -1))
+        except (OverflowError, ValueError):
+            return None
+
+_native_readers = {u'.zip': _ZipReader}
+
+def _native_reader(archive_path):
+    """Return a reader for archive_path if we can read it in process, else
+    None. Use it as a context manager."""
+    reader_type = _native_readers.get(archive_path.cext)
+    return reader_type and reader_type(archive_path)
+
+# Listing ---------------------------------------------------------------------
+def _archive_listing(archive_path, __reList=reListArchive):
+    """Return the (key, value) pairs of the 7z l -slt output for
+    archive_path, read in process if possible."""
+    reader = _native_reader(archive_path)
+    if reader is not None:
+        try:
+            with reader:
+                return reader.list_entries()
+        except reader.fallback_errors:
+            deprint(u'Listing %s with 7z' % archive_path, traceback=True)
     command = u'"%s" l -slt -sccUTF-8 "%s"' % (exe7z, archive_path.s)
     ins, err = subprocess.Popen(command, stdout=subprocess.PIPE,
                                 stderr=subprocess.STDOUT,
                                 stdin=subprocess.PIPE,
                                 startupinfo=startupinfo).communicate()
-    for line in ins.splitlines(True): # keepends=True
-        maList = __reList.match(line)
-        if maList:
-            parse_archive_line(*(maList.groups()))
+    return [maList.groups() for maList in imap(
+        __reList.match, ins.splitlines(True)) if maList] # keepends=True
+
+def _safe_archive_listing(archive_path):
+    """Return the path the archive was listed as and its listing, or the
+    exception raised while listing it - runs on a worker thread."""
+    try:
+        if archive_path.cext in _native_readers: # no need to rename it
+            return archive_path, _archive_listing(archive_path)
+        with archive_path.unicodeSafe() as temp_arch:
+            return temp_arch, _archive_listing(temp_arch)
+    except Exception as e:
+        deprint(u'Failed to list %s' % archive_path, traceback=True)
+        return archive_path, e
+
+def list_archives(archive_paths, max_workers=None):
+    """Yield (listed path, listing) tuples for the archives in archive_paths,
+    in order. Listing an archive is dominated by spawning 7z, so up to
+    max_workers 7z processes are run at once - by default two per cpu, as
+    they mostly wait. The listed path is the temporary path for archives
+    whose names are not ascii, the listing is the exception raised if listing
+    the archive failed. Pass the listings to list_archive to parse them."""
+    return imap_parallel(_safe_archive_listing, archive_paths,
+                         max_workers or 2 * pool_size())
+
+def list_archive(archive_path, parse_archive_line, archive_listing=None):
+    """Client is responsible for closing the file ! See uses for
+    _parse_archive_line examples. If archive_listing is given (see
+    list_archives) it is parsed instead of listing archive_path."""
+    if archive_listing is None:
+        archive_listing = _archive_listing(archive_path)
+    elif isinstance(archive_listing, Exception):
+        raise archive_listing
+    for key, value in archive_listing:
+        parse_archive_line(key, value)
 
 def fix_png(png_path):
     """Runs pngcrush on the specified PNG to remove invalid iCCP sRGB
@@ -2015,7 +2015,7 @@ def SetFile(self,fileName='SAME'):
         if not self.saveInfo:
             self.picture.SetBitmap(None)
         else:
-            width,height,data = self.saveInfo.header.image
+            width,height,data = self.saveInfo.get_thumbnail()
             image = Image.GetImage(data, height, width)
             self.picture.SetBitmap(image.ConvertToBitmap())
         #--Info Box
@@ -4023,6 +4023,8 @@ def SaveSettings(self, destroy=False):
             except:
                 deprint(u'An error occurred while saving settings of '
                         u'the %s panel:' % tab_name, traceback=True)
+        bosh.bsaInfos.save_assets_cache()
+        bosh.saveInfos.save_header_cache()
         settings.save()
 
     @staticmethod
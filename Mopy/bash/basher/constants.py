@@ -279,6 +279,9 @@
     'bash.installers.autoRefreshBethsoft': False,
     'bash.installers.autoRefreshProjects': True,
     'bash.installers.removeEmptyDirs':True,
+    'bash.installers.hardLinkProjects':False,
+    'bash.installers.contentStore':False,
+    'bash.installers.projectsVerifyInterval':600,
     'bash.installers.skipScreenshots':False,
     'bash.installers.skipScriptSources':False,
     'bash.installers.skipImages':False,
@@ -28,20 +28,25 @@
 from . import Installers_Link
 from .dialogs import CreateNewProject
 from .. import bass, bosh, balt, bush, load_order
+from ..bolt import round_size
 from ..balt import BoolLink, AppendableLink, ItemLink, ListBoxes, \
     EnabledLink
 
 __all__ = ['Installers_SortActive', 'Installers_SortProjects',
            'Installers_Refresh', 'Installers_AddMarker',
            'Installers_CreateNewProject', 'Installers_MonitorInstall',
-           'Installers_ListPackages', 'Installers_AnnealAll',
+           'Installers_ListPackages', 'Installers_ConflictsOverview',
+           'Installers_AnnealAll',
            'Installers_UninstallAllPackages',
            'Installers_UninstallAllUnknownFiles', 'Installers_AvoidOnStart',
            'Installers_Enabled', 'Installers_AutoAnneal',
            'Installers_AutoWizard', 'Installers_AutoRefreshProjects',
+           'Installers_ProjectsVerifyInterval',
            'Installers_AutoRefreshBethsoft',
            'Installers_AutoApplyEmbeddedBCFs', 'Installers_BsaRedirection',
-           'Installers_RemoveEmptyDirs',
+           'Installers_RemoveEmptyDirs', 'Installers_HardLinkProjects',
+           'Installers_ContentStore', 'Installers_DuplicatesReport',
+           'Installers_PruneContentStore',
            'Installers_ConflictsReportShowsInactive',
            'Installers_ConflictsReportShowsLower',
            'Installers_ConflictsReportShowBSAConflicts',
@@ -180,6 +185,43 @@ def Execute(self):
         balt.copyToClipboard(package_list)
         self._showLog(package_list, title=_(u'BAIN Packages'), fixedFont=False)
 
+class Installers_ConflictsOverview(Installers_Link):
+    """Show the loose file conflicts between all packages."""
+    _text = _(u'Conflicts Overview...')
+    _help = _(u'Displays how many files each package overrides in every '
+              u'other package.')
+
+    @balt.conversation
+    def Execute(self):
+        show_inactive = bass.settings[
+            'bash.installers.conflictsReport.showInactive']
+        with balt.BusyCursor():
+            report = self.idata.getConflictsOverview(show_inactive)
+        self._showLog(report, title=_(u'Conflicts Overview'), fixedFont=False)
+
+class Installers_DuplicatesReport(Installers_Link):
+    """Show the files shipped by more than one package."""
+    _text = _(u'Duplicate Files Report...')
+    _help = _(u'Displays the files that are shipped by more than one package '
+              u'and how much space they take, and the content store usage.')
+
+    @balt.conversation
+    def Execute(self):
+        with balt.BusyCursor(): report = self.idata.duplicates_report()
+        self._showLog(report, title=_(u'Duplicate Files'), fixedFont=False)
+
+class Installers_PruneContentStore(Installers_Link):
+    """Delete the stored files that are no longer installed."""
+    _text = _(u'Prune Content Store')
+    _help = _(u'Deletes the files in the content store that are no longer '
+              u'installed in the Data folder.')
+
+    @balt.conversation
+    def Execute(self):
+        with balt.BusyCursor(): pruned = self.idata.content_store.prune()
+        self.idata.content_store.save()
+        self._showOk(_(u'Freed %s.') % round_size(pruned))
+
 class Installers_AnnealAll(Installers_Link):
     """Anneal all packages."""
     _text = _(u'Anneal All')
@@ -293,6 +335,24 @@ class Installers_AutoRefreshProjects(BoolLink):
     _help = _(u'Toggles whether or not Wrye Bash will automatically detect '
               u'changes to projects in the installers directory.')
 
+class Installers_ProjectsVerifyInterval(ItemLink):
+    """Set how often all the files of the projects are checked."""
+    _text = _(u'Projects Verification Interval...')
+    _help = _(u'Sets how often Wrye Bash checks every file of the projects '
+              u'for changes. In between, only folders whose contents were '
+              u'added, removed or renamed are checked, so files edited in '
+              u'place may go unnoticed for that long.')
+
+    def Execute(self):
+        minutes = self._askNumber(
+            _(u'Check every file of the projects every how many minutes?')
+            + u'\n' + _(u"Enter '0' to always check every file."),
+            prompt=_(u'Minutes'), title=_(u'Projects Verification Interval'),
+            value=bass.settings['bash.installers.projectsVerifyInterval']
+                  // 60, min=0, max=1440)
+        if minutes is None: return
+        bass.settings['bash.installers.projectsVerifyInterval'] = minutes * 60
+
 class Installers_AutoApplyEmbeddedBCFs(ItemLink):
     """Automatically apply Embedded BCFs to archives that have one."""
     _text = _(u'Auto-Apply Embedded BCFs')
@@ -431,6 +491,26 @@ class Installers_RemoveEmptyDirs(BoolLink):
               u'directories when scanning the Data folder.')
     key = 'bash.installers.removeEmptyDirs'
 
+class Installers_HardLinkProjects(BoolLink):
+    """Toggles option to hard link project files into the Data folder."""
+    _text = _(u'Hard Link Projects')
+    _help = _(u'Toggles whether or not Wrye Bash will install files from '
+              u'projects as hard links if possible, instead of copying them. '
+              u'Note that editing such files in the Data folder will also '
+              u'edit them in the project.')
+    key = 'bash.installers.hardLinkProjects'
+
+class Installers_ContentStore(BoolLink):
+    """Toggles option to keep installed files in the content store."""
+    _text = _(u'Use Content Store')
+    _help = _(u'Toggles whether or not Wrye Bash will keep hard links to the '
+              u'files it installs, so identical files are linked into the '
+              u'Data folder instead of being extracted again. Does not work '
+              u'if the Data and Installers folders are on different drives. '
+              u'Note that editing such files in the Data folder in place will '
+              u'also edit the other installed copies of them.')
+    key = 'bash.installers.contentStore'
+
 # Sorting Links
 class _Installer_Sort(ItemLink):
     def Execute(self):
@@ -250,6 +250,9 @@ def InitInstallerLinks():
     InstallersList.mainMenu.append(Installers_MonitorInstall())
     InstallersList.mainMenu.append(SeparatorLink())
     InstallersList.mainMenu.append(Installers_ListPackages())
+    InstallersList.mainMenu.append(Installers_ConflictsOverview())
+    InstallersList.mainMenu.append(Installers_DuplicatesReport())
+    InstallersList.mainMenu.append(Installers_PruneContentStore())
     InstallersList.mainMenu.append(SeparatorLink())
     InstallersList.mainMenu.append(Installers_AnnealAll())
     InstallersList.mainMenu.append(Files_Unhide('installer'))
@@ -266,9 +269,12 @@ def InitInstallerLinks():
     if bEnableWizard:
         InstallersList.mainMenu.append(Installers_AutoWizard())
     InstallersList.mainMenu.append(Installers_AutoRefreshProjects())
+    InstallersList.mainMenu.append(Installers_ProjectsVerifyInterval())
     InstallersList.mainMenu.append(Installers_AutoRefreshBethsoft())
     InstallersList.mainMenu.append(Installers_BsaRedirection())
     InstallersList.mainMenu.append(Installers_RemoveEmptyDirs())
+    InstallersList.mainMenu.append(Installers_HardLinkProjects())
+    InstallersList.mainMenu.append(Installers_ContentStore())
     InstallersList.mainMenu.append(Installers_ConflictsReportShowsInactive())
     InstallersList.mainMenu.append(Installers_ConflictsReportShowsLower())
     InstallersList.mainMenu.append(
@@ -654,6 +660,7 @@ def InitSaveLinks():
     SaveList.itemMenu.append(Save_LoadMasters())
     SaveList.itemMenu.append(File_ListMasters())
     SaveList.itemMenu.append(Save_DiffMasters())
+    SaveList.itemMenu.append(Save_RemapMasters())
     if bush.game.ess.canEditMore:
         SaveList.itemMenu.append(Save_Stats())
     SaveList.itemMenu.append(Save_StatObse())
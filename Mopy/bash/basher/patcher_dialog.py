@@ -192,6 +192,7 @@ def PatchExecute(self): # TODO(ut): needs more work to reduce P/C differences to
             #--Do it
             log = bolt.LogFile(StringIO.StringIO())
             patchers = [patcher for patcher in self.patchers if patcher.isEnabled]
+            bolt.StringTable.open_cache() # plugins are loaded once per patcher
             patchFile = CBash_PatchFile(patch_name, patchers) if self.doCBash \
                    else PatchFile(self.patchInfo, patchers)
             patchFile.init_patchers_data(SubProgress(progress, 0, 0.1)) #try to speed this up!
@@ -295,6 +296,7 @@ def PatchExecute(self): # TODO(ut): needs more work to reduce P/C differences to
                 except:
                     bolt.deprint(u'Failed to close CBash collection',
                                  traceback=True)
+            bolt.StringTable.close_cache() # strings of the localized plugins
             if progress: progress.Destroy()
 
     def _save_pbash(self, patchFile, patch_name):
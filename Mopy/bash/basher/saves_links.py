@@ -44,7 +44,7 @@
            'Save_EditCreatedEnchantmentCosts', 'Save_ImportFace',
            'Save_EditCreated', 'Save_ReweighPotions', 'Save_UpdateNPCLevels',
            'Save_ExportScreenshot', 'Save_Unbloat', 'Save_RepairAbomb',
-           'Save_RepairHair', 'Save_StatPluggy']
+           'Save_RepairHair', 'Save_StatPluggy', 'Save_RemapMasters']
 
 #------------------------------------------------------------------------------
 # Saves Links -----------------------------------------------------------------
@@ -348,6 +348,47 @@ def Execute(self):
                 message += u'\n* '.join(x.s for x in load_order.get_ordered(added))
             self._showWryeLog(message, title=_(u'Diff Masters'))
 
+#------------------------------------------------------------------------------
+class Save_RemapMasters(ItemLink):
+    """Renames a master in the selected saves and their cosaves."""
+    _text = _(u'Remap Masters...')
+    _help = _(u'Replace a master of the selected saves with another plugin, '
+              u'for instance after renaming it')
+
+    def Execute(self):
+        save_masters = set()
+        for save_info in self.iselected_infos():
+            save_masters.update(save_info.header.masters)
+        # default to a master that is not in the load order anymore
+        missing = sorted(x for x in save_masters if x not in bosh.modInfos)
+        old_name = self._askText(_(u'Plugin to replace:'),
+            title=self._text, default=(missing or [u''])[0])
+        if not old_name: return
+        old_name = GPath(old_name)
+        if old_name not in save_masters:
+            self._showError(_(u'%s is not a master of the selected saves.')
+                            % old_name.s)
+            return
+        new_name = self._askText(_(u'Replace %s with:') % old_name.s,
+                                 title=self._text, default=old_name.s)
+        if not new_name or GPath(new_name) == old_name: return
+        with balt.Progress(_(u'Remapping Masters')) as progress:
+            remapped, skipped, errors, elapsed = bosh.saveInfos.remap_masters(
+                {old_name: GPath(new_name)}, self.selected, progress)
+        message = _(u'Remapped %d saves in %.1f seconds.') % (len(remapped),
+                                                              elapsed)
+        if skipped:
+            message += u'\n\n=== ' + _(
+                u'Saves whose masters cannot be edited:') + u'\n* '
+            message += u'\n* '.join(x.s for x in skipped)
+        if errors:
+            message += u'\n\n=== ' + _(u'Failed to remap:') + u'\n* '
+            message += u'\n* '.join(u'%s: %s' % (x.s, errors[x]) for x in
+                                     sorted(errors))
+        bosh.saveInfos.refresh()
+        self.window.RefreshUI(redraw=remapped)
+        self._showWryeLog(message)
+
 #------------------------------------------------------------------------------
 class Save_Rename(UIList_Rename):
     """Renames Save File."""
@@ -895,10 +936,12 @@ def Execute(self):
                 mapToOrdered = parsers.MasterMap(saveFile.masters, ordered)
                 releveledCount = 0
                 #--Loop over change records
-                for recNum in xrange(len(records)):
-                    (recId,recType,recFlags,version,data) = records[recNum]
+                for recNum, (recId, recType, recFlags, version, _siz) in \
+                        enumerate(records.headers()):
+                    if recType != 35 or recId == 7: continue
                     orderedRecId = mapToOrdered(recId,None)
-                    if recType != 35 or recId == 7 or orderedRecId not in npc_info: continue
+                    if orderedRecId not in npc_info: continue
+                    data = records[recNum][4]
                     (eid,level,calcMin,calcMax,pcLevelOffset) = npc_info[orderedRecId]
                     npc = bosh._saves.SreNPC(recFlags, data)
                     acbs = npc.acbs
@@ -32,6 +32,7 @@
 import csv
 import datetime
 import errno
+import multiprocessing
 import os
 import re
 import shutil
@@ -44,7 +45,8 @@
 import traceback
 from binascii import crc32
 from functools import partial
-from itertools import chain
+from itertools import chain, islice, izip
+from multiprocessing.pool import ThreadPool
 # Internal
 import chardet
 import exception
@@ -52,6 +54,7 @@
 # structure aliases, mainly introduced to reduce uses of 'pack' and 'unpack'
 struct_pack = struct.pack
 struct_unpack = struct.unpack
+struct_unpack_from = struct.unpack_from
 
 #-- To make commands executed with Popen hidden
 startupinfo = None
@@ -67,6 +70,12 @@
     _walk = walkdir = os.walk
     scandir = None
 
+# decompress whole LZ4 blocks natively - see lz4_decompress_block
+try:
+    from lz4 import block as lz4_block
+except ImportError:
+    lz4_block = None
+
 # Unicode ---------------------------------------------------------------------
 #--decode unicode strings
 #  This is only useful when reading fields from mods, as the encoding is not
@@ -1459,6 +1468,97 @@ def unpack_string(ins, string_len):
 def unpack_many(ins, fmt):
     return struct_unpack(fmt, ins.read(struct.calcsize(fmt)))
 
+def lz4_decompress_block(data, uncompressed_size, stop_at=None):
+    """Decompress a raw LZ4 block (no frame header) that decompresses to
+    uncompressed_size bytes. If stop_at is given stop once at least stop_at
+    bytes are decompressed - data may then be just the start of the block
+    and fewer bytes are returned if it runs out. Raises ValueError if data
+    is corrupt. See https://github.com/lz4/lz4/blob/dev/doc/lz4_Block_format.md
+    """
+    if stop_at is None and lz4_block is not None:
+        try:
+            return lz4_block.decompress(data,
+                                        uncompressed_size=uncompressed_size)
+        except lz4_block.LZ4BlockError as e:
+            raise ValueError(u'LZ4 error: %s' % e)
+    decoder = Lz4BlockDecoder(uncompressed_size)
+    decoder.feed(data)
+    decoder.decode(stop_at)
+    if stop_at is None and len(decoder.out) != uncompressed_size:
+        raise ValueError(u'LZ4 block decompressed to %u bytes, expected %u' % (
+            len(decoder.out), uncompressed_size))
+    return str(decoder.out)
+
+class Lz4BlockDecoder(object):
+    """Decompress a raw LZ4 block a piece at a time - feed it the compressed
+    data as it is read and decode as far as needed, decoding resumes where
+    it stopped. The output so far is in out (a bytearray)."""
+    __slots__ = ('uncompressed_size', 'out', '_src', '_pos')
+
+    def __init__(self, uncompressed_size):
+        self.uncompressed_size = uncompressed_size
+        self.out, self._src, self._pos = bytearray(), bytearray(), 0
+
+    def feed(self, data):
+        self._src += data
+
+    def decode(self, stop_at=None):
+        """Decode the data fed so far until at least stop_at bytes (all of
+        the block if None) are decompressed, or until the data runs out -
+        sequences cut short stay undecoded until more data is fed. Returns
+        the number of bytes decompressed. Raises ValueError if the data is
+        corrupt."""
+        src, out, pos = self._src, self.out, self._pos
+        src_end = len(src)
+        out_end = self.uncompressed_size if stop_at is None else min(
+            stop_at, self.uncompressed_size)
+        while pos < src_end and len(out) < out_end:
+            seq_pos, seq_out = pos, len(out)
+            try:
+                token = src[pos]
+                pos += 1
+                #--Literals, their length continues while the bytes are 255
+                length = token >> 4
+                if length == 15:
+                    while src[pos] == 255:
+                        length += 255
+                        pos += 1
+                    length += src[pos]
+                    pos += 1
+                out += src[pos:pos + length]
+                pos += length
+                if pos >= src_end:
+                    # the last sequence has no match - anything else means
+                    # the data ended in the middle of this one
+                    if pos == src_end and len(out) == self.uncompressed_size:
+                        break
+                    raise IndexError
+                #--Match, copied from offset bytes back in the output
+                offset = src[pos] | src[pos + 1] << 8
+                pos += 2
+                if not 0 < offset <= len(out):
+                    raise ValueError(
+                        u'LZ4 match offset %d out of bounds' % offset)
+                length = token & 15
+                if length == 15:
+                    while src[pos] == 255:
+                        length += 255
+                        pos += 1
+                    length += src[pos]
+                    pos += 1
+            except IndexError:
+                pos = seq_pos
+                del out[seq_out:]
+                break
+            length += 4
+            start = len(out) - offset
+            if length <= offset:
+                out += out[start:start + length]
+            else: # overlapping match - repeat the last offset bytes
+                out += (out[start:] * (length // offset + 1))[:length]
+        self._pos = pos
+        return len(out)
+
 #------------------------------------------------------------------------------
 class TableColumn(object):
     """Table accessor that presents table column as a dictionary."""
@@ -1827,6 +1927,90 @@ def __call__(self,state,message=u''):
         self.parent(self.baseFrom+self.scale*state/self.full,message)
         self.state = state
 
+#------------------------------------------------------------------------------
+def pool_size(max_workers=None):
+    """Return the number of workers a pool should use - max_workers if given
+    else the number of CPUs."""
+    if max_workers: return max_workers
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def imap_parallel(func, iterable, max_workers=None):
+    """Yield func(item) for each item in iterable, in order, running up to
+    max_workers calls at once on a thread pool. Runs serially if there are
+    less than two items or workers. If the generator is closed early (for
+    instance on CancelError) the pool is terminated.
+    :type iterable: collections.Iterable"""
+    items = list(iterable)
+    workers = min(pool_size(max_workers), len(items))
+    if workers < 2:
+        for item in items:
+            yield func(item)
+        return
+    pool = ThreadPool(workers)
+    try:
+        for result in pool.imap(func, items):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _file_crc(abs_path):
+    """Return the crc of the file at abs_path or the error raised reading
+    it - runs on a worker thread, see calc_file_crcs."""
+    crc = 0
+    try:
+        with open(abs_path, 'rb') as ins:
+            for block in iter(partial(ins.read, 2097152), ''):
+                crc = crc32(block, crc) # 2MB at a time, probably ok
+    except (IOError, OSError) as e:
+        return e
+    return crc & 0xFFFFFFFF
+
+def calc_file_crcs(abs_paths, progress=None, progress_msg=u'',
+                   max_workers=None):
+    """Return a dict mapping the (unicode) absolute paths in abs_paths to
+    the crcs of the files, calculated on a thread pool - reading the files
+    dominates so by default two per cpu are read at once. Files that are
+    hard links to the same data (same device and inode, where the OS
+    reports inodes) with the same size and mtime are only read once. Files
+    that can't be read are logged and left out of the result. Progress is
+    reported in bytes, along with the overall throughput."""
+    #--Plan: stat everything upfront and drop duplicates
+    jobs, dupes, sizes, seen = [], collections.defaultdict(list), {}, {}
+    for abs_path in set(abs_paths):
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            st = None # let _file_crc report it
+        key = st and st.st_ino and (st.st_dev, st.st_ino, st.st_size,
+                                    int(st.st_mtime))
+        if key and key in seen:
+            dupes[seen[key]].append(abs_path)
+            continue
+        if key: seen[key] = abs_path
+        jobs.append(abs_path)
+        sizes[abs_path] = st.st_size if st else 0
+    #--Hash
+    if progress: # each file counts for at least 1
+        progress.setFull(sum(sizes.itervalues()) + len(jobs))
+    crcs, done, start = {}, 0, time.time()
+    for abs_path, crc in zip(jobs, imap_parallel(
+            _file_crc, jobs, max_workers or 2 * pool_size())):
+        if progress:
+            done += sizes[abs_path] + 1
+            elapsed = time.time() - start
+            progress(done, u'%s (%.1f MB/s)\n%s' % (progress_msg, done / (
+                1048576.0 * elapsed) if elapsed else 0.0, abs_path))
+        if isinstance(crc, EnvironmentError):
+            deprint(u'Failed to calculate crc for %s: %r' % (abs_path, crc))
+            continue
+        crcs[abs_path] = crc
+        for dupe in dupes.get(abs_path, ()): crcs[dupe] = crc
+    return crcs
+
 #------------------------------------------------------------------------------
 def readCString(ins, file_path):
     """Read null terminated string, dropping the final null byte."""
@@ -1839,6 +2023,11 @@ def readCString(ins, file_path):
                                   u'Reached end of file while expecting null')
     return ''.join(byte_list)
 
+# Decoded strings files, shared by all StringTable instances while a batch
+# of plugins is being loaded, see StringTable.open_cache:
+# (path, fallback encoding) -> ((size, mtime), {string id: string})
+_string_tables = None
+
 class StringTable(dict):
     """For reading .STRINGS, .DLSTRINGS, .ILSTRINGS files."""
     encodings = {
@@ -1861,61 +2050,106 @@ def load(self, modFilePath, lang=u'English', progress=Progress()):
             self.loadFile(file,SubProgress(progress,i,i+1))
 
     def loadFile(self, path, progress, lang=u'english'):
-        formatted = path.cext != u'.strings'
+        """Add the strings of the strings file at path. While a cache is
+        open the decoded strings are kept, so loading the same file again -
+        say for each patcher loading a localized plugin - only stats it."""
         backupEncoding = self.encodings.get(lang.lower(), 'cp1252')
         try:
-            with open(path.s, 'rb') as ins:
-                insSeek = ins.seek
-                insTell = ins.tell
-
-                insSeek(0,os.SEEK_END)
-                eof = insTell()
-                insSeek(0)
-                if eof < 8:
-                    deprint(u"Warning: Strings file '%s' file size (%d) is "
-                            u"less than 8 bytes.  8 bytes are the minimum "
-                            u"required by the expected format, assuming the "
-                            u"Strings file is empty." % (path, eof))
-                    return
-
-                numIds,dataSize = unpack_many(ins, '=2I')
-                progress.setFull(max(numIds,1))
-                stringsStart = 8 + (numIds*8)
-                if stringsStart != eof-dataSize:
-                    deprint(u"Warning: Strings file '%s' dataSize element "
-                            u"(%d) results in a string start location of %d, "
-                            u"but the expected location is %d"
-                            % (path, dataSize, eof-dataSize, stringsStart))
-
-                id_ = -1
-                offset = -1
-                for x in xrange(numIds):
-                    try:
-                        progress(x)
-                        id_,offset = unpack_many(ins, '=2I')
-                        pos = insTell()
-                        insSeek(stringsStart+offset)
-                        if formatted:
-                            value = unpack_str32(ins) # TODO(ut): unpack_str32_null
-                            # seems needed, strings are null terminated
-                            value = cstrip(value)
-                        else:
-                            value = readCString(ins, path) #drops the null byte
-                        try:
-                            value = unicode(value,'utf-8')
-                        except UnicodeDecodeError:
-                            value = unicode(value,backupEncoding)
-                        insSeek(pos)
-                        self[id_] = value
-                    except:
-                        deprint(u'Error reading string file:')
-                        deprint(u'id:', id_)
-                        deprint(u'offset:', offset)
-                        deprint(u'filePos:',  insTell())
-                        raise
+            if _string_tables is None:
+                self._read_table(path, self, backupEncoding, progress)
+                return
+            size_mtime = path.size_mtime()
+            cached = _string_tables.get((path, backupEncoding))
+            if cached is None or cached[0] != size_mtime:
+                table = {}
+                try:
+                    self._read_table(path, table, backupEncoding, progress)
+                finally: # the strings read before any error are still added
+                    self.update(table)
+                _string_tables[(path, backupEncoding)] = size_mtime, table
+            else:
+                self.update(cached[1])
         except:
             deprint(u'Error loading string file:', path.stail, traceback=True)
+
+    @staticmethod
+    def open_cache():
+        """Start caching the decoded strings in loadFile - for batches that
+        load the same plugins over and over, like building the patch. Must
+        be paired with close_cache."""
+        global _string_tables
+        if _string_tables is None: _string_tables = {}
+
+    @staticmethod
+    def close_cache():
+        """Stop caching and drop the decoded strings cached by loadFile."""
+        global _string_tables
+        _string_tables = None
+
+    @staticmethod
+    def _read_table(path, table, backupEncoding, progress):
+        """Read the whole strings file at once and decode its entries from
+        that buffer into table. Entries may share their string, which is
+        then decoded once."""
+        with open(path.s, 'rb') as ins:
+            data = ins.read()
+        eof = len(data)
+        if eof < 8:
+            deprint(u"Warning: Strings file '%s' file size (%d) is less than "
+                    u"8 bytes.  8 bytes are the minimum required by the "
+                    u"expected format, assuming the Strings file is empty."
+                    % (path, eof))
             return
+        numIds, dataSize = struct_unpack_from('=2I', data)
+        progress.setFull(max(numIds, 1))
+        stringsStart = 8 + (numIds*8)
+        if stringsStart != eof-dataSize:
+            deprint(u"Warning: Strings file '%s' dataSize element (%d) "
+                    u"results in a string start location of %d, but the "
+                    u"expected location is %d"
+                    % (path, dataSize, eof-dataSize, stringsStart))
+        # the directory ends where the strings start, or where the file ends
+        # if it got truncated in the middle of it
+        dir_end = eof - dataSize
+        if not 8 <= dir_end < stringsStart: dir_end = min(eof, stringsStart)
+        num_entries = (dir_end - 8) // 8
+        if num_entries < numIds:
+            deprint(u"Warning: Strings file '%s' directory is truncated, "
+                    u"only %d of its %d entries can be read"
+                    % (path, num_entries, numIds))
+            stringsStart = dir_end
+        directory = struct_unpack_from('=%dI' % (2 * num_entries), data, 8)
+        formatted = path.cext != u'.strings'
+        offset_string = {}
+        id_ = offset = -1
+        try:
+            for id_, offset in izip(islice(directory, 0, None, 2),
+                                    islice(directory, 1, None, 2)):
+                value = offset_string.get(offset)
+                if value is None:
+                    pos = stringsStart + offset
+                    if formatted: # length prefixed, yet null terminated too
+                        end = pos + 4 + struct_unpack_from('I', data, pos)[0]
+                        value = cstrip(data[pos + 4:end])
+                    else:
+                        end = data.find('\0', pos)
+                        if end == -1:
+                            raise exception.FileError(path,
+                                u'Reached end of file while expecting null')
+                        value = data[pos:end] #drops the null byte
+                    try:
+                        value = unicode(value,'utf-8')
+                    except UnicodeDecodeError:
+                        value = unicode(value,backupEncoding)
+                    offset_string[offset] = value
+                table[id_] = value
+        except:
+            deprint(u'Error reading string file:')
+            deprint(u'id:', id_)
+            deprint(u'offset:', offset)
+            raise
+        finally:
+            progress(numIds)
 
 #------------------------------------------------------------------------------
 _digit_re = re.compile(u'([0-9]+)')
@@ -42,7 +42,8 @@
 from functools import wraps, partial
 from itertools import imap
 #--Local
-from ._mergeability import isPBashMergeable, isCBashMergeable, is_esl_capable
+from ._mergeability import isPBashMergeable, isCBashMergeable, \
+    is_esl_capable, scan_plugins
 from .mods_metadata import ConfigHelpers
 from .. import bass, bolt, balt, bush, env, load_order, archives, \
     initialization
@@ -454,8 +455,12 @@ def setType(self, esm_or_esp):
             modFile.write(struct_pack('=I', int(flags1)))
         self.header.flags1 = flags1
         self.setmtime(crc_changed=True)
+        load_order.mods_changed()
 
-    def calculate_crc(self, recalculate=False):
+    def calculate_crc(self, recalculate=False, _path_crc=None):
+        """Return the crc of the plugin, recalculating it if asked or if the
+        file changed, and the cached one. _path_crc is the crc of the file
+        if already calculated (see ModInfos.refresh_crcs)."""
         cached_crc = modInfos.table.getItem(self.name, 'crc')
         if not recalculate:
             cached_mtime = modInfos.table.getItem(self.name, 'crc_mtime')
@@ -465,7 +470,7 @@ def calculate_crc(self, recalculate=False):
                           or self._file_size != cached_size
         path_crc = cached_crc
         if recalculate:
-            path_crc = self.abs_path.crc
+            path_crc = self.abs_path.crc if _path_crc is None else _path_crc
             if path_crc != cached_crc:
                 modInfos.table.setItem(self.name,'crc',path_crc)
                 modInfos.table.setItem(self.name,'ignoreDirty',False)
@@ -637,6 +642,7 @@ def writeHeader(self):
         #--Remove original and replace with temp
         filePath.untemp()
         self.setmtime(crc_changed=True)
+        load_order.mods_changed() # the flags may have changed
         #--Merge info
         size,canMerge = modInfos.table.getItem(self.name,'mergeInfo',(None,None))
         if size is not None:
@@ -993,19 +999,34 @@ def getStatus(self):
             return -10
 
     def readHeader(self):
-        """Read header from file and set self.header attribute."""
-        try:
-            self.header = get_save_header_type(bush.game.fsName)(self.abs_path)
-        except SaveHeaderError as e:
-            raise SaveFileError, (self.name, e.message), sys.exc_info()[2]
+        """Read header from file and set self.header attribute. Unchanged
+        saves get it from the header cache instead."""
+        header_type = get_save_header_type(bush.game.fsName)
+        save_infos = self.getFileInfos()
+        self.header = None if save_infos is None else \
+            save_infos.get_cached_header(self, header_type)
+        if self.header is None:
+            try:
+                self.header = header_type(self.abs_path)
+            except SaveHeaderError as e:
+                raise SaveFileError, (self.name, e.message), sys.exc_info()[2]
+            if save_infos is not None: save_infos.cache_header(self)
         self._reset_masters()
 
+    def get_thumbnail(self):
+        """Return the width, height and RGB data of the screenshot, scaled
+        down for showing it - see SaveFileHeader.thumbnail."""
+        save_infos, cache_dir = self.getFileInfos(), None
+        if save_infos is not None and self.dir == save_infos.store_dir:
+            cache_dir = save_infos.thumbnails_dir
+        return self.header.thumbnail(cache_dir)
+
     def do_update(self):
         # Check for new and deleted cosaves and do_update old, surviving ones
         cosaves_changed = False
         for co_type in SaveInfo.cosave_types:
             co_path = co_type.get_cosave_path(self.abs_path)
-            if co_path.isfile():
+            if self.getFileInfos().file_exists(co_path):
                 if co_type in self._co_saves:
                     # Existing cosave could have changed, check if it did
                     cosaves_changed |= self._co_saves[co_type].do_update()
@@ -1032,11 +1053,11 @@ def write_masters(self):
         with self.abs_path.open('rb') as ins:
             with self.abs_path.temp.open('wb') as out:
                 oldMasters = self.header.writeMasters(ins, out)
-        oldMasters = [GPath(decode(x)) for x in oldMasters]
         self.abs_path.untemp()
+        save_infos = self.getFileInfos()
+        if save_infos is not None: save_infos.uncache_header(self.abs_path)
         #--Cosaves
-        master_map = dict((x.s, y.s) for x, y in
-                          zip(oldMasters, self.get_masters()) if x != y)
+        master_map = _renamed_masters(oldMasters, self.get_masters())
         if master_map:
             for co_file in self.get_cosave_instances().values():
                 co_file.remap_plugins(master_map)
@@ -1078,6 +1099,9 @@ def make_cosave(co_type, co_path):
         path and logs any resulting error.
 
         :rtype: cosaves.ACosave | None"""
+        if saveInfos is not None:
+            cosave = saveInfos.pop_prefetched_cosave(co_path)
+            if cosave is not None: return cosave
         try:
             return co_type(co_path)
         except (OSError, IOError, FileError) as e: #PY3: FileNotFoundError
@@ -1925,9 +1949,12 @@ def refresh(self, refresh_infos=True, booting=False, _modTimesChange=False):
         hasChanged = deleted = False
         # Scan the data dir, getting info on added, deleted and modified files
         if refresh_infos:
+            corrupted = set(self.corrupted)
             change = FileInfos.refresh(self, booting=booting)
             if change: _added, _updated, deleted = change
             hasChanged = bool(change)
+            if hasChanged or corrupted != set(self.corrupted):
+                load_order.mods_changed()
         # If refresh_infos is False and mods are added _do_ manually refresh
         _modTimesChange = _modTimesChange and not load_order.using_txt_file()
         lo_changed = self.refreshLoadOrder(
@@ -2065,11 +2092,18 @@ def _rescanMergeable(self, names, progress, doCBash, return_results):
         else:
             is_mergeable = isPBashMergeable
         mod_mergeInfo = self.table.getColumn('mergeInfo')
+        names = [n for n in names if doCBash or not reOblivion.match(n.s)]
+        #--Scan the record headers of all the mods to check up front
+        header_scans = {}
+        if bush.game.esp.canBash and is_mergeable is not isCBashMergeable:
+            header_scans = scan_plugins([self[n] for n in names if
+                                         not self[n].is_esl()],
+                bolt.SubProgress(progress, 0, 0.8, full=max(len(names), 1)))
+            progress = bolt.SubProgress(progress, 0.8, 1.0)
         progress.setFull(max(len(names),1))
         result, tagged_no_merge = OrderedDict(), set()
         for i,fileName in enumerate(names):
             progress(i,fileName.s)
-            if not doCBash and reOblivion.match(fileName.s): continue
             fileInfo = self[fileName]
             # do not mark esls as esl capable
             if fileInfo.is_esl():
@@ -2079,7 +2113,11 @@ def _rescanMergeable(self, names, progress, doCBash, return_results):
                 canMerge = False
             else:
                 try:
-                    canMerge = is_mergeable(fileInfo, self, reasons)
+                    if is_mergeable is isCBashMergeable:
+                        canMerge = is_mergeable(fileInfo, self, reasons)
+                    else:
+                        canMerge = is_mergeable(fileInfo, self, reasons,
+                                                header_scans.get(fileName))
                 except Exception as e:
                     # deprint (_(u"Error scanning mod %s (%s)") % (fileName, e))
                     # canMerge = False #presume non-mergeable.
@@ -2112,12 +2150,19 @@ def reloadBashTags(self):
             if autoTag:
                 mod.reloadBashTags()
 
-    def refresh_crcs(self, mods=None): #TODO(ut) progress !
+    def refresh_crcs(self, mods=None, progress=None, _path_crcs=None):
+        """Recalculate the crcs of mods (all by default) - the files are
+        read in parallel. _path_crcs maps absolute paths to their crcs, if
+        already calculated."""
         if mods is None: mods = self.keys()
+        infos = [self[mod] for mod in mods]
+        if _path_crcs is None:
+            _path_crcs = bolt.calc_file_crcs([inf.abs_path.s for inf in infos],
+                progress, _(u'Calculating CRCs...'))
         pairs = {}
-        for mod in mods:
-            inf = self[mod]
-            pairs[inf.name] = inf.calculate_crc(recalculate=True)
+        for inf in infos:
+            pairs[inf.name] = inf.calculate_crc(recalculate=True,
+                _path_crc=_path_crcs.get(inf.abs_path.s))
         return pairs
 
     #--Refresh File
@@ -2126,6 +2171,7 @@ def new_info(self, fileName, _in_refresh=False, owner=None,
         # we should refresh info sets if we manage to add the info, but also
         # if we fail, which might mean that some info got corrupted
         self._reset_info_sets()
+        load_order.mods_changed()
         return super(ModInfos, self).new_info(fileName, _in_refresh, owner,
                                               notify_bain)
 
@@ -2505,6 +2551,7 @@ def _rename_operation(self, oldName, newName):
         if isSelected:
             self.lo_deactivate(oldName, doSave=False) # will save later
         super(ModInfos, self)._rename_operation(oldName, newName)
+        load_order.mods_changed()
         # rename in load order caches
         oldIndex = self._lo_wip.index(oldName)
         self._lo_caches_remove_mods([oldName])
@@ -2537,6 +2584,7 @@ def delete_refresh(self, deleted, paths_to_keys, check_existence,
         deleted = super(ModInfos, self).delete_refresh(deleted, paths_to_keys,
                                                        check_existence)
         if not deleted: return
+        load_order.mods_changed()
         # temporarily track deleted mods so BAIN can update its UI
         if _in_refresh: return
         self._lo_caches_remove_mods(deleted)
@@ -2706,6 +2754,70 @@ def swapPluginsAndMasterVersion(self, arcSaves, newSaves):
         if voNew in self.voAvailable: self.setOblivionVersion(voNew)
 
 #------------------------------------------------------------------------------
+def _read_save_files(save_scan):
+    """Read the header of a save, if header_type is not None, and its cosaves
+    (light) and return a list of (abs path, (save stat tuple) and header or
+    cosave) - runs on a worker thread, see SaveInfos._prefetch. Files that
+    fail are left out, to be read again and have the error reported by the
+    refresh."""
+    header_type, save_path, stat_key, co_paths = save_scan
+    results = []
+    if header_type is not None:
+        try:
+            results.append((save_path, (stat_key, header_type(save_path))))
+        except Exception:
+            pass
+    for co_type, co_path in co_paths:
+        try:
+            cosave = co_type(co_path)
+            cosave.read_cosave(light=True)
+            results.append((co_path, cosave))
+        except Exception:
+            pass
+    return results
+
+def _renamed_masters(old_masters, new_masters):
+    """Return a dict of the unicode names of the save masters that were
+    renamed, old -> new, to rename them in the cosaves too.
+
+    :param old_masters: the encoded masters returned by writeMasters"""
+    return dict((x.s, y.s) for x, y in zip(
+        (GPath(decode(x)) for x in old_masters), new_masters) if x != y)
+
+def _write_remapped_save(remap_job):
+    """Write a save with its masters remapped and its cosaves with the
+    plugins renamed next to the originals, keeping their mtimes, and return
+    a list of (abs path, temp path) - or the exception raised, after removing
+    the temp files written. Runs on a worker thread, see
+    SaveInfos.remap_masters.
+
+    :param remap_job: (save path, header with the new masters, list of
+        (cosave type, cosave path))"""
+    save_path, header, co_paths = remap_job
+    written = []
+    try:
+        save_tmp = save_path + u'.remap'
+        written.append((save_path, save_tmp))
+        with save_path.open('rb') as ins:
+            with save_tmp.open('wb') as out:
+                old_masters = header.writeMasters(ins, out)
+        save_tmp.mtime = save_path.mtime
+        # the masters the save actually had, they may differ from the cached
+        # ones and only those of this save must be renamed in its cosaves
+        plugin_renames = _renamed_masters(old_masters, header.masters)
+        for co_type, co_path in co_paths:
+            co_tmp = co_path + u'.remap'
+            written.append((co_path, co_tmp))
+            cosave = co_type(co_path)
+            cosave.read_cosave()
+            cosave.remap_plugins(plugin_renames)
+            cosave.write_cosave(co_tmp) # keeps the mtime of the cosave
+        return written
+    except Exception as e:
+        for _orig, tmp_path in written:
+            tmp_path.remove()
+        return e
+
 class SaveInfos(FileInfos):
     """SaveInfo collection. Represents save directory and related info."""
     _bain_notify = False
@@ -2735,6 +2847,21 @@ def __init__(self):
         for row in self.profiles.keys():
             if row.endswith(u'\\'):
                 self.profiles.moveRow(row, row[:-1])
+        # save path -> ((size, mtime, ctime), header type name, header fields)
+        self._header_cache = bolt.PickleDict(
+            dirs['saveBase'].join(u'BashSaveHeaders.dat'))
+        self._header_cache.load()
+        if self._header_cache.vdata.get('version') != 3:
+            self._header_cache.data.clear() # not keyed on the ctime
+        self._header_cache_changed = False
+        # files being swapped in by remap_masters - not empty after a crash
+        self._remap_journal = bolt.PickleDict(
+            dirs['saveBase'].join(u'BashRemapJournal.dat'))
+        self._remap_journal.load()
+        self._rollback_remap()
+        # used while refreshing, see _prefetch
+        self._listing = self._listed_saves = None
+        self._prefetched = {} # abs path -> header or light cosave read
         SaveInfo.cosave_types = cosaves.get_cosave_types(
             bush.game.fsName, self.__class__.file_pattern,
             bush.game.se.cosave_tag, bush.game.se.cosave_ext)
@@ -2749,14 +2876,220 @@ def rightFileType(cls, fileName):
     @property
     def bash_dir(self): return self.store_dir.join(u'Bash')
 
+    @property
+    def thumbnails_dir(self): return self.bash_dir.join(u'Thumbnails')
+
+    #--Header cache -----------------------------------------------------------
+    def _cached_fields(self, save_path, stat_tuple, header_type):
+        cached = self._header_cache.data.get(save_path)
+        if cached is None or cached[:2] != (stat_tuple, header_type.__name__):
+            return None
+        return cached[2]
+
+    def get_cached_header(self, save_info, header_type):
+        """Return the cached header of save_info if the save did not change
+        since it was cached, or the header read by _prefetch, else None."""
+        stat_tuple = (save_info.size, save_info.mtime, save_info.ctime)
+        fields = self._cached_fields(save_info.abs_path, stat_tuple,
+                                     header_type)
+        if fields is not None:
+            return header_type.from_cache(save_info.abs_path, fields)
+        stat_key, header = self._prefetched.pop(save_info.abs_path,
+                                                (None, None))
+        if stat_key != stat_tuple: return None
+        self.cache_header(save_info, header)
+        return header
+
+    def cache_header(self, save_info, header=None):
+        header = header or save_info.header
+        self._header_cache.data[save_info.abs_path] = (
+            (save_info.size, save_info.mtime, save_info.ctime),
+            header.__class__.__name__, header.cache_fields())
+        self._header_cache_changed = True
+
+    def uncache_header(self, save_path):
+        """Drop the cached header of the save at save_path - call it when
+        rewriting a save, its stat may not change."""
+        if self._header_cache.data.pop(save_path, None):
+            self._header_cache_changed = True
+
+    def save_header_cache(self):
+        """Save the header cache if it changed, dropping the saves of the
+        current profile that are gone and their thumbnails."""
+        if not self._header_cache_changed: return
+        for save_path in self._header_cache.data.keys():
+            if save_path.head == self.store_dir and \
+                    save_path.tail not in self:
+                del self._header_cache.data[save_path]
+        if self.thumbnails_dir.isdir():
+            for thumb in self.thumbnails_dir.list():
+                if GPath(thumb.s[:-6]) not in self: # strip .thumb
+                    self.thumbnails_dir.join(thumb).remove()
+        self._header_cache.vdata['version'] = 3
+        self._header_cache.save()
+        self._header_cache_changed = False
+
+    #--Batch refresh ----------------------------------------------------------
+    def _prefetch(self):
+        """List the saves dir once and read the headers (unless cached) and
+        light cosaves of the new and changed saves in parallel. The results
+        are picked up by get_cached_header and pop_prefetched_cosave."""
+        self._listing = {x.s.lower(): x for x in self.store_dir.list()}
+        self._listed_saves = {x for x in self._listing.itervalues() if
+                              self.rightFileType(x) and
+                              self.store_dir.join(x).isfile()}
+        header_type = get_save_header_type(bush.game.fsName)
+        # only ESL games read the cosaves when refreshing, see get_masters
+        light_cosaves = bush.game.has_esl
+        scans = []
+        for save_name in self._listed_saves:
+            save_path = self.store_dir.join(save_name)
+            try:
+                stat_tuple = save_path.size_mtime_ctime()
+            except OSError:
+                continue
+            save_info = self.get(save_name)
+            if save_info is not None and not save_info._file_changed(
+                    stat_tuple):
+                continue
+            read_header = self._cached_fields(save_path, stat_tuple,
+                                              header_type) is None
+            co_paths = [(co_type, co_type.get_cosave_path(save_path)) for
+                        co_type in SaveInfo.cosave_types] if (
+                light_cosaves) else []
+            co_paths = [(t, p) for t, p in co_paths if self.file_exists(p)]
+            if read_header or co_paths:
+                scans.append((header_type if read_header else None,
+                              save_path, stat_tuple, co_paths))
+        if len(scans) < 2: return # nothing to gain
+        for results in bolt.imap_parallel(_read_save_files, scans,
+                                          2 * bolt.pool_size()):
+            self._prefetched.update(results)
+
+    def pop_prefetched_cosave(self, co_path):
+        """Return the cosave at co_path read by _prefetch, or None."""
+        return self._prefetched.pop(co_path, None)
+
+    def file_exists(self, abs_path):
+        """Check if abs_path is a file - during refresh files in the saves
+        dir are looked up in its listing."""
+        if self._listing is not None and abs_path.head == self.store_dir:
+            return abs_path.tail.s.lower() in self._listing
+        return abs_path.isfile()
+
+    def _names(self):
+        if self._listed_saves is not None: return set(self._listed_saves)
+        return super(SaveInfos, self)._names()
+
     def refresh(self, refresh_infos=True, booting=False):
         self._refreshLocalSave()
-        return refresh_infos and FileInfos.refresh(self, booting=booting)
+        if not refresh_infos: return False
+        try:
+            self._prefetch()
+            return FileInfos.refresh(self, booting=booting)
+        finally:
+            self._listing = self._listed_saves = None
+            self._prefetched.clear()
+
+    #--Batch master remapping -------------------------------------------------
+    def remap_masters(self, plugin_renames, save_names=None, progress=None):
+        """Rename the masters of the saves in save_names (all saves by
+        default) and the plugins in their cosaves. The files are written in
+        parallel next to the originals, then all of them are swapped in at
+        once - a failure, or a crash, rolls back to the original files. Saves
+        whose masters can't be edited are skipped. Refresh afterwards.
+
+        :param plugin_renames: dict of old -> new plugin name paths
+        :return: tuple of remapped save names, skipped save names, dict of
+            save name -> error and the seconds it took"""
+        start = time.time()
+        progress = progress or bolt.Progress()
+        remapped, skipped, errors, jobs = [], [], {}, []
+        for save_name in (self.keys() if save_names is None else save_names):
+            save_info = self[save_name]
+            new_masters = [plugin_renames.get(x, x) for x in
+                           save_info.header.masters]
+            if new_masters == save_info.header.masters: continue
+            if not save_info.header.canEditMasters:
+                skipped.append(save_name)
+                continue
+            header = save_info.header.from_cache(save_info.abs_path,
+                                                 save_info.header.cache_fields())
+            header.masters = new_masters
+            co_paths = [(type(x), x.abs_path) for x in
+                        save_info.get_cosave_instances().itervalues()]
+            jobs.append((save_name, (save_info.abs_path, header, co_paths)))
+        progress.setFull(max(len(jobs), 1))
+        to_swap = []
+        try:
+            for i, ((save_name, _job), result) in enumerate(
+                    zip(jobs, bolt.imap_parallel(_write_remapped_save,
+                            [job for _name, job in jobs],
+                            2 * bolt.pool_size()))):
+                progress(i, save_name.s)
+                if isinstance(result, Exception):
+                    errors[save_name] = result
+                else:
+                    remapped.append(save_name)
+                    to_swap.extend(result)
+            if remapped: self._swap_remapped(to_swap)
+        except:
+            for _orig, tmp_path in to_swap: tmp_path.remove()
+            raise
+        for save_name in remapped:
+            self.uncache_header(self[save_name].abs_path)
+        elapsed = time.time() - start
+        deprint(u'Remapped the masters of %d saves in %.2f seconds' % (
+            len(remapped), elapsed))
+        return remapped, skipped, errors, elapsed
+
+    def _swap_remapped(self, to_swap):
+        """Replace the files with the ones written by _write_remapped_save,
+        journaling the swap so that it can be rolled back."""
+        swapped = [(orig, tmp_path, orig + u'.remapold') for orig, tmp_path
+                   in to_swap]
+        self._remap_journal.data['files'] = swapped
+        self._remap_journal.save()
+        try:
+            for orig, tmp_path, old_path in swapped:
+                old_path.remove()
+                os.rename(orig.s, old_path.s)
+                os.rename(tmp_path.s, orig.s)
+        except:
+            self._rollback_remap()
+            raise
+        self._remap_journal.data.clear()
+        self._remap_journal.save()
+        for orig, tmp_path, old_path in swapped:
+            old_path.remove()
+
+    def _rollback_remap(self):
+        """Restore the files of an interrupted _swap_remapped."""
+        swapped = self._remap_journal.data.get('files')
+        if not swapped: return
+        deprint(u'Rolling back the masters remapping of %d files' %
+                len(swapped))
+        for orig, tmp_path, old_path in swapped:
+            try:
+                if old_path.exists():
+                    orig.remove()
+                    os.rename(old_path.s, orig.s)
+                tmp_path.remove()
+            except OSError:
+                deprint(u'Failed to restore %s' % orig, traceback=True)
+        self._remap_journal.data.clear()
+        self._remap_journal.save()
 
     def _rename_operation(self, oldName, newName):
         """Renames member file from oldName to newName, update also cosave
         instance names."""
         super(SaveInfos, self)._rename_operation(oldName, newName)
+        # the header reads the screenshot from the save when needed
+        self[newName].header.save_path = self[newName].abs_path
+        cached = self._header_cache.data.pop(self.store_dir.join(oldName), None)
+        if cached is not None:
+            self._header_cache.data[self.store_dir.join(newName)] = cached
+            self._header_cache_changed = True
         for co_type, co_file in self[newName].get_cosave_instances().items():
             co_file.abs_path = co_type.get_cosave_path(self[newName].abs_path)
 
@@ -2894,6 +3227,11 @@ def do_update(self):
 
             def readHeader(self):  # just reset the cache
                 self._assets = self.__class__._assets
+                self._asset_hashes = self.__class__._asset_hashes
+
+            def _read_asset_hashes(self):
+                return bsaInfos.cached_asset_hashes(
+                    self, super(BSAInfo, self)._read_asset_hashes)
 
             def _reset_bsa_mtime(self):
                 if bush.game.allow_reset_bsa_timestamps and inisettings[
@@ -2902,10 +3240,100 @@ def _reset_bsa_mtime(self):
                         self.setmtime(self._default_mtime)
 
         super(BSAInfos, self).__init__(dirs['mods'], factory=BSAInfo)
+        # bsa name -> ((size, mtime), AssetHashes of the bsa)
+        self._assets_cache = bolt.PickleDict(
+            self.bash_dir.join(u'Assets.dat'))
+        self._assets_cache.load()
+        self._assets_cache_changed = False
+        # asset hash -> tuple of the names of the bsas containing it, built
+        # on first use by asset_bsas()
+        self._asset_bsas = None
+        self._indexed_assets = {} # bsa name -> hashes added to _asset_bsas
 
     @property
     def bash_dir(self): return dirs['modsBash'].join(u'BSA Data')
 
+    #--Assets cache and index
+    def cached_asset_hashes(self, bsa_info, read_asset_hashes):
+        """Return the asset hashes of bsa_info from the persistent cache,
+        calling read_asset_hashes to read them from the bsa if it changed
+        since they were cached.
+        :rtype: bsa_files.AssetHashes"""
+        stat_key = (bsa_info.size, bsa_info.mtime)
+        cached = self._assets_cache.data.get(bsa_info.name)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        asset_hashes = read_asset_hashes()
+        self._assets_cache.data[bsa_info.name] = (stat_key, asset_hashes)
+        self._assets_cache_changed = True
+        return asset_hashes
+
+    def asset_bsas(self):
+        """Return a dict mapping asset hashes (see bsa_files.asset_hash) to
+        the names of the bsas containing them. Built the first time it is
+        needed, then kept in sync when bsas are refreshed, deleted or renamed.
+        :rtype: dict[str, tuple[bolt.Path]]"""
+        if self._asset_bsas is None:
+            self._asset_bsas = {}
+            for bsa_name in self.keys():
+                self._index_bsa(bsa_name)
+        return self._asset_bsas
+
+    def _index_bsa(self, bsa_name):
+        try:
+            asset_hashes = self[bsa_name].asset_hashes
+        except BSAError:
+            deprint(u'Failed to parse %s' % bsa_name, traceback=True)
+            return
+        index_get = self._asset_bsas.get
+        for a_hash in asset_hashes.iter_hashes():
+            self._asset_bsas[a_hash] = index_get(a_hash, ()) + (bsa_name,)
+        self._indexed_assets[bsa_name] = asset_hashes
+
+    def _unindex_bsa(self, bsa_name):
+        indexed = self._indexed_assets.pop(bsa_name, None)
+        for a_hash in (indexed.iter_hashes() if indexed else ()):
+            bsa_names = tuple(
+                b for b in self._asset_bsas[a_hash] if b != bsa_name)
+            if bsa_names: self._asset_bsas[a_hash] = bsa_names
+            else: del self._asset_bsas[a_hash]
+
+    def refresh(self, refresh_infos=True, booting=False):
+        change = super(BSAInfos, self).refresh(refresh_infos, booting)
+        if change and self._asset_bsas is not None:
+            _added, _updated, _deleted = change # deleted handled below
+            for bsa_name in _updated: self._unindex_bsa(bsa_name)
+            for bsa_name in _added | _updated:
+                if bsa_name in self: self._index_bsa(bsa_name)
+        return change
+
+    def delete_refresh(self, deleted_keys, paths_to_keys, check_existence,
+                       _in_refresh=False):
+        deleted = super(BSAInfos, self).delete_refresh(
+            deleted_keys, paths_to_keys, check_existence, _in_refresh)
+        for bsa_name in deleted or ():
+            self._unindex_bsa(bsa_name)
+        return deleted
+
+    def _rename_operation(self, oldName, newName):
+        super(BSAInfos, self)._rename_operation(oldName, newName)
+        if oldName in self._assets_cache.data:
+            self._assets_cache.data[newName] = self._assets_cache.data.pop(
+                oldName)
+            self._assets_cache_changed = True
+        if self._asset_bsas is not None:
+            self._unindex_bsa(oldName)
+            self._index_bsa(newName)
+
+    def save_assets_cache(self):
+        """Save the assets cache if it changed, dropping bsas that are gone.
+        Not part of save() as the BSAs tab, that calls it, may be disabled."""
+        if not self._assets_cache_changed: return
+        for bsa_name in set(self._assets_cache.data) - set(self.keys()):
+            del self._assets_cache.data[bsa_name]
+        self._assets_cache.save()
+        self._assets_cache_changed = False
+
     @staticmethod
     def remove_invalidation_file():
         """Removes ArchiveInvalidation.txt, if it exists in the game folder.
@@ -22,12 +22,32 @@
 #
 # =============================================================================
 """Tmp module to get mergeability stuff out of bosh.__init__.py."""
+from itertools import izip
+
 from .. import bass, bush
-from ..bolt import GPath
+from ..bolt import GPath, imap_parallel, pool_size
+from ..brec import RecordHeader, scan_record_headers
 from ..cint import ObCollection
-from ..exception import ModError
 from ..load_order import cached_is_active
-from ..parsers import ModFile, LoadFactory
+
+def scan_plugins(mod_infos, progress=None):
+    """Walk the record headers of the specified plugins on a thread pool -
+    see brec.scan_record_headers. Much cheaper than loading them, as no record
+    is decoded and the walk is mostly seeking over record data.
+
+    :type mod_infos: list[bosh.ModInfo]
+    :return: a dict mapping plugin names to their RecordHeaderScan"""
+    scan_args = [(inf.getPath().s, len(inf.get_masters()),
+                  RecordHeader.rec_header_size) for inf in mod_infos]
+    header_scans = {}
+    for i, (inf, scan) in enumerate(izip(mod_infos, imap_parallel(
+            scan_record_headers, scan_args, 2 * pool_size()))):
+        if progress is not None: progress(i, inf.name.s)
+        header_scans[inf.name] = scan
+    return header_scans
+
+def _get_scan(modInfo, header_scan):
+    return header_scan or scan_plugins([modInfo])[modInfo.name]
 
 def _is_mergeable_no_load(modInfo, reasons):
     verbose = reasons is not None
@@ -79,38 +99,33 @@ def _pbash_mergeable_no_load(modInfo, reasons):
             modInfo.name.sbody, oblivionIni.get_ini_language()))
     return False if reasons else True
 
-def isPBashMergeable(modInfo, minfos, reasons):
-    """Returns True or error message indicating whether specified mod is mergeable."""
+def isPBashMergeable(modInfo, minfos, reasons, header_scan=None):
+    """Returns True or error message indicating whether specified mod is
+    mergeable. If header_scan is not given, the plugin's record headers are
+    scanned here."""
     verbose = reasons is not None
     if not  _pbash_mergeable_no_load(modInfo, reasons) and not verbose:
         return False  # non verbose mode
-    #--Load test
-    mergeTypes = set(recClass.classType for recClass in bush.game.mergeClasses)
-    modFile = ModFile(modInfo, LoadFactory(False, *mergeTypes))
-    try:
-        modFile.load(True,loadStrings=False)
-    except ModError as error:
+    #--Header scan
+    header_scan = _get_scan(modInfo, header_scan)
+    if header_scan.error:
         if not verbose: return False
-        reasons.append(u'%s.' % error)
+        reasons.append(u'%s.' % header_scan.error)
+    mergeTypes = set(recClass.classType for recClass in bush.game.mergeClasses)
     #--Skipped over types?
-    if modFile.topsSkipped:
+    tops_skipped = header_scan.top_types - mergeTypes
+    if tops_skipped:
         if not verbose: return False
-        reasons.append(_(u'Unsupported types: ')+u', '.join(sorted(modFile.topsSkipped))+u'.')
+        reasons.append(_(u'Unsupported types: ')+u', '.join(sorted(tops_skipped))+u'.')
     #--Empty mod
-    elif not modFile.tops:
+    elif not header_scan.top_types:
         if not verbose: return False
         reasons.append(_(u'Empty mod.'))
-    #--New record
-    lenMasters = len(modFile.tes4.masters)
-    newblocks = []
-    for top_type,block in modFile.tops.iteritems():
-        for record in block.getActiveRecords():
-            if record.fid >> 24 >= lenMasters:
-                if record.flags1.deleted: continue #if new records exist but are deleted just skip em.
-                if not verbose: return False
-                newblocks.append(top_type)
-                break
-    if newblocks: reasons.append(_(u'New record(s) in block(s): ')+u', '.join(sorted(newblocks))+u'.')
+    #--New record - deleted new records are skipped by the scan
+    newblocks = header_scan.new_top_types & mergeTypes
+    if newblocks:
+        if not verbose: return False
+        reasons.append(_(u'New record(s) in block(s): ')+u', '.join(sorted(newblocks))+u'.')
     dependent = _dependent(modInfo, minfos)
     if dependent:
         if not verbose: return False
@@ -125,7 +140,7 @@ def _dependent(modInfo, minfos):
                  mname not in minfos.mergeable]
     return dependent
 
-def is_esl_capable(modInfo, _minfos, reasons):
+def is_esl_capable(modInfo, _minfos, reasons, header_scan=None):
     """Determines whether or not the specified mod can be converted to a light
     plugin. Optionally also returns the reasons it can't be converted.
 
@@ -135,38 +150,23 @@ def is_esl_capable(modInfo, _minfos, reasons):
     :param reasons: A list of strings that should be filled with the reasons
                     why this mod can't be ESL flagged, or None if only the
                     return value of this method is of interest.
+    :param header_scan: The RecordHeaderScan of the mod, as returned by
+                        scan_plugins. If None the mod is scanned here.
     :return: True if the specified mod could be flagged as ESL."""
     verbose = reasons is not None
     if modInfo.isBP():
         if not verbose: return False
         reasons.append(_(u'Is Bashed Patch.'))
-    # FIXME check all record types - return undecidable (False) if record not decoded
-    modFile = ModFile(modInfo, LoadFactory(False, *set(
-        recClass.classType for recClass in bush.game.mergeClasses)))
-    try:
-        modFile.load(True,loadStrings=False)
-    except ModError as error:
-        if not verbose: return False
-        reasons.append(u'%s.' % error)
-    #--Skipped over types?
-    if modFile.topsSkipped:
+    # The scan walks the headers of all records, including ones in types that
+    # are not decoded by Bash
+    header_scan = _get_scan(modInfo, header_scan)
+    if header_scan.error:
         if not verbose: return False
-        reasons.append(_(u'Record type: ') + u', '.join(sorted(
-            modFile.topsSkipped)) + u' ; currently unsupported by ESLify ' \
-                                    u'verification. Use xEdit to check ESL '
-                                    u'qualifications and modify ESL flag.')
+        reasons.append(u'%s.' % header_scan.error)
     #--Form greater then 0xFFF
-    lenMasters = len(modFile.tes4.masters)
-    for rec_typ,block in modFile.tops.iteritems():
-        for record in block.getActiveRecords():
-            if record.fid >> 24 >= lenMasters:
-                if (record.fid & 0xFFFFFF) > 0xFFF:
-                    if not verbose: return False
-                    reasons.append(_(u'New Forms greater than 0xFFF.'))
-                    break
-        else:
-            continue
-        break
+    if header_scan.max_new_object_id > 0xFFF:
+        if not verbose: return False
+        reasons.append(_(u'New Forms greater than 0xFFF.'))
     return False if reasons else True
 
 def _modIsMergeableLoad(modInfo, minfos, reasons):
@@ -218,7 +218,8 @@ def _modIsMergeableLoad(modInfo, minfos, reasons):
     return False if reasons else True
 
 def isCBashMergeable(modInfo, minfos, reasons):
-    """Returns True or error message indicating whether specified mod is mergeable."""
+    """Returns True or error message indicating whether specified mod is
+    mergeable."""
     verbose = reasons is not None
     if modInfo.name.s == u"Oscuro's_Oblivion_Overhaul.esp":
         if verbose: return [u'\n.    ' +
@@ -25,6 +25,9 @@
 Oblivion only . We need this split into cosaves and proper saves module and
 coded for rest of the games."""
 # TODO: Oblivion only - we need to support rest of games - help needed
+import array
+import mmap
+import struct
 from collections import Counter
 from itertools import starmap, repeat
 from operator import attrgetter
@@ -218,6 +221,95 @@ def dumpText(self,saveFile):
             return buff.getvalue()
 
 # Save File -------------------------------------------------------------------
+class _ChangeRecords(object):
+    """The change records of a save, as a list of (fid, recType, flags,
+    version, data) tuples. Records read from the save file are kept as their
+    offset in the (memory mapped) save and are only decoded when accessed -
+    records set or appended are kept as tuples."""
+    _header = struct.Struct('=IBIBH')
+
+    def __init__(self, buff=None, entries=None):
+        self._buff = buff
+        self._entries = [] if entries is None else entries
+
+    @classmethod
+    def index(cls, buff, pos, num_records):
+        """Index num_records change records starting at pos in buff and
+        return the (records, end position) tuple."""
+        entries = [0] * num_records
+        hsize = cls._header.size
+        size_from = struct.Struct('H').unpack_from
+        for count in xrange(num_records):
+            entries[count] = pos
+            pos += hsize + size_from(buff, pos + hsize - 2)[0]
+        if pos > len(buff):
+            raise struct.error(u'Change records end past the end of file')
+        return cls(buff, entries), pos
+
+    def __len__(self): return len(self._entries)
+
+    def __getitem__(self, index):
+        entry = self._entries[index]
+        if type(entry) is tuple: return entry
+        fid, recType, flags, version, siz = self._header.unpack_from(
+            self._buff, entry)
+        entry += self._header.size
+        return fid, recType, flags, version, self._buff[entry:entry + siz]
+
+    def __setitem__(self, index, record): self._entries[index] = record
+
+    def __delitem__(self, index): del self._entries[index]
+
+    def __iter__(self):
+        for index in xrange(len(self._entries)):
+            yield self[index]
+
+    def append(self, record): self._entries.append(record)
+
+    def headers(self):
+        """Yield the (fid, recType, flags, version, data size) of all
+        records without decoding their data."""
+        unpack_from = self._header.unpack_from
+        for entry in self._entries:
+            if type(entry) is tuple:
+                yield entry[:4] + (len(entry[4]),)
+            else:
+                yield unpack_from(self._buff, entry)
+
+    def unpack_data(self, index, fmt, pos):
+        """Unpack fmt at pos of the data of the record at index, without
+        decoding the rest of it."""
+        entry = self._entries[index]
+        if type(entry) is tuple:
+            return struct.unpack_from(fmt, entry[4], pos)
+        return struct.unpack_from(fmt, self._buff,
+                                  entry + self._header.size + pos)
+
+    def kept(self, indices):
+        """Return the records at the specified indices."""
+        return _ChangeRecords(self._buff, [self._entries[i] for i in indices])
+
+    def detach(self):
+        """Decode the records still read from the save file - call before
+        the save file is closed."""
+        if self._buff is None: return
+        self._entries = list(self)
+        self._buff = None
+
+    def dump(self, out):
+        """Write the records to out - the undecoded ones are copied from the
+        save file as is."""
+        pack, buff, hsize = self._header.pack, self._buff, self._header.size
+        size_from = struct.Struct('H').unpack_from
+        for entry in self._entries:
+            if type(entry) is tuple:
+                fid, recType, flags, version, data = entry
+                out.write(pack(fid, recType, flags, version, len(data)))
+                out.write(data)
+            else:
+                end = entry + hsize + size_from(buff, entry + hsize - 2)[0]
+                out.write(buff[entry:end])
+
 class SaveFile(object):
     """Represents a Tes4 Save file."""
     recordFlags = Flags(0,Flags.getNames(
@@ -244,19 +336,26 @@ def __init__(self,saveInfo=None,canSave=True):
         self.preCreated = None #--Pre-records, pre-created
         self.preRecords = None #--Pre-records, pre
         #--Records, temp effects, fids, worldspaces
-        self.records = [] #--(fid,recType,flags,version,data)
+        self.records = _ChangeRecords() #--(fid,recType,flags,version,data)
         self.fid_recNum = None
         self.tempEffects = None
         self.fids = None
         self.irefs = {}  #--iref = self.irefs[fid]
         self.worldSpaces = None
+        self._records_pos = None
+        #--The memory mapped save file, change records are read from it
+        self._mapped = None
 
     def load(self,progress=None):
-        """Extract info from save file."""
+        """Extract info from save file. The file is memory mapped and the
+        change records are only indexed - see _ChangeRecords."""
         # TODO: This is Oblivion only code.  Needs to be refactored
-        import array
+        self._unmap()
         path = self.fileInfo.getPath()
-        with open(path.s,'rb') as ins:
+        with open(path.s, 'rb') as ins:
+            self._mapped = mmap.mmap(ins.fileno(), 0, access=mmap.ACCESS_READ)
+        ins = self._mapped
+        try:
             #--Progress
             progress = progress or bolt.Progress()
             progress.setFull(self.fileInfo.size)
@@ -310,11 +409,10 @@ def insCopy(buff,size,backSize=0):
                 self.preRecords = buff.getvalue()
 
             #--Records
-            for count in xrange(recordsNum):
-                progress(ins.tell(),_(u'Reading records...'))
-                (fid, recType, flags, version, siz) = unpack_many(ins,'=IBIBH')
-                data = ins.read(siz)
-                self.records.append((fid,recType,flags,version,data))
+            progress(ins.tell(),_(u'Reading records...'))
+            self.records, records_end = _ChangeRecords.index(
+                ins, ins.tell(), recordsNum)
+            ins.seek(records_end)
 
             #--Temp Effects, fids, worldids
             progress(ins.tell(),_(u'Reading fids, worldids...'))
@@ -322,23 +420,34 @@ def insCopy(buff,size,backSize=0):
             self.tempEffects = ins.read(tmp_effects_size)
             #--Fids
             num = unpack_int(ins)
-            self.fids = array.array('I')
-            self.fids.fromfile(ins,num)
-            for iref,fid in enumerate(self.fids):
-                self.irefs[fid] = iref
+            self.fids = array.array('I', ins.read(4 * num))
+            self.irefs = dict(zip(self.fids, xrange(num)))
 
             #--WorldSpaces
             num = unpack_int(ins)
-            self.worldSpaces = array.array('I')
-            self.worldSpaces.fromfile(ins,num)
+            self.worldSpaces = array.array('I', ins.read(4 * num))
+        except:
+            self._unmap()
+            raise
         #--Done
         progress(progress.full,_(u'Finished reading.'))
 
+    def _unmap(self):
+        """Close the memory mapped save file - records still read from it
+        can't be accessed anymore."""
+        if self._mapped is None: return
+        self._mapped.close()
+        self._mapped = None
+
     def save(self,outPath=None,progress=None):
         """Save data to file.
         outPath -- Path of the output file to write to. Defaults to original file path."""
         if not self.canSave: raise StateError(u"Insufficient data to write file.")
         outPath = outPath or self.fileInfo.getPath()
+        if outPath == self.fileInfo.getPath():
+            # we are about to overwrite the mapped file
+            self.records.detach()
+            self._unmap()
         with outPath.open('wb') as out:
             def _pack(fmt, *data):
                 out.write(struct_pack(fmt, *data))
@@ -383,9 +492,8 @@ def _pack(fmt, *data):
             out.write(self.preRecords)
             #--Records, temp effects, fids, worldspaces
             progress(0.2,_(u'Writing records.'))
-            for fid,recType,flags,version,data in self.records:
-                _pack('=IBIBH',fid,recType,flags,version,len(data))
-                out.write(data)
+            self._records_pos = out.tell()
+            self.records.dump(out)
             #--Temp Effects, fids, worldids
             _pack('I',len(self.tempEffects))
             out.write(self.tempEffects)
@@ -408,8 +516,21 @@ def safeSave(self,progress=None):
         self.fileInfo.makeBackup()
         filePath = self.fileInfo.getPath()
         self.save(filePath.temp,progress)
-        filePath.untemp()
+        if self._mapped is not None:
+            # a mapped file can't be replaced on windows - map the new one
+            num_records = len(self.records)
+            self._unmap()
+            filePath.untemp()
+            with filePath.open('rb') as ins:
+                self._mapped = mmap.mmap(ins.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+            self.records = _ChangeRecords.index(
+                self._mapped, self._records_pos, num_records)[0]
+        else:
+            filePath.untemp()
         self.fileInfo.setmtime()
+        save_infos = self.fileInfo.getFileInfos()
+        if save_infos is not None: save_infos.uncache_header(filePath)
 
     def addMaster(self,master):
         """Adds master to masters list."""
@@ -433,7 +554,8 @@ def removeCreated(self,fid):
 
     def indexRecords(self):
         """Fills out self.fid_recNum."""
-        self.fid_recNum = dict((entry[0],index) for index,entry in enumerate(self.records))
+        self.fid_recNum = dict((entry[0], index) for index, entry in
+                               enumerate(self.records.headers()))
 
     def getRecord(self,fid,default=None):
         """Returns recNum and record with corresponding fid."""
@@ -547,8 +669,8 @@ def getMaster(modIndex):
         objRefBases = {}
         objRefNullBases = 0
         fids = self.fids
-        for record in self.records:
-            fid,type,rec_flgs,version,data = record
+        for index, record in enumerate(self.records.headers()):
+            fid,type,rec_flgs,version,siz = record
             if fid ==0xFEFFFFFF: continue #--Ignore intentional(?) extra fid added by patch.
             mod = fid >> 24
             if type not in typeModHisto:
@@ -568,10 +690,10 @@ def getMaster(modIndex):
                     knownTypes.add(type)
             #--Obj ref parents
             if type == 49 and mod == 255 and (rec_flgs & 2):
-                iref, = struct_unpack('I', data[4:8])
+                iref, = self.records.unpack_data(index, 'I', 4)
                 count,cumSize = objRefBases.get(iref,(0,0))
                 count += 1
-                cumSize += len(data) + 12
+                cumSize += siz + 12
                 objRefBases[iref] = (count,cumSize)
                 if iref >> 24 != 255 and fids[iref] == 0:
                     objRefNullBases += 1
@@ -634,10 +756,10 @@ def findBloating(self,progress=None):
         #--Change records
         progress(len(self.created),_(u'Scanning change records.'))
         fids = self.fids
-        for record in self.records:
-            fid,recType,rec_flgs,version,data = record
+        for index, record in enumerate(self.records.headers()):
+            fid,recType,rec_flgs,version,siz = record
             if recType == 49 and fid >> 24 == 0xFF and (rec_flgs & 2):
-                iref, = struct_unpack('I', data[4:8])
+                iref, = self.records.unpack_data(index, 'I', 4)
                 if iref >> 24 != 0xFF and fids[iref] == 0:
                     nullRefCount += 1
             progress.plus()
@@ -669,20 +791,21 @@ def removeBloating(self,uncreateKeys,removeNullRefs=True,progress=None):
         progress(progress.state,_(u'Scanning change records.'))
         fids = self.fids
         kept = []
-        for record in self.records:
-            fid,recType,rec_flgs,version,data = record
+        for index, record in enumerate(self.records.headers()):
+            fid,recType,rec_flgs,version,siz = record
             if fid in uncreated:
                 numUnCreChanged += 1
             elif removeNullRefs and recType == 49 and fid >> 24 == 0xFF and (rec_flgs & 2):
-                iref, = struct_unpack('I', data[4:8])
+                iref, = self.records.unpack_data(index, 'I', 4)
                 if iref >> 24 != 0xFF and fids[iref] == 0:
                     numUnNulled += 1
                 else:
-                    kept.append(record)
+                    kept.append(index)
             else:
-                kept.append(record)
+                kept.append(index)
             progress.plus()
-        self.records = kept
+        self.records = self.records.kept(kept)
+        self.fid_recNum = None
         return numUncreated,numUnCreChanged,numUnNulled
 
     def getCreated(self,*types):
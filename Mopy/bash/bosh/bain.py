@@ -23,16 +23,18 @@
 # =============================================================================
 """BAIN backbone classes."""
 
+import bisect
 import collections
 import copy
 import errno
 import os
 import re
+import stat
 import sys
 import time
 from binascii import crc32
 from functools import partial, wraps
-from itertools import groupby, imap
+from itertools import chain, groupby, imap
 from operator import itemgetter, attrgetter
 
 from . import imageExts, DataStore, BestIniFile, InstallerConverter, AFile, \
@@ -41,7 +43,7 @@
 from .. import balt # YAK!
 from .. import bush, bass, bolt, env, archives
 from ..archives import readExts, defaultExt, list_archive, compress7z, \
-    extract7z, compressionSettings
+    extract7z, compressionSettings, list_archives
 from ..bolt import Path, deprint, round_size, GPath, sio, SubProgress, CIstr, \
     LowerDict
 from ..exception import AbstractError, ArgumentError, BSAError, CancelError, \
@@ -61,7 +63,8 @@ class Installer(object):
     volatile = ('ci_dest_sizeCrc', 'skipExtFiles', 'skipDirFiles', 'status',
         'missingFiles', 'mismatchedFiles', 'project_refreshed',
         'mismatchedEspms', 'unSize', 'espms', 'underrides', 'hasWizard',
-        'espmMap', 'hasReadme', 'hasBCF', 'hasBethFiles', '_dir_dirs_files')
+        'espmMap', 'hasReadme', 'hasBCF', 'hasBethFiles', '_dir_dirs_files',
+        '_path_rows', '_dir_snapshot')
     __slots__ = persistent + volatile
     #--Package analysis/porting.
     type_string = _(u'Unrecognized')
@@ -119,41 +122,30 @@ def final_update(new_sizeCrcDate, old_sizeCrcDate, pending, pending_size,
         #--Update crcs?
         Installer.calc_crcs(pending, pending_size, rootName,
                             new_sizeCrcDate, progress)
-        # drop _asFile
-        old_sizeCrcDate.clear()
+        # drop _asFile - update in place so that only the entries that
+        # actually changed are set, see _TrackedLowerDict
+        for rpFile in set(old_sizeCrcDate).difference(new_sizeCrcDate):
+            del old_sizeCrcDate[rpFile]
         for rpFile, (size, crc, date, _asFile) in new_sizeCrcDate.iteritems():
             old_sizeCrcDate[rpFile] = (size, crc, date)
         return changed
 
     @staticmethod
     def calc_crcs(pending, pending_size, rootName, new_sizeCrcDate, progress):
+        """Calculate the crcs of the files in pending on a thread pool and
+        add them to new_sizeCrcDate. Crcs already calculated by a full
+        refresh (see InstallersData._precalc_crcs) are reused."""
         if not pending: return
-        done = 0
-        progress_msg= rootName + u'\n' + _(u'Calculating CRCs...') + u'\n'
+        progress_msg = rootName + u'\n' + _(u'Calculating CRCs...')
         progress(0, progress_msg)
-        # each mod increments the progress bar by at least one, even if it
-        # is size 0 - add len(pending) to the progress bar max to ensure we
-        # don't hit 100% and cause the progress bar to prematurely disappear
-        progress.setFull(pending_size + len(pending))
-        for rpFile, (size, _crc, date, asFile) in iter(sorted(pending.items())):
-            progress(done, progress_msg + rpFile)
-            sub = bolt.SubProgress(progress, done, done + size + 1)
-            sub.setFull(size + 1)
-            crc = 0
-            try:
-                with open(asFile, 'rb') as ins:
-                    insTell = ins.tell
-                    for block in iter(partial(ins.read, 2097152), ''):
-                        crc = crc32(block, crc) # 2MB at a time, probably ok
-                        sub(insTell())
-            except IOError:
-                deprint(_(u'Failed to calculate crc for %s - please report '
-                          u'this, and the following traceback:') % asFile,
-                        traceback=True)
-                continue
-            crc &= 0xFFFFFFFF
-            done += size + 1
-            new_sizeCrcDate[rpFile] = (size, crc, date, asFile)
+        precalculated = Installer._full_refresh_crcs
+        crcs = bolt.calc_file_crcs([asFile for size, _crc, date, asFile in
+            pending.itervalues() if (asFile, size, date) not in
+            precalculated], progress, progress_msg)
+        for rpFile, (size, _crc, date, asFile) in pending.iteritems():
+            crc = precalculated.get((asFile, size, date), crcs.get(asFile))
+            if crc is not None: # else we failed to read it, logged
+                new_sizeCrcDate[rpFile] = (size, crc, date, asFile)
 
     #--Initialization, etc ----------------------------------------------------
     def initDefault(self):
@@ -192,6 +184,11 @@ def initDefault(self):
         #--Volatiles: directory specific
         self.project_refreshed = False
         self._dir_dirs_files = None
+        # snapshot of a project directory as of its last scan, persisted by
+        # InstallersData in its own file, see InstallerProject._walk_snapshot
+        self._dir_snapshot = None
+        #--Volatile: normalized paths of fileSizeCrcs, see _normalized_paths
+        self._path_rows = None
         #--Volatile: set by refreshDataSizeCrc
         # LowerDict mapping destinations (relative to Data/ directory) of files
         # in this installer to their size and crc - built in refreshDataSizeCrc
@@ -373,6 +370,8 @@ def badDlls():
             Installer._badDlls = collections.defaultdict(list)
             Installer._badDlls.update(bass.settings['bash.installers.badDlls'])
         return Installer._badDlls
+    # (abs path, size, mtime) -> crc of the files read by a full refresh
+    _full_refresh_crcs = {}
     # while checking for skips process some installer attributes
     _attributes_process = {}
     _extensions_to_process = set()
@@ -582,7 +581,45 @@ def _dllMsg(fileLower, full, archiveRoot, desc, ext, badDlls, goodDlls):
                          u'saying yes.') % ext
         return message
 
-    def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
+    def _normalized_paths(self, splitExt=os.path.splitext):
+        """Return the files under the package root that are not always
+        skipped, with their paths split and lowercased as refreshDataSizeCrc
+        needs them, for simple and complex package layouts. This does not
+        depend on the skip settings so it is cached till fileSizeCrcs or the
+        root path change - toggling a skip only reruns the skip rules.
+        :rtype: list[tuple]"""
+        if self._path_rows is not None: return self._path_rows
+        rows = []
+        root_path = self.extras_dict.get('root_path', u'')
+        rootIdex = len(root_path)
+        silent_start = Installer._silentSkipsStart
+        silent_end = Installer._silentSkipsEnd
+        for full, size, crc in self.fileSizeCrcs:
+            if rootIdex: # exclude all files that are not under root_dir
+                if not full.startswith(root_path): continue
+            file_relative = full[rootIdex:]
+            fileLower = file_relative.lower()
+            if fileLower.startswith( # skip top level '--', 'fomod' etc
+                    silent_start) or fileLower.endswith(silent_end): continue
+            fileExt = splitExt(fileLower)[1]
+            split = fileLower.split(os_sep, 1)
+            rootLower = split[0] if len(split) > 1 else u''
+            # the same file, as seen in a complex package
+            sub, sub_relative, sub_lower, sub_root = u'', file_relative, \
+                fileLower, rootLower
+            if rootLower:
+                sub, sub_relative = file_relative.split(os_sep, 1)
+                sub_lower = split[1]
+                if sub_lower.startswith(silent_start):
+                    sub = None # skip subpackage level '--', 'fomod' etc
+                split = sub_lower.split(os_sep, 1)
+                sub_root = split[0] if len(split) > 1 else u''
+            rows.append((full, size, crc, fileExt, file_relative, fileLower,
+                         rootLower, sub, sub_relative, sub_lower, sub_root))
+        self._path_rows = rows
+        return rows
+
+    def refreshDataSizeCrc(self, checkOBSE=False):
         """Update self.ci_dest_sizeCrc and related variables and return
         dest_src map for install operation. ci_dest_sizeCrc is a dict that maps
         CIstr paths _relative to the Data dir_ (the locations the files will
@@ -646,36 +683,24 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
         espmMap = self.espmMap = bolt.DefaultLowerDict(list)
         plugin_extensions = bush.game.espm_extensions
         reReadMeMatch = Installer.reReadMe.match
+        # files with these extensions are skipped no matter what the skip
+        # rules and the attribute processing decide, drop them upfront
+        ext_skips = global_skip_ext - Installer._extensions_to_process
         #--Scan over fileSizeCrcs
-        root_path = self.extras_dict.get('root_path', u'')
-        rootIdex = len(root_path)
-        for full,size,crc in self.fileSizeCrcs:
-            if rootIdex: # exclude all files that are not under root_dir
-                if not full.startswith(root_path): continue
-            file_relative = full[rootIdex:]
-            fileLower = file_relative.lower()
-            if fileLower.startswith( # skip top level '--', 'fomod' etc
-                    Installer._silentSkipsStart) or fileLower.endswith(
-                    Installer._silentSkipsEnd): continue
-            sub = u''
+        for (full, size, crc, fileExt, file_relative, fileLower, rootLower,
+             sub, sub_relative, sub_lower, sub_root) in \
+                self._normalized_paths():
             if type_ == 2: #--Complex archive
-                split = file_relative.split(os_sep, 1)
-                if len(split) > 1:
-                    # redefine file, excluding the subpackage directory
-                    sub,file_relative = split
-                    fileLower = file_relative.lower()
-                    if fileLower.startswith(Installer._silentSkipsStart):
-                        continue # skip subpackage level '--', 'fomod' etc
+                if sub is None: continue # '--', 'fomod' etc in subpackage
+                # redefine file, excluding the subpackage directory
+                file_relative, fileLower, rootLower = sub_relative, \
+                    sub_lower, sub_root
                 if sub not in activeSubs:
                     if sub == u'':
                         skipDirFilesAdd(file_relative)
                     # Run a modified version of the normal checks, just
                     # looking for esp's for the wizard espmMap, wizard.txt
                     # and readme's
-                    rootLower,fileExt = splitExt(fileLower)
-                    rootLower = rootLower.split(os_sep, 1)
-                    if len(rootLower) == 1: rootLower = u''
-                    else: rootLower = rootLower[0]
                     skip = True
                     sub_esps = espmMap[sub] # add sub key to the espmMap
                     if fileLower == u'wizard.txt':
@@ -705,11 +730,9 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
                         if file_relative not in sub_esps: sub_esps.append(file_relative)
                     if skip:
                         continue
+            else: sub = u''
             sub_esps = espmMap[sub] #add sub key to the espmMap, needed in belt
-            rootLower,fileExt = splitExt(fileLower)
-            rootLower = rootLower.split(os_sep, 1)
-            if len(rootLower) == 1: rootLower = u''
-            else: rootLower = rootLower[0]
+            if fileExt in ext_skips: continue
             #--Skips
             for lam in skips:
                 if lam(fileLower):
@@ -791,7 +814,7 @@ def _find_root_index(self, _os_sep=os_sep, skips_start=_silentSkipsStart):
             (x, os.path.split(x[0].lower())) for x in self.fileSizeCrcs)
         self.fileSizeCrcs.sort(key=sort_keys_dict.__getitem__)
         #--Find correct starting point to treat as BAIN package
-        self.extras_dict.clear() # if more keys are added be careful cleaning
+        self.extras_dict.pop('root_path', None)
         self.fileRootIdex = 0
         dataDirsPlus = Installer.dataDirsPlus
         layout = {}
@@ -842,19 +865,23 @@ def _find_root_index(self, _os_sep=os_sep, skips_start=_silentSkipsStart):
             self.extras_dict['root_path'] = rootStr # keeps case
             self.fileRootIdex = len(rootStr)
 
-    def refreshBasic(self, progress, recalculate_project_crc=True):
-        return self._refreshBasic(progress, recalculate_project_crc)
+    def refreshBasic(self, progress, recalculate_project_crc=True,
+                     archive_listing=None):
+        return self._refreshBasic(progress, recalculate_project_crc,
+                                  archive_listing)
 
     def _refreshBasic(self, progress, recalculate_project_crc=True,
-                      _os_sep=os_sep, skips_start=tuple(
+                      archive_listing=None, _os_sep=os_sep, skips_start=tuple(
                 s.replace(os_sep, u'') for s in _silentSkipsStart)):
         """Extract file/size/crc and BAIN structure info from installer."""
         try:
-            self._refreshSource(progress, recalculate_project_crc)
+            self._refreshSource(progress, recalculate_project_crc,
+                                archive_listing)
         except InstallerArchiveError:
             self.type = -1 # size, modified and some of fileSizeCrcs may be set
             return bolt.LowerDict()
         self._find_root_index()
+        self._path_rows = None # fileSizeCrcs and root_path may have changed
         # fileRootIdex now points to the start in the file strings to ignore
         #--Type, subNames
         type_ = 0
@@ -953,6 +980,54 @@ def refreshStatus(self, installersData):
         (self.underrides,oldUnderrides) = (underrides,self.underrides)
         return self.status != oldStatus or self.underrides != oldUnderrides
 
+    def refresh_status_paths(self, installersData, paths, dirty_paths):
+        """Update missingFiles, mismatchedFiles, underrides and status like
+        refreshStatus does, but only for the given paths this installer
+        installs - and clean the given dirty_paths, if not dirty anymore."""
+        data_sizeCrc = self.ci_dest_sizeCrc
+        data_sizeCrcDate = installersData.data_sizeCrcDate
+        if self.type != 0: # for bad types status is -20 and sets are empty
+            ci_underrides_sizeCrc = installersData.ci_underrides_sizeCrc
+            missing = self.missingFiles
+            mismatched = self.mismatchedFiles
+            misEspmed = self.mismatchedEspms
+            underrides = set(self.underrides)
+            for filename in paths:
+                sizeCrc = data_sizeCrc[filename]
+                sizeCrcDate = data_sizeCrcDate.get(filename)
+                missing.discard(filename)
+                mismatched.discard(filename)
+                misEspmed.discard(filename)
+                underrides.discard(filename)
+                if not sizeCrcDate:
+                    missing.add(filename)
+                elif sizeCrc != sizeCrcDate[:2]:
+                    mismatched.add(filename)
+                    if ModInfos.rightFileType(filename):
+                        misEspmed.add(filename)
+                if sizeCrc == ci_underrides_sizeCrc.get(filename):
+                    underrides.add(filename)
+            if not data_sizeCrc: status = 0
+            elif missing: status = -10
+            elif misEspmed: status = 10
+            elif mismatched: status = 20
+            else: status = 30
+        else:
+            status, underrides = -20, set()
+        #--Clean Dirty
+        dirty_sizeCrc = self.dirty_sizeCrc
+        for filename in dirty_paths:
+            sizeCrc = dirty_sizeCrc[filename]
+            sizeCrcDate = data_sizeCrcDate.get(filename)
+            if (not sizeCrcDate or sizeCrc != sizeCrcDate[:2] or
+                sizeCrc == data_sizeCrc.get(filename)
+                ):
+                del dirty_sizeCrc[filename]
+        #--Done
+        (self.status,oldStatus) = (status,self.status)
+        (self.underrides,oldUnderrides) = (underrides,self.underrides)
+        return self.status != oldStatus or self.underrides != oldUnderrides
+
     #--Utility methods --------------------------------------------------------
     def size_or_mtime_changed(self, apath):
         return (self.size, self.modified) != apath.size_mtime()
@@ -990,13 +1065,16 @@ def __repr__(self):
         return self.__class__.__name__ + u"<" + repr(self.archive) + u">"
 
     #--ABSTRACT ---------------------------------------------------------------
-    def _refreshSource(self, progress, recalculate_project_crc):
+    def _refreshSource(self, progress, recalculate_project_crc,
+                       archive_listing=None):
         """Refresh fileSizeCrcs, size, and modified from source
         archive/directory. fileSizeCrcs is a list of tuples, one for _each_
         file in the archive or project directory. _refreshSource is called
         in refreshBasic only. In projects the src_sizeCrcDate cache is used to
         avoid recalculating crc's.
         :param recalculate_project_crc: only used in InstallerProject override
+        :param archive_listing: only used in InstallerArchive override - the
+        result of archives.list_archives for the archive, if already listed
         """
         raise AbstractError
 
@@ -1013,10 +1091,10 @@ def install(self, destFiles, progress=None):
     def _install(self, dest_src, progress):
         raise AbstractError
 
-    def _fs_install(self, dest_src, srcDirJoin, progress,
-                    subprogressPlus, unpackDir):
-        """Filesystem install, if unpackDir is not None we are installing
-         an archive."""
+    def _install_paths(self, dest_src, srcDirJoin):
+        """Return the (size, crc) of the files in dest_src keyed by their
+        Data path, the mods and ini tweaks among them and the lists of full
+        source and destination paths."""
         norm_ghost = Installer.getGhosted() # some.espm -> some.espm.ghost
         norm_ghostGet = norm_ghost.get
         data_sizeCrcDate_update = bolt.LowerDict()
@@ -1031,15 +1109,29 @@ def _fs_install(self, dest_src, srcDirJoin, progress,
                 mods.add(srcFull.tail)
             elif InstallersData._is_ini_tweak(dest):
                 inis.add(srcFull.tail)
-            data_sizeCrcDate_update[dest] = (size, crc, -1) ##: HACK we must try avoid stat'ing the mtime
+            data_sizeCrcDate_update[dest] = (size, crc)
             source_paths.append(srcFull)
             dests.append(destFull)
-            subprogressPlus()
+        return data_sizeCrcDate_update, mods, inis, source_paths, dests
+
+    def _fs_install(self, dest_src, srcDirJoin, progress, subprogress,
+                    unpackDir):
+        """Filesystem install, if unpackDir is not None we are installing
+         an archive. The files are moved/copied in one batch on a thread
+         pool - the crcs are known, so only the mtimes of the installed
+         files are read back."""
+        data_sizeCrcDate_update, mods, inis, source_paths, dests = \
+            self._install_paths(dest_src, srcDirJoin)
         #--Now Move
         try:
             if data_sizeCrcDate_update:
-                fs_operation = env.shellMove if unpackDir else env.shellCopy
-                fs_operation(source_paths, dests, progress.getParent())
+                hard_link = not unpackDir and bass.settings[
+                    'bash.installers.hardLinkProjects']
+                mtimes = env.transfer_files(source_paths, dests,
+                    move=bool(unpackDir), hard_link=hard_link,
+                    progress=subprogress, parent=progress.getParent())
+                for dest, mtime in zip(dest_src, mtimes):
+                    data_sizeCrcDate_update[dest] += (mtime,)
         finally:
             #--Clean up unpack dir if we're an archive
             if unpackDir: bass.rmTempDir()
@@ -1093,7 +1185,8 @@ def size_string(self, marker_string=u''): return marker_string
 
     def structure_string(self): return _(u'Structure: N/A')
 
-    def _refreshSource(self, progress, recalculate_project_crc):
+    def _refreshSource(self, progress, recalculate_project_crc,
+                       archive_listing=None):
         """Marker: size is -1, fileSizeCrcs empty, modified = creation time."""
         pass
 
@@ -1111,7 +1204,8 @@ def renameInstaller(self, name_new, data):
         del data[archive]
         return True, False, False
 
-    def refreshBasic(self, progress, recalculate_project_crc=True):
+    def refreshBasic(self, progress, recalculate_project_crc=True,
+                     archive_listing=None):
         return bolt.LowerDict()
 
 #------------------------------------------------------------------------------
@@ -1127,7 +1221,8 @@ def __reduce__(self):
             imap(self.__getattribute__, self.persistent))
 
     #--File Operations --------------------------------------------------------
-    def _refreshSource(self, progress, recalculate_project_crc):
+    def _refreshSource(self, progress, recalculate_project_crc,
+                       archive_listing=None):
         """Refresh fileSizeCrcs, size, modified, crc, isSolid from archive."""
         #--Basic file info
         archive_path = bass.dirs['installers'].join(self.archive)
@@ -1150,14 +1245,17 @@ def _parse_archive_line(key, value):
                     fileSizeCrcs.append((_li.filepath, _li.size, _li.crc))
                     _li.cumCRC += _li.crc
                 _li.filepath = _li.size = _li.crc = _li.isdir = 0
-        with archive_path.unicodeSafe() as tempArch:
-            try:
-                list_archive(tempArch, _parse_archive_line)
-                self.crc = _li.cumCRC & 0xFFFFFFFF
-            except:
-                archive_msg = u"Unable to read archive '%s'." % archive_path.s
-                deprint(archive_msg, traceback=True)
-                raise InstallerArchiveError(archive_msg)
+        if archive_listing is None:
+            archive_listing = next(list_archives([archive_path]))
+        tempArch, archive_listing = archive_listing
+        try:
+            list_archive(tempArch, _parse_archive_line,
+                         archive_listing=archive_listing)
+            self.crc = _li.cumCRC & 0xFFFFFFFF
+        except:
+            archive_msg = u"Unable to read archive '%s'." % archive_path.s
+            deprint(archive_msg, traceback=True)
+            raise InstallerArchiveError(archive_msg)
 
     def unpackToTemp(self, fileNames, progress=None, recurse=False):
         """Erases all files from self.tempDir and then extracts specified files
@@ -1189,6 +1287,9 @@ def unpackToTemp(self, fileNames, progress=None, recurse=False):
         return unpack_dir
 
     def _install(self, dest_src, progress):
+        if not self.isSolid:
+            installed = self._stream_install(dest_src, progress)
+            if installed is not None: return installed
         #--Extract
         progress(0, self.archive + u'\n' + _(u'Extracting files...'))
         unpackDir = self.unpackToTemp(dest_src.values(),
@@ -1197,10 +1298,26 @@ def _install(self, dest_src, progress):
         progress(0.9, self.archive + u'\n' + _(u'Organizing files...'))
         srcDirJoin = unpackDir.join
         subprogress = SubProgress(progress,0.9,1.0)
-        subprogress.setFull(len(dest_src))
-        subprogressPlus = subprogress.plus
-        return self._fs_install(dest_src, srcDirJoin, progress,
-                                subprogressPlus, unpackDir)
+        return self._fs_install(dest_src, srcDirJoin, progress, subprogress,
+                                unpackDir)
+
+    def _stream_install(self, dest_src, progress):
+        """Install by extracting the files straight to their Data paths,
+        verifying their crcs on the fly - return None if the archive can't
+        be read that way, so we must go through the temp dir."""
+        data_sizeCrcDate_update, mods, inis, source_paths, dests = \
+            self._install_paths(dest_src, GPath)
+        ci_dest_sizeCrc = self.ci_dest_sizeCrc
+        member_dests = [(src.s, destFull, ci_dest_sizeCrc[dest][1]) for
+            src, destFull, dest in zip(source_paths, dests, dest_src)]
+        apath = bass.dirs['installers'].join(self.archive)
+        progress.setFull(len(member_dests))
+        mtimes = archives.extract_to_destinations(apath, member_dests,
+            progress, parent=progress.getParent())
+        if mtimes is None: return None
+        for dest, mtime in zip(dest_src, mtimes):
+            data_sizeCrcDate_update[dest] += (mtime,)
+        return data_sizeCrcDate_update, mods, inis
 
     def unpackToProject(self, project, progress=None):
         """Unpacks archive to build directory."""
@@ -1308,6 +1425,17 @@ class InstallerProject(Installer):
     __slots__ = tuple() #--No new slots
     type_string = _(u'Project')
 
+    def _set_snapshot(self, snapshot):
+        """Store snapshot unless it holds the same listing as the stored
+        one - InstallersData only saves the snapshots that were replaced."""
+        old = self._dir_snapshot
+        if old is not None and old['fingerprint'] == snapshot[
+                'fingerprint'] and old['verified'] == snapshot['verified'] \
+                and not any(old['dirs'].get(rel_dir, (None,))[0] != entry[0]
+                            for rel_dir, entry in snapshot['dirs'].iteritems()):
+            return
+        self._dir_snapshot = snapshot
+
     def __reduce__(self):
         from . import InstallerProject as boshInstallerProject
         self._fixme_drop__for_loading_in_previous_versions()
@@ -1331,24 +1459,21 @@ def _refresh_from_project_dir(self, progress=None,
         progress(0, progress_msg + u'\n')
         progress.setFull(1)
         asRoot = apRoot.s
-        relPos = len(asRoot) + 1
-        max_mtime = apRoot.mtime
         pending, pending_size = bolt.LowerDict(), 0
         new_sizeCrcDate = bolt.LowerDict()
         oldGet = self.src_sizeCrcDate.get
-        walk = self._dir_dirs_files if self._dir_dirs_files is not None else bolt.walkdir(asRoot)
-        for asDir, __sDirs, sFiles in walk:
-            progress(0.05, progress_msg + (u'\n%s' % asDir[relPos:]))
-            get_mtime = os.path.getmtime(asDir)
-            max_mtime = max_mtime if max_mtime >= get_mtime else get_mtime
-            rsDir = asDir[relPos:]
-            for sFile in sFiles:
-                rpFile = os.path.join(rsDir, sFile)
-                asFile = os.path.join(asDir, sFile)
-                # below calls may now raise even if "werr.winerror = 123"
-                lstat = os.lstat(asFile)
-                size, date = lstat.st_size, int(lstat.st_mtime)
-                max_mtime = max_mtime if max_mtime >= date else date
+        # reuse the snapshot of the scan that found the project changed,
+        # else this is an explicit refresh - stat everything
+        snapshot = self._dir_dirs_files if self._dir_dirs_files is not None \
+            else self._walk_snapshot(asRoot, full_walk=True)
+        join = os.path.join
+        for rsDir, (_dir_mtime, files, _subdirs, _crc) in sorted(
+                snapshot['dirs'].iteritems()):
+            progress(0.05, progress_msg + (u'\n%s' % rsDir))
+            asDir = join(asRoot, rsDir)
+            for sFile, size, date in files:
+                rpFile = join(rsDir, sFile)
+                asFile = join(asDir, sFile)
                 oSize, oCrc, oDate = oldGet(rpFile, (0, 0, 0))
                 if size == oSize and date == oDate:
                     new_sizeCrcDate[rpFile] = (oSize, oCrc, oDate, asFile)
@@ -1358,33 +1483,63 @@ def _refresh_from_project_dir(self, progress=None,
         Installer.final_update(new_sizeCrcDate, self.src_sizeCrcDate, pending,
                                pending_size, progress, recalculate_all_crcs,
                                rootName)
+        self._set_snapshot(snapshot)
         #--Done
-        return int(max_mtime)
-
-    def size_or_mtime_changed(self, apath, _lstat=os.lstat):
-        #FIXME(ut): getmtime(True) won't detect all changes - for instance COBL
-        # has 3/25/2020 8:02:00 AM modification time if unpacked and no
-        # amount of internal shuffling won't change its apath.getmtime(True)
-        getM, join = os.path.getmtime, os.path.join
-        c, size = [], 0
-        cExtend, cAppend = c.extend, c.append
-        self._dir_dirs_files = []
-        for root, d, files in bolt.walkdir(apath.s):
-            cAppend(getM(root))
-            stats = [_lstat(join(root, fi)) for fi in files]
-            cExtend(fi.st_mtime for fi in stats)
-            size += sum(fi.st_size for fi in stats)
-            self._dir_dirs_files.append((root, [], files)) # dirs is unused
+        return _snapshot_mtime(snapshot)
+
+    def _walk_snapshot(self, asRoot, full_walk=False):
+        """Return an up to date snapshot of the project directory - a dict
+        holding the (mtime, files, subdirs, crc) of each directory keyed by
+        its path relative to asRoot, where files are (name, size, mtime)
+        tuples, and a fingerprint of the whole tree. Only directories whose
+        mtime changed since the last snapshot are listed again - adding,
+        removing or renaming files changes the mtime of their directory but
+        editing them in place does not, so everything is stat'ed if
+        full_walk is True or if the last full walk is older than
+        'bash.installers.projectsVerifyInterval' seconds."""
+        old = self._dir_snapshot
+        now = time.time()
+        if full_walk or old is None or now - old['verified'] > bass.settings[
+                'bash.installers.projectsVerifyInterval']:
+            old_dirs, verified = {}, now
+        else:
+            old_dirs, verified = old['dirs'], old['verified']
+        dirs, join, getmtime = {}, os.path.join, os.path.getmtime
+        pending = [u'']
+        while pending:
+            rel_dir = pending.pop()
+            as_dir = join(asRoot, rel_dir)
+            try:
+                dir_mtime = getmtime(as_dir)
+                dir_entry = old_dirs.get(rel_dir)
+                if dir_entry is None or dir_entry[0] != dir_mtime:
+                    dir_entry = _list_dir(as_dir, dir_mtime)
+            except OSError:
+                if not rel_dir: raise
+                continue # removed while we were walking
+            dirs[rel_dir] = dir_entry
+            pending.extend(join(rel_dir, d) for d in dir_entry[2])
+        fingerprint = crc32(u''.join(u'%s:%08X\n' % (rel_dir, dirs[rel_dir][3])
+            for rel_dir in sorted(dirs)).encode('utf8')) & 0xFFFFFFFF
+        return {'verified': verified, 'dirs': dirs, 'fingerprint': fingerprint}
+
+    def size_or_mtime_changed(self, apath):
+        """Return True if the project changed since it was last refreshed -
+        a different fingerprint catches files renamed or moved around inside
+        the project, which the max mtime of the tree would not. The snapshot
+        is kept for the refresh that follows, if any."""
+        snapshot = self._dir_dirs_files = self._walk_snapshot(apath.s)
+        size = sum(size for dir_entry in snapshot['dirs'].itervalues() for
+                   _name, size, _mtime in dir_entry[1])
         if self.size != size: return True
-        # below is for the fix me - we need to add mtimes_str_crc extra persistent attribute to Installer
-        # c.sort() # is this needed or os.walk will return the same order during program run
-        # mtimes_str = '.'.join(map(str, c))
-        # mtimes_str_crc = crc32(mtimes_str)
-        try:
-            mtime = int(max(c))
-        except ValueError: # int(max([]))
-            mtime = 0
-        return self.modified != mtime
+        old = self._dir_snapshot
+        if old is None: # not walked yet, or snapshots file deleted
+            changed = self.modified != _snapshot_mtime(snapshot)
+        else:
+            changed = old['fingerprint'] != snapshot['fingerprint']
+        if not changed: # keep the time of the last full walk, if it advanced
+            self._set_snapshot(snapshot)
+        return changed
 
     @staticmethod
     def removeEmpties(name):
@@ -1396,7 +1551,8 @@ def removeEmpties(name):
         for empty in empties: empty.removedirs()
         projectDir.makedirs() #--In case it just got wiped out.
 
-    def _refreshSource(self, progress, recalculate_project_crc):
+    def _refreshSource(self, progress, recalculate_project_crc,
+                       archive_listing=None):
         """Refresh src_sizeCrcDate, fileSizeCrcs, size, modified, crc from
         project directory, set project_refreshed to True."""
         self.modified = self._refresh_from_project_dir(progress,
@@ -1415,13 +1571,11 @@ def _refreshSource(self, progress, recalculate_project_crc):
         self.project_refreshed = True
 
     def _install(self, dest_src, progress):
-        progress.setFull(len(dest_src))
         progress(0, self.archive + u'\n' + _(u'Moving files...'))
-        progressPlus = progress.plus
         #--Copy Files
         srcDir = bass.dirs['installers'].join(self.archive)
         srcDirJoin = srcDir.join
-        return self._fs_install(dest_src, srcDirJoin, progress, progressPlus,
+        return self._fs_install(dest_src, srcDirJoin, progress, progress,
                                 None)
 
     def syncToData(self, projFiles):
@@ -1437,6 +1591,7 @@ def syncToData(self, projFiles):
         updated = removed = 0
         norm_ghost = Installer.getGhosted()
         projDir = bass.dirs['installers'].join(self.archive)
+        sources, targets = [], []
         for src,proj in srcProj:
             srcFull = srcDir.join(norm_ghost.get(src,src))
             projFull = projDir.join(proj)
@@ -1444,8 +1599,10 @@ def syncToData(self, projFiles):
                 projFull.remove()
                 removed += 1
             else:
-                srcFull.copyTo(projFull)
-                updated += 1
+                sources.append(srcFull)
+                targets.append(projFull)
+        env.transfer_files(sources, targets)
+        updated = len(sources)
         self.removeEmpties(self.archive)
         return updated,removed
 
@@ -1504,12 +1661,44 @@ def _open_txt_file(self, rel_path):
     def wizard_file(self):
         return bass.dirs['installers'].join(self.archive, self.hasWizard)
 
-def projects_walk_cache(func): ##: HACK ! Profile
+def _list_dir(as_dir, dir_mtime):
+    """Return the (mtime, files, subdirs, crc) snapshot entry for as_dir -
+    see InstallerProject._walk_snapshot. Symlinks to directories are
+    skipped, like os.walk does."""
+    files, subdirs, join = [], [], os.path.join
+    if bolt.scandir is not None: # stats come for free on windows
+        for entry in bolt.scandir.scandir(as_dir):
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif not entry.is_dir():
+                st = entry.stat(follow_symlinks=False)
+                files.append((entry.name, st.st_size, int(st.st_mtime)))
+    else:
+        for name in os.listdir(as_dir):
+            as_path = join(as_dir, name)
+            st = os.lstat(as_path)
+            if stat.S_ISDIR(st.st_mode):
+                subdirs.append(name)
+            elif not (stat.S_ISLNK(st.st_mode) and os.path.isdir(as_path)):
+                files.append((name, st.st_size, int(st.st_mtime)))
+    files.sort()
+    subdirs.sort()
+    dir_crc = crc32(u''.join(u'%s:%d:%d\n' % f for f in files).encode('utf8'))
+    dir_crc = crc32(u'/'.join(subdirs).encode('utf8'), dir_crc)
+    return dir_mtime, tuple(files), tuple(subdirs), dir_crc & 0xFFFFFFFF
+
+def _snapshot_mtime(snapshot):
+    """Return the max mtime of the directories and files in snapshot."""
+    return int(max(max(dir_mtime, max(f[2] for f in files) if files else 0)
+                   for dir_mtime, files, _subdirs, _crc in
+                   snapshot['dirs'].itervalues()))
+
+def projects_walk_cache(func):
     """Decorator to make sure I dont leak self._dir_dirs_files project cache.
     Must decorate all methods that may call size_or_mtime_changed (only
-    called in scan_installers_dir). For self._dir_dirs_files to be of any use
-    the call to scan_installers_dir must be followed by refreshBasic calls
-    on the projects."""
+    called in scan_installers_dir), which keeps the directory snapshot it
+    takes so the refreshBasic calls on the changed projects that follow the
+    call to scan_installers_dir won't walk them again."""
     @wraps(func)
     def _projects_walk_cache_wrapper(self, *args, **kwargs):
         try:
@@ -1523,6 +1712,69 @@ def _projects_walk_cache_wrapper(self, *args, **kwargs):
     return _projects_walk_cache_wrapper
 
 #------------------------------------------------------------------------------
+class _TrackedLowerDict(LowerDict):
+    """LowerDict that records the keys whose values were changed, added or
+    removed till the next pop_changed call."""
+    __slots__ = ('_changed',)
+
+    def __init__(self, mapping=(), **kwargs):
+        super(_TrackedLowerDict, self).__init__(mapping, **kwargs)
+        self._changed = set()
+
+    def pop_changed(self):
+        """Return the keys changed since the last call."""
+        changed, self._changed = self._changed, set()
+        return changed
+
+    def __setitem__(self, k, v):
+        if self.get(k, self) != v: self._changed.add(CIstr(k))
+        super(_TrackedLowerDict, self).__setitem__(k, v)
+
+    def __delitem__(self, k):
+        super(_TrackedLowerDict, self).__delitem__(k)
+        self._changed.add(CIstr(k))
+
+    def pop(self, k, *args):
+        if k in self: self._changed.add(CIstr(k))
+        return super(_TrackedLowerDict, self).pop(k, *args)
+
+    def setdefault(self, k, default=None):
+        if k not in self: self._changed.add(CIstr(k))
+        return super(_TrackedLowerDict, self).setdefault(k, default)
+
+    def update(self, mapping=(), **kwargs):
+        for k, v in self._process_args(mapping, **kwargs): self[k] = v
+
+    def clear(self):
+        self._changed.update(self)
+        super(_TrackedLowerDict, self).clear()
+
+    def popitem(self):
+        k, v = super(_TrackedLowerDict, self).popitem()
+        self._changed.add(k)
+        return k, v
+
+def _moved_indices(old_positions):
+    """Return the indices of the items of old_positions that are not in a
+    longest increasing subsequence of it - when old_positions are the old
+    positions of items in their new order, those are the items that were
+    moved: the relative order of all other items is unchanged."""
+    tails, tails_dex, prev = [], [], [None] * len(old_positions)
+    for dex, pos in enumerate(old_positions):
+        i = bisect.bisect_left(tails, pos)
+        if i: prev[dex] = tails_dex[i - 1]
+        if i == len(tails):
+            tails.append(pos)
+            tails_dex.append(dex)
+        else:
+            tails[i], tails_dex[i] = pos, dex
+    in_order = set()
+    dex = tails_dex[-1] if tails_dex else None
+    while dex is not None:
+        in_order.add(dex)
+        dex = prev[dex]
+    return [dex for dex in xrange(len(old_positions)) if dex not in in_order]
+
 class InstallersData(DataStore):
     """Installers tank data. This is the data source for the InstallersList."""
     # track changes in installed mod inis etc _in the game Data/ dir_ and
@@ -1547,14 +1799,25 @@ def __init__(self):
         self.bash_dir.makedirs()
         #--Persistent data
         self.dictFile = bolt.PickleDict(self.bash_dir.join(u'Installers.dat'))
+        self._snapshots_file = bolt.PickleDict(
+            self.bash_dir.join(u'ProjectSnapshots.dat'))
         self.data = {}
-        self.data_sizeCrcDate = bolt.LowerDict()
+        self.data_sizeCrcDate = _TrackedLowerDict()
         from . import converters
         self.converters_data = converters.ConvertersData(bass.dirs['bainData'],
             bass.dirs['converters'], bass.dirs['dupeBCFs'],
             bass.dirs['corruptBCFs'], bass.dirs['installers'])
+        from .content_store import ContentStore
+        self.content_store = ContentStore(
+            self.bash_dir.join(u'Content Store'))
         #--Volatile
         self.ci_underrides_sizeCrc = bolt.LowerDict() # underridden files
+        # index of the files installers install, see _collect_changes
+        self._dest_providers = None # type: LowerDict
+        self._indexed_installers = {}
+        self._indexed_data = None
+        self._norm_pending = self._status_pending = None # None: all paths
+        self._status_full = set()
         self.bcfPath_sizeCrcDate = {}
         self.hasChanged = False
         self.loaded = False
@@ -1591,13 +1854,22 @@ def irefresh(self, progress=None, what='DIONSC', fullRefresh=False,
         #--Last marker
         if self.lastKey not in self.data:
             self.data[self.lastKey] = InstallerMarker(self.lastKey)
-        if fullRefresh: # BAIN uses modInfos crc cache
-            with balt.BusyCursor(): modInfos.refresh_crcs()
-        #--Refresh Other - FIXME(ut): docs
-        if 'D' in what:
-            changed |= self._refresh_from_data_dir(progress, fullRefresh)
-        if 'I' in what: changed |= self._refreshInstallers(
-            progress, fullRefresh, refresh_info, deleted, pending, projects)
+        try:
+            if fullRefresh: # BAIN uses modInfos crc cache
+                if refresh_info is not None:
+                    refreshed = refresh_info.pending & refresh_info.projects
+                elif pending is not None: # see _refreshInstallers
+                    refreshed = set(pending) & set(projects or ())
+                else: refreshed = None # all, the installers dir is scanned
+                self._precalc_crcs(progress, what, refreshed)
+            #--Refresh Other - FIXME(ut): docs
+            if 'D' in what:
+                changed |= self._refresh_from_data_dir(progress, fullRefresh)
+            if 'I' in what: changed |= self._refreshInstallers(
+                progress, fullRefresh, refresh_info, deleted, pending,
+                projects)
+        finally:
+            Installer._full_refresh_crcs.clear()
         if 'O' in what or changed: changed |= self.refreshOrder()
         if 'N' in what or changed: changed |= self.refreshNorm()
         if 'S' in what or changed: changed |= self.refreshInstallersStatus()
@@ -1607,24 +1879,82 @@ def irefresh(self, progress=None, what='DIONSC', fullRefresh=False,
         if changed: self.hasChanged = True
         return changed
 
+    def _precalc_crcs(self, progress, what, refreshed_projects=None):
+        """Calculate the crcs of all the plugins, Data files (if 'D' in
+        what) and files of the projects to refresh (if 'I' in what - all of
+        them if refreshed_projects is None) in one go, reading files in
+        parallel and hard linked files only once, for the refreshes that
+        follow to pick them up from Installer._full_refresh_crcs. The
+        projects keep the snapshots of their directories taken here."""
+        from . import modInfos
+        progress(0, _(u'Full Refresh: Scanning...'))
+        planned = [] # (abs path, size, mtime) tuples
+        mod_paths = [inf.abs_path.s for inf in modInfos.itervalues()]
+        if 'D' in what:
+            dirDirsFiles, _emptyDirs = self._walk_data_dir(SubProgress(
+                progress, 0, 0.05))
+            new_sizeCrcDate, pending, _pending_size = self._process_data_dir(
+                dirDirsFiles, SubProgress(progress, 0.05, 0.1))
+            new_sizeCrcDate.update(pending)
+            planned.extend((asFile, size, date) for size, _crc, date, asFile
+                           in new_sizeCrcDate.itervalues())
+        if 'I' in what:
+            for key, installer in self.iteritems():
+                if not isinstance(installer, InstallerProject) or (
+                        refreshed_projects is not None and
+                        key not in refreshed_projects): continue
+                asRoot = self.store_dir.join(installer.archive).s
+                if not os.path.isdir(asRoot): continue
+                snapshot = installer._walk_snapshot(asRoot, full_walk=True)
+                installer._dir_dirs_files = snapshot # see projects_walk_cache
+                join = os.path.join
+                for rsDir, dir_entry in snapshot['dirs'].iteritems():
+                    planned.extend((join(asRoot, rsDir, sFile), size, date)
+                                   for sFile, size, date in dir_entry[1])
+        crcs = bolt.calc_file_crcs(chain(mod_paths, (x[0] for x in planned)),
+            SubProgress(progress, 0.1, 1), _(u'Full Refresh: Calculating '
+                                             u'CRCs...'))
+        modInfos.refresh_crcs(_path_crcs=crcs)
+        Installer._full_refresh_crcs.update(
+            (x, crcs[x[0]]) for x in planned if x[0] in crcs)
+
     def __load(self, progress):
         progress(0, _(u"Loading Data..."))
         self.dictFile.load()
         self.converters_data.load()
         data = self.dictFile.data
         self.data = data.get('installers', {})
-        pickle = data.get('sizeCrcDate', {})
-        self.data_sizeCrcDate = bolt.LowerDict(pickle) if not isinstance(
-            pickle, bolt.LowerDict) else pickle
+        self.data_sizeCrcDate = _TrackedLowerDict(
+            data.get('sizeCrcDate', {}))
         # fixup: all markers had their archive attribute set to u'===='
         for key, value in self.iteritems():
             if isinstance(value, InstallerMarker):
                 value.archive = key.s
+            elif isinstance(value, InstallerProject) and isinstance(
+                    value.extras_dict, dict): # snapshots used to live here
+                value.extras_dict.pop('dir_snapshot', None)
+        # directory snapshots of the projects live in their own file, so that
+        # Installers.dat does not carry a stat entry for every project file
+        self._snapshots_file.load()
+        snapshots = self._snapshots_file.data
+        for key, value in self.iteritems():
+            if isinstance(value, InstallerProject) and \
+                    value._dir_snapshot is None:
+                value._dir_snapshot = snapshots.get(key)
         self.loaded = True
         return True
 
     def save(self):
         """Saves to pickle file."""
+        self.content_store.save()
+        snapshots = dict((k, v._dir_snapshot) for k, v in self.iteritems()
+            if isinstance(v, InstallerProject) and v._dir_snapshot is not None)
+        stored = self._snapshots_file.data
+        if len(snapshots) != len(stored) or any(
+                stored.get(k) is not v for k, v in snapshots.iteritems()):
+            stored.clear()
+            stored.update(snapshots)
+            self._snapshots_file.save()
         if self.hasChanged:
             self.dictFile.data['installers'] = self.data
             self.dictFile.data['sizeCrcDate'] = dict( # FIXME: backwards compat
@@ -1732,15 +2062,24 @@ def _refreshInstallers(self, progress, fullRefresh, refresh_info, deleted,
             if not subPending: continue
             progress(0,_(u"Scanning Packages..."))
             progress.setFull(len(subPending))
-            for index,package in enumerate(sorted(subPending)):
-                progress(index,_(u'Scanning Packages...')+u'\n'+package.s)
-                self.refresh_installer(package, is_project, progress,
-                                       _index=index, _fullRefresh=fullRefresh)
+            subPending = sorted(subPending)
+            # list the archives concurrently - results come back in order
+            listings = None if is_project else list_archives(
+                [self.store_dir.join(package) for package in subPending])
+            try:
+                for index,package in enumerate(subPending):
+                    progress(index,_(u'Scanning Packages...')+u'\n'+package.s)
+                    self.refresh_installer(package, is_project, progress,
+                        _index=index, _fullRefresh=fullRefresh,
+                        _archive_listing=listings and next(listings))
+            finally:
+                if listings is not None: listings.close()
         return changed
 
     def refresh_installer(self, package, is_project, progress,
                           install_order=None, do_refresh=False, _index=None,
-                          _fullRefresh=False, __types=[]):
+                          _fullRefresh=False, _archive_listing=None,
+                          __types=[]):
         if not __types: # use the bosh types
             from . import InstallerArchive, InstallerProject
             __types = [InstallerArchive, InstallerProject]
@@ -1751,7 +2090,8 @@ def refresh_installer(self, package, is_project, progress,
                 self.moveArchives([package], install_order)
         if _index is not None:
             progress = SubProgress(progress, _index, _index + 1)
-        installer.refreshBasic(progress, recalculate_project_crc=_fullRefresh)
+        installer.refreshBasic(progress, recalculate_project_crc=_fullRefresh,
+                               archive_listing=_archive_listing)
         progress(1.0, _(u'Done'))
         if do_refresh:
             self.irefresh(what='NS')
@@ -1889,30 +2229,149 @@ def refreshOrder(self):
                 changed = True
         return changed
 
+    def _collect_changes(self):
+        """Update the index of the installers' destination files for the
+        installers whose files changed, and queue the paths whose underrides
+        and status may have changed for refreshNorm and
+        refreshInstallersStatus: the files of installers whose files,
+        activation or relative order changed, and the Data files that changed.
+        The index maps each file to the installers that provide it, so a
+        reorder or an install touches only the files of the moved/installed
+        packages instead of all files of all packages."""
+        data_sizeCrcDate = self.data_sizeCrcDate
+        if self._dest_providers is None or \
+                self._indexed_data is not data_sizeCrcDate:
+            self._rebuild_index()
+            return
+        touched = data_sizeCrcDate.pop_changed()
+        indexed = self._indexed_installers
+        status_full = self._status_full
+        current, reordered = set(), []
+        for installer in self.itervalues():
+            current.add(installer)
+            dests = installer.ci_dest_sizeCrc
+            old = indexed.get(installer)
+            if old is None or old[0] is not dests:
+                if old is not None:
+                    self._unindex(installer, old[0])
+                    touched.update(old[0])
+                self._index(installer, dests)
+                touched.update(dests)
+                status_full.add(installer)
+            else:
+                old_dests, old_order, old_active, old_type = old
+                if old_active != installer.is_active: touched.update(dests)
+                if old_type != installer.type: status_full.add(installer)
+                reordered.append((installer.order, old_order, installer))
+            indexed[installer] = (dests, installer.order, installer.is_active,
+                                  installer.type)
+        for installer in [x for x in indexed if x not in current]: # deleted
+            old_dests = indexed.pop(installer)[0]
+            self._unindex(installer, old_dests)
+            touched.update(old_dests)
+            status_full.discard(installer)
+        if any(new != old for new, old, _inst in reordered):
+            reordered.sort(key=itemgetter(0))
+            for dex in _moved_indices([old for _new, old, _inst in reordered]):
+                touched.update(reordered[dex][2].ci_dest_sizeCrc)
+        if self._norm_pending is not None: self._norm_pending |= touched
+        if self._status_pending is not None: self._status_pending |= touched
+
+    def _rebuild_index(self):
+        self._dest_providers = LowerDict()
+        self._indexed_installers.clear()
+        for installer in self.itervalues():
+            self._index(installer, installer.ci_dest_sizeCrc)
+            self._indexed_installers[installer] = (installer.ci_dest_sizeCrc,
+                installer.order, installer.is_active, installer.type)
+        self._indexed_data = self.data_sizeCrcDate
+        self.data_sizeCrcDate.pop_changed()
+        self._norm_pending = self._status_pending = None
+        self._status_full.clear()
+
+    def _index(self, installer, dests):
+        providers = self._dest_providers
+        for path in dests:
+            providers[path] = providers.get(path, ()) + (installer,)
+
+    def _unindex(self, installer, dests):
+        providers = self._dest_providers
+        for path in dests:
+            remaining = tuple(x for x in providers.get(path, ()) if
+                              x is not installer)
+            if remaining: providers[path] = remaining
+            else: providers.pop(path, None)
+
+    def _norm_sizeCrc(self, path):
+        """Return the size and crc path should have if installed by the
+        active installers, or None if no active installer provides it."""
+        top = None
+        for installer in self._dest_providers.get(path, ()):
+            if installer.is_active and (top is None or
+                                        installer.order > top.order):
+                top = installer
+        return top and top.ci_dest_sizeCrc[path]
+
     def refreshNorm(self):
         """Populate self.ci_underrides_sizeCrc with all underridden files."""
-        active_sorted = (x for x in self.sorted_values() if x.is_active)
-        #--dict mapping all should-be-installed files to their attributes
-        norm_sizeCrc = bolt.LowerDict()
-        for package in active_sorted:
-            norm_sizeCrc.update(package.ci_dest_sizeCrc)
-        #--Abnorm
-        ci_underrides_sizeCrc = bolt.LowerDict()
+        self._collect_changes()
         dataGet = self.data_sizeCrcDate.get
-        for path,sizeCrc in norm_sizeCrc.iteritems():
-            sizeCrcDate = dataGet(path)
-            if sizeCrcDate and sizeCrc != sizeCrcDate[:2]: # file is installed
-                # in data dir, but from a lower loading installer (or manually)
-                ci_underrides_sizeCrc[path] = sizeCrcDate[:2]
-        self.ci_underrides_sizeCrc, oldAbnorm_sizeCrc = \
-            ci_underrides_sizeCrc, self.ci_underrides_sizeCrc
-        return ci_underrides_sizeCrc != oldAbnorm_sizeCrc
+        if self._norm_pending is None:
+            active_sorted = (x for x in self.sorted_values() if x.is_active)
+            #--dict mapping all should-be-installed files to their attributes
+            norm_sizeCrc = bolt.LowerDict()
+            for package in active_sorted:
+                norm_sizeCrc.update(package.ci_dest_sizeCrc)
+            #--Abnorm
+            ci_underrides_sizeCrc = bolt.LowerDict()
+            for path,sizeCrc in norm_sizeCrc.iteritems():
+                sizeCrcDate = dataGet(path)
+                if sizeCrcDate and sizeCrc != sizeCrcDate[:2]: # file is
+                    # installed in data dir, but from a lower loading
+                    # installer (or manually)
+                    ci_underrides_sizeCrc[path] = sizeCrcDate[:2]
+            self.ci_underrides_sizeCrc, oldAbnorm_sizeCrc = \
+                ci_underrides_sizeCrc, self.ci_underrides_sizeCrc
+            changed = ci_underrides_sizeCrc != oldAbnorm_sizeCrc
+        else: # only update the paths that may have changed
+            ci_underrides_sizeCrc = self.ci_underrides_sizeCrc
+            changed = False
+            for path in self._norm_pending:
+                sizeCrc = self._norm_sizeCrc(path)
+                sizeCrcDate = dataGet(path)
+                if sizeCrc and sizeCrcDate and sizeCrc != sizeCrcDate[:2]:
+                    if ci_underrides_sizeCrc.get(path) != sizeCrcDate[:2]:
+                        ci_underrides_sizeCrc[path] = sizeCrcDate[:2]
+                        changed = True
+                elif ci_underrides_sizeCrc.pop(path, None) is not None:
+                    changed = True
+        self._norm_pending = set()
+        return changed
 
     def refreshInstallersStatus(self):
         """Refresh installer status."""
+        self._collect_changes()
         changed = False
-        for installer in self.itervalues():
-            changed |= installer.refreshStatus(self)
+        if self._status_pending is None:
+            for installer in self.itervalues():
+                changed |= installer.refreshStatus(self)
+        else: # only update the installers and paths that may have changed
+            pending = self._status_pending
+            installer_paths = collections.defaultdict(list)
+            for path in pending:
+                for installer in self._dest_providers.get(path, ()):
+                    installer_paths[installer].append(path)
+            for installer in self.itervalues():
+                if installer in self._status_full:
+                    changed |= installer.refreshStatus(self)
+                    continue
+                paths = installer_paths.get(installer)
+                dirty = [x for x in installer.dirty_sizeCrc if x in pending]
+                if paths or dirty:
+                    changed |= installer.refresh_status_paths(self, paths or (),
+                                                              dirty)
+        self._status_pending = set()
+        self._status_full.clear()
         return changed
 
     def _refresh_from_data_dir(self, progress=None, recalculate_all_crcs=False):
@@ -1925,18 +2384,7 @@ def _refresh_from_data_dir(self, progress=None, recalculate_all_crcs=False):
         dirs if the setting is on."""
         #--Scan for changed files
         progress = progress if progress else bolt.Progress()
-        progress_msg = bass.dirs['mods'].stail + u': ' + _(u'Pre-Scanning...')
-        progress(0, progress_msg + u'\n')
-        progress.setFull(1)
-        dirDirsFiles, emptyDirs = [], set()
-        dirDirsFilesAppend, emptyDirsAdd = dirDirsFiles.append, emptyDirs.add
-        asRoot = bass.dirs['mods'].s
-        relPos = len(asRoot) + 1
-        for asDir, sDirs, sFiles in bolt.walkdir(asRoot):
-            progress(0.05, progress_msg + (u'\n%s' % asDir[relPos:]))
-            if not (sDirs or sFiles): emptyDirsAdd(GPath(asDir))
-            if asDir == asRoot: InstallersData._skips_in_data_dir(sDirs)
-            dirDirsFilesAppend((asDir, sDirs, sFiles))
+        dirDirsFiles, emptyDirs = self._walk_data_dir(progress)
         progress(0, _(u"%s: Scanning...") % bass.dirs['mods'].stail)
         new_sizeCrcDate, pending, pending_size = \
             self._process_data_dir(dirDirsFiles, progress)
@@ -1954,6 +2402,24 @@ def _refresh_from_data_dir(self, progress=None, recalculate_all_crcs=False):
         #--Done
         return changed
 
+    @staticmethod
+    def _walk_data_dir(progress):
+        """Walk the Data dir, skipping the directories skipped by the
+        global settings - return the walk output and the empty dirs."""
+        progress_msg = bass.dirs['mods'].stail + u': ' + _(u'Pre-Scanning...')
+        progress(0, progress_msg + u'\n')
+        progress.setFull(1)
+        dirDirsFiles, emptyDirs = [], set()
+        dirDirsFilesAppend, emptyDirsAdd = dirDirsFiles.append, emptyDirs.add
+        asRoot = bass.dirs['mods'].s
+        relPos = len(asRoot) + 1
+        for asDir, sDirs, sFiles in bolt.walkdir(asRoot):
+            progress(0.05, progress_msg + (u'\n%s' % asDir[relPos:]))
+            if not (sDirs or sFiles): emptyDirsAdd(GPath(asDir))
+            if asDir == asRoot: InstallersData._skips_in_data_dir(sDirs)
+            dirDirsFilesAppend((asDir, sDirs, sFiles))
+        return dirDirsFiles, emptyDirs
+
     def _process_data_dir(self, dirDirsFiles, progress):
         """Construct dictionaries mapping the paths in dirDirsFiles to
         filesystem attributes. Old data_SizeCrcDate is used to decide which
@@ -2262,8 +2728,19 @@ def _install(self, packages, refresh_ui, progress=None, last=False,
     def __installer_install(self, installer, destFiles, index, progress,
                             refresh_ui):
         sub_progress = SubProgress(progress, index, index + 1)
+        use_store = bass.settings['bash.installers.contentStore']
+        if use_store:
+            linked = self._install_from_store(installer, destFiles,
+                                              sub_progress)
+            destFiles = set(destFiles).difference(linked)
         data_sizeCrcDate_update, mods, inis = installer.install(destFiles,
                                                                 sub_progress)
+        if use_store:
+            mods_dir = bass.dirs['mods'].s
+            self.content_store.add((os.path.join(mods_dir, dest), s, c) for
+                dest, (s, c, _d) in data_sizeCrcDate_update.iteritems() if
+                self._storable(dest, s))
+            data_sizeCrcDate_update.update(linked)
         refresh_ui[0] |= bool(mods)
         refresh_ui[1] |= bool(inis)
         # refresh modInfos, iniInfos adding new/modified mods
@@ -2286,6 +2763,68 @@ def __installer_install(self, installer, destFiles, index, progress,
         for ini in inis:
             iniInfos.new_info(ini, owner=installer.archive)
 
+    @staticmethod
+    def _storable(ci_dest, size):
+        """Return True if the file may be served from the content store -
+        plugins and commonly edited files are never hard linked."""
+        ext = ci_dest[ci_dest.rfind(u'.'):].lower()
+        return size and ext not in Installer.commonlyEditedExts and \
+               ext not in bush.game.espm_extensions
+
+    def _install_from_store(self, installer, destFiles, progress):
+        """Hard link the files in destFiles that are in the content store
+        into Data - return the data_sizeCrcDate entries of the linked
+        files."""
+        store_get = self.content_store.lookup
+        sources, dests, linked = [], [], bolt.LowerDict()
+        linked_order = []
+        mods_dir = bass.dirs['mods']
+        for dest in destFiles:
+            size, crc = installer.ci_dest_sizeCrc[dest]
+            if not self._storable(dest, size): continue
+            store_path = store_get(size, crc)
+            if store_path is None: continue
+            sources.append(GPath(store_path))
+            dests.append(mods_dir.join(dest))
+            linked[dest] = (size, crc)
+            linked_order.append(dest)
+        if not linked: return linked
+        progress(0, installer.archive + u'\n' + _(u'Linking stored files...'))
+        mtimes = env.transfer_files(sources, dests, hard_link=True,
+                                    parent=progress.getParent())
+        for dest, mtime in zip(linked_order, mtimes):
+            linked[dest] += (mtime,)
+        return linked
+
+    def duplicates_report(self):
+        """Return a report of the files shipped by more than one package and
+        of the content store usage."""
+        sizeCrc_packages = collections.defaultdict(set)
+        for package, installer in self.iteritems():
+            if isinstance(installer, InstallerMarker): continue
+            for _path, size, crc in installer.fileSizeCrcs:
+                sizeCrc_packages[(size, crc)].add(package)
+        dupes = [(size * (len(packages) - 1), size, crc, packages) for
+                 (size, crc), packages in sizeCrc_packages.iteritems() if
+                 len(packages) > 1 and size]
+        dupes.sort(reverse=True)
+        with sio() as out:
+            log = bolt.LogFile(out)
+            log.setHeader(_(u'Duplicate Files'))
+            log(_(u'%d files are shipped by more than one package, '
+                  u'duplicating %s.') % (len(dupes), round_size(
+                sum(x[0] for x in dupes))))
+            count, total, unlinked = self.content_store.stats()
+            log(_(u'The content store holds %d files (%s), %s of which are '
+                  u'not installed anymore.') % (count, round_size(total),
+                                                round_size(unlinked)))
+            for wasted, size, crc, packages in dupes[:100]:
+                log.setHeader(u'%s: %s (%08X)' % (round_size(wasted),
+                                                  round_size(size), crc))
+                for package in sorted(packages):
+                    log(u'* %s' % package)
+            return bolt.winNewLines(log.out.getvalue())
+
     def sorted_pairs(self, package_keys=None, reverse=False):
         """Return pairs of key, installer for package_keys in self, sorted by
         install order.
@@ -2584,7 +3123,8 @@ def find_conflicts(self, src_installer, active_bsas=None,
         """
         Returns all conflicts for the specified installer, filtering them by
         BSA (if enabled by the user) or loose file and whether they are lower
-        or higher than the specified installer.
+        or higher than the specified installer. The files index must be up to
+        date, see _collect_changes.
 
         :param src_installer: The installer to find conflicts for.
         :param active_bsas: The list of currently active BSAs. Can be retrieved
@@ -2613,16 +3153,23 @@ def find_conflicts(self, src_installer, active_bsas=None,
             # Calculate all conflicts and save them in lower_bsa and higher_bsa
             asset_to_bsa, src_assets = self.find_src_assets(src_installer,
                                                             active_bsas)
+            # look the src asset hashes up in the bsas assets index, instead
+            # of intersecting them with the assets of every active bsa
+            from . import bsaInfos
+            asset_bsas = bsaInfos.asset_bsas()
+            active_names = {b.name: b for b in active_bsas}
+            bsa_conflicts = collections.defaultdict(set)
+            for asset in src_assets:
+                for bsa_name in asset_bsas.get(asset, ()):
+                    if bsa_name in active_names:
+                        bsa_conflicts[active_names[bsa_name]].add(asset)
             for package, installer in self.sorted_pairs():
                 if installer.order == srcOrder or not (showInactive or
                                                        installer.is_active):
                     continue # check active installers different than src
                 for bsa_info in self._get_active_bsas(installer, active_bsas):
-                    try: # conflicting assets from this installer active bsas
-                        curConflicts = bsa_info.assets & src_assets
-                    except BSAError:
-                        self._deprint(bsa_info, installer)
-                        continue
+                    # conflicting assets from this installer active bsas
+                    curConflicts = bsa_conflicts.get(bsa_info)
                     if curConflicts:
                         lower_result, higher_result = set(), set()
                         for conflict in curConflicts:
@@ -2633,34 +3180,65 @@ def find_conflicts(self, src_installer, active_bsas=None,
                                 if showLower: lower_result.add(conflict)
                             else:
                                 higher_result.add(conflict)
+                        # we only have hashes, get the names of conflicts
                         if lower_result:
                             lower_bsa.append((package, bsa_info,
-                                              bolt.sortFiles(lower_result)))
+                                bolt.sortFiles(bsa_info.resolve_hashes(
+                                    lower_result))))
                         if higher_result:
                             higher_bsa.append((package, bsa_info,
-                                               bolt.sortFiles(higher_result)))
+                                bolt.sortFiles(bsa_info.resolve_hashes(
+                                    higher_result))))
             def _sort_bsa_conflicts(conflict): return active_bsas[conflict[1]]
             lower_bsa.sort(key=_sort_bsa_conflicts)
             higher_bsa.sort(key=_sort_bsa_conflicts)
         else:
             lower_bsa, higher_bsa = None, None
-        # Calculate loose conflicts
+        # Calculate loose conflicts - look the mismatched files up in the
+        # files index instead of going through the files of all installers
+        installer_conflicts = collections.defaultdict(list)
+        for path in mismatched:
+            src_size_crc = src_sizeCrc[path]
+            for installer in self._dest_providers.get(path, ()):
+                if installer.ci_dest_sizeCrc[path] != src_size_crc:
+                    installer_conflicts[installer].append(path)
         lower_loose, higher_loose = [], []
-        for package, installer in self.sorted_pairs():
+        for installer in sorted(installer_conflicts, key=attrgetter('order')):
             if installer.order == srcOrder or not (
                         showInactive or installer.is_active): continue
             if not showLower and installer.order < srcOrder: continue
-            curConflicts = bolt.sortFiles(
-                [x for x, y in installer.ci_dest_sizeCrc.iteritems()
-                if x in mismatched and y != src_sizeCrc[x]])
-            if curConflicts:
-                if installer.order < srcOrder:
-                    conflict_type = lower_loose
-                else:
-                    conflict_type = higher_loose
-                conflict_type.append((installer, package.s, curConflicts))
+            curConflicts = bolt.sortFiles(installer_conflicts[installer])
+            if installer.order < srcOrder:
+                conflict_type = lower_loose
+            else:
+                conflict_type = higher_loose
+            conflict_type.append((installer, installer.archive, curConflicts))
         return lower_loose, higher_loose, lower_bsa, higher_bsa
 
+    def conflicts_matrix(self, active_only=True):
+        """Return the number of loose files each package overrides for every
+        other package, computed in one pass over the files index - which must
+        be up to date, see _collect_changes.
+
+        :param active_only: only take active packages into account.
+        :return: A dict mapping (lower package, higher package) pairs of
+                 installers to the number of files the higher package installs
+                 over those of the lower one with a different size or crc."""
+        matrix = collections.defaultdict(int)
+        order = attrgetter('order')
+        for path, providers in self._dest_providers.iteritems():
+            if len(providers) < 2: continue
+            if active_only:
+                providers = [x for x in providers if x.is_active]
+                if len(providers) < 2: continue
+            providers = sorted(providers, key=order)
+            for dex, higher in enumerate(providers[1:], 1):
+                higher_size_crc = higher.ci_dest_sizeCrc[path]
+                for lower in providers[:dex]:
+                    if lower.ci_dest_sizeCrc[path] != higher_size_crc:
+                        matrix[(lower, higher)] += 1
+        return matrix
+
     def find_src_assets(self, src_installer, active_bsas):
         """Map srcInstaller's active bsas' assets to those bsas, assigning
         the assets to the highest loading bsa - there's generally only one BSA
@@ -2670,13 +3248,14 @@ def find_src_assets(self, src_installer, active_bsas):
         :param src_installer: The installer from which to retrieve BSA assets.
         :param active_bsas: The set of active BSAs. Generally retrieved via
                             bosh.modInfos.get_active_bsas().
-        :return: An OrderedDict containing a mapping from asset to BSA and the
-                 relevant assets from the installer's BSAs in a set."""
+        :return: An OrderedDict containing a mapping from asset hash to BSA
+                 and the hashes of the relevant assets from the installer's
+                 BSAs in a set - see bsa_files.AssetHashes."""
         asset_to_bsa, src_assets = collections.OrderedDict(), set()
         for b in reversed(list(self._get_active_bsas(src_installer,
                                                      active_bsas))):
             try:
-                b_assets = b.assets - src_assets
+                b_assets = set(b.asset_hashes.iter_hashes()) - src_assets
             except BSAError:
                 self._deprint(b, src_installer)
                 continue
@@ -2702,6 +3281,7 @@ def getConflictReport(self, srcInstaller, mode, modInfos):
         showLower = conflictsMode and bass.settings['bash.installers.conflictsReport.showLower']
         showBSA = bass.settings['bash.installers.conflictsReport.showBSAConflicts']
         active_bsas = modInfos.get_active_bsas() if showBSA else None
+        self._collect_changes() # bring the files index up to date
         lower_loose, higher_loose, lower_bsa, higher_bsa = self.find_conflicts(
             srcInstaller, active_bsas, conflictsMode)
         # Generate report
@@ -2743,6 +3323,27 @@ def _print_loose_conflicts(conflicts, title=_(u'Lower')):
             report = _(u"No Underrides. Mod is not completely un-installed.")
         return report
 
+    def getConflictsOverview(self, showInactive=False):
+        """Returns a report of the loose files each package overrides in every
+        other package, for all packages at once."""
+        self._collect_changes() # bring the files index up to date
+        higher_lowers = collections.defaultdict(list)
+        for (lower, higher), count in self.conflicts_matrix(
+                active_only=not showInactive).iteritems():
+            higher_lowers[higher].append((lower.order, lower.archive, count))
+        with sio() as out:
+            log = bolt.LogFile(out)
+            log.setHeader(_(u'Conflicts Overview'))
+            if not higher_lowers:
+                log(_(u'No conflicts.'))
+            for higher in sorted(higher_lowers, key=attrgetter('order')):
+                lowers = sorted(higher_lowers[higher])
+                log.setHeader(u'%03d - %s' % (higher.order, higher.archive))
+                for order, package, count in lowers:
+                    log(_(u'* Overrides %d file(s) of %03d - %s') % (
+                        count, order, package))
+            return bolt.winNewLines(log.out.getvalue())
+
     def getPackageList(self,showInactive=True):
         """Returns package list as text."""
         #--Setup
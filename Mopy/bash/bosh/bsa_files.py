@@ -33,18 +33,27 @@
 
 import collections
 import errno
+import hashlib
 import os
 import struct
 import sys
+import threading
+import zlib
 from functools import partial
 from itertools import groupby, imap
 from operator import itemgetter
 from . import AFile
 from ..bolt import deprint, Progress, struct_pack, struct_unpack, \
-    unpack_byte, unpack_string, unpack_int
+    unpack_byte, unpack_int, imap_parallel
 from ..exception import BSAError, BSADecodingError, BSAFlagError, \
     BSANotImplemented
 
+# LZ4 is needed to extract compressed records of Skyrim SE bsas
+try:
+    from lz4 import frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
 _bsa_encoding = 'cp1252' # rumor has it that's the files/folders names encoding
 path_sep = u'\\'
 
@@ -56,6 +65,28 @@ def _decode_path(string_path):
     except UnicodeDecodeError:
         raise BSADecodingError(string_path)
 
+# Decompression ---------------------------------------------------------------
+def _check_size(decompressed, uncompressed_size):
+    if len(decompressed) != uncompressed_size:
+        raise BSAError(u'Decompressed size %d - expected %d' % (
+            len(decompressed), uncompressed_size))
+    return decompressed
+
+def _zlib_decompress(data, uncompressed_size):
+    try:
+        return _check_size(zlib.decompress(data), uncompressed_size)
+    except zlib.error as e:
+        raise BSAError(u'zlib error: %s' % e)
+
+def _lz4_decompress(data, uncompressed_size):
+    if lz4_frame is None:
+        raise BSANotImplemented(
+            u'LZ4 compressed records need the lz4 module to be installed')
+    try:
+        return _check_size(lz4_frame.decompress(data), uncompressed_size)
+    except RuntimeError as e:
+        raise BSAError(u'LZ4 error: %s' % e)
+
 # Headers ---------------------------------------------------------------------
 class _Header(object):
     __slots__ = ('file_id', 'version')
@@ -192,6 +223,25 @@ def total_record_size(cls):
         return super(_BsaHashedRecord, cls).total_record_size() + sum(
             f[1] for f in cls.formats)
 
+    @classmethod
+    def load_records_from_buffer(cls, memview, start, count, buffer_pos=0):
+        """Load count consecutive records from memview, starting at start,
+        with a single unpack call.
+
+        :param buffer_pos: the position of memview in the bsa file"""
+        rec_fmt = _HashedRecord.formats[0][0] + ''.join(
+            f[0] for f in cls.formats)
+        attrs = _HashedRecord.__slots__ + cls.__slots__[:len(cls.formats)]
+        values = struct.unpack_from('<' + rec_fmt * count, memview, start)
+        num_attrs, records = len(attrs), []
+        for rec_start in xrange(0, len(values), num_attrs):
+            rec = cls()
+            for attr, val in zip(attrs,
+                                 values[rec_start:rec_start + num_attrs]):
+                rec.__setattr__(attr, val)
+            records.append(rec)
+        return records
+
 class BSAFolderRecord(_BsaHashedRecord):
     __slots__ = ('files_count', 'file_records_offset')
     formats = ['I', 'I']
@@ -227,6 +277,15 @@ def load_record(self, ins):
         self.file_pos = ins.tell()
         super(BSAOblivionFileRecord, self).load_record(ins)
 
+    @classmethod
+    def load_records_from_buffer(cls, memview, start, count, buffer_pos=0):
+        records = super(BSAOblivionFileRecord, cls).load_records_from_buffer(
+            memview, start, count, buffer_pos)
+        rec_size = cls.total_record_size()
+        for rec_pos, rec in enumerate(records):
+            rec.file_pos = buffer_pos + start + rec_pos * rec_size
+        return records
+
     def compression_toggle(self): return self.file_size_flags & 0x40000000
 
     def raw_data_size(self):
@@ -257,8 +316,8 @@ def load_record_from_buffer(self, memview, start):
         return start
 
     @classmethod
-    def total_record_size(cls): # unused !
-        return super(_B2aFileRecordCommon, cls).total_record_size()  + sum(
+    def total_record_size(cls): # record_hash is I not Q !
+        return struct.calcsize('I') + sum(
             f[1] for f in _B2aFileRecordCommon.formats) + sum(
             f[1] for f in cls.formats)
 
@@ -298,6 +357,63 @@ class Ba2Folder(object):
     def __init__(self):
         self.folder_assets = collections.OrderedDict() # keep files order
 
+def asset_hash(asset_path):
+    """Return the 64 bit hash of a lowercase asset path as a string of 8 big
+    endian bytes, so that hashes sort in the order of their integer values.
+    The bsa record hashes are per folder and file name (and 32 bit for ba2s),
+    so we can't use them for full paths."""
+    return hashlib.md5(asset_path.encode('utf-8')).digest()[:8]
+
+class AssetHashes(object):
+    """Compact frozen set of lowercase asset paths: a sorted string of their
+    hashes (see asset_hash) - 8 bytes per asset instead of a unicode and a
+    set slot. Assets whose hashes collide are also stored by name so that
+    membership tests stay exact for them - for any other name a matching hash
+    is taken as a match."""
+    __slots__ = ('_hashes', '_collisions', '_collision_hashes')
+
+    def __init__(self, asset_paths=()):
+        hash_to_asset = {}
+        collisions = set()
+        for asset in asset_paths:
+            a_hash = asset_hash(asset)
+            other = hash_to_asset.setdefault(a_hash, asset)
+            if other != asset:
+                collisions.update((asset, other))
+        self._hashes = ''.join(sorted(hash_to_asset))
+        self._collisions = frozenset(collisions)
+        self._collision_hashes = frozenset(imap(asset_hash, collisions))
+
+    def __len__(self): return len(self._hashes) // 8
+
+    def iter_hashes(self):
+        hashes = self._hashes
+        return (hashes[i:i + 8] for i in xrange(0, len(hashes), 8))
+
+    def has_hash(self, a_hash):
+        """Binary search a_hash in the hashes string."""
+        hashes = self._hashes
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if hashes[mid * 8:mid * 8 + 8] < a_hash: lo = mid + 1
+            else: hi = mid
+        return hashes[lo * 8:lo * 8 + 8] == a_hash
+
+    def __contains__(self, asset_path):
+        a_hash = asset_hash(asset_path)
+        if not self.has_hash(a_hash): return False
+        if a_hash in self._collision_hashes:
+            return asset_path in self._collisions
+        return True
+
+    def intersection(self, hashes):
+        """Return the hashes in the hashes set that are also in self.
+        :type hashes: set[str]"""
+        if len(hashes) * 16 < len(self): # binary searches are cheaper
+            return {h for h in hashes if self.has_hash(h)}
+        return hashes.intersection(self.iter_hashes())
+
 # Files -----------------------------------------------------------------------
 def _makedirs_exists_ok(target_dir):
     try:
@@ -310,6 +426,7 @@ class ABsa(AFile):
     """:type bsa_folders: collections.OrderedDict[unicode, BSAFolder]"""
     header_type = BsaHeader
     _assets = frozenset()
+    _asset_hashes = AssetHashes()
 
     def __init__(self, fullpath, load_cache=False, names_only=True):
         super(ABsa, self).__init__(fullpath)
@@ -343,57 +460,88 @@ def _map_files_to_folders(asset_paths): # lowercase keys and values
             folder_files_dict[key.lower()] = set(dest.lower() for _key, dest in val)
         return folder_files_dict
 
-    def extract_assets(self, asset_paths, dest_folder):
+    def extract_assets(self, asset_paths, dest_folder, progress=None):
+        """Extract the specified assets to dest_folder. Only the records of
+        those assets are read, and the assets are read in the order their data
+        is stored in the bsa, decompressed and written out on a thread pool.
+
+        :param asset_paths: paths of the assets, relative to Data
+        :param dest_folder: path of the folder to extract them to
+        :type progress: Progress | None"""
         folder_files_dict = self._map_files_to_folders(
             imap(unicode.lower, asset_paths))
         del asset_paths # forget about this
-        # load the bsa - this should be reworked to load only needed records
-        self._load_bsa()
-        folder_to_assets = self._map_assets_to_folders(folder_files_dict)
-        # unload the bsa
-        self.bsa_folders.clear()
-        # get the data from the file
-        global_compression = self.bsa_header.is_compressed()
-        with open(u'%s' % self.abs_path, 'rb') as bsa_file:
-            for folder, file_records in folder_to_assets.iteritems():
-                target_dir = os.path.join(dest_folder, folder)
-                _makedirs_exists_ok(target_dir)
-                for filename, record in file_records:
-                    if global_compression ^ record.compression_toggle():
-                        raise BSANotImplemented(
-                            u'Compressed records are not yet supported (%s)' %
-                            self.abs_path)
-                    data_size = record.raw_data_size()
-                    bsa_file.seek(record.raw_file_data_offset)
-                    if self.bsa_header.embed_filenames(): # use len(filename) ?
-                        filename_len = unpack_byte(bsa_file)
-                        bsa_file.read(filename_len) # discard filename
-                        data_size -= filename_len + 1
-                    # get the data!
-                    raw_data = bsa_file.read(data_size)
-                    with open(os.path.join(target_dir, filename), 'wb') as out:
-                        out.write(raw_data)
-
-    def _map_assets_to_folders(self, folder_files_dict):
-        folder_to_assets = collections.OrderedDict()
-        for folder_path, bsa_folder in self.bsa_folders.iteritems():
-            if folder_path.lower() not in folder_files_dict: continue
-            # Has assets we need to extract. Keep order to avoid seeking
-            # back and forth in the file
-            folder_to_assets[folder_path] = file_records = []
-            filenames = folder_files_dict[folder_path.lower()]
-            for filename, filerecord in bsa_folder.folder_assets.iteritems():
-                if filename.lower() not in filenames: continue
-                file_records.append((filename, filerecord))
-        return folder_to_assets
+        try:
+            to_extract = self._find_records(folder_files_dict)
+        except struct.error as e:
+            raise BSAError, e.message, sys.exc_info()[2]
+        to_extract.sort(key=lambda fo_fi_rec: self._data_offset(fo_fi_rec[2]))
+        # create the folders upfront so the workers don't race on them
+        for folder in set(imap(itemgetter(0), to_extract)):
+            _makedirs_exists_ok(os.path.join(dest_folder, folder))
+        bsa_path = u'%s' % self.abs_path
+        thread_files, open_files = threading.local(), []
+        def _extract(folder_file_record):
+            folder, filename, record = folder_file_record
+            bsa_file = getattr(thread_files, 'bsa_file', None)
+            if bsa_file is None: # one file object per worker thread
+                bsa_file = thread_files.bsa_file = open(bsa_path, 'rb')
+                open_files.append(bsa_file)
+            try:
+                raw_data = self._read_asset(bsa_file, record)
+            except struct.error as e:
+                raise BSAError, e.message, sys.exc_info()[2]
+            with open(os.path.join(dest_folder, folder, filename), 'wb') as out:
+                out.write(raw_data)
+        progress = progress or Progress()
+        progress.setFull(max(len(to_extract), 1))
+        try:
+            for i, __ in enumerate(imap_parallel(_extract, to_extract)):
+                progress(i, to_extract[i][1])
+        finally:
+            for bsa_file in open_files: bsa_file.close()
 
     # Abstract
     def _load_bsa(self): raise NotImplementedError
     def _load_bsa_light(self): raise NotImplementedError
 
+    def _find_records(self, folder_files_dict):
+        """Return a list of (folder, filename, file record) tuples for the
+        assets in folder_files_dict, reading as few records as possible."""
+        raise NotImplementedError
+
+    def _data_offset(self, record): raise NotImplementedError
+
+    def _read_asset(self, bsa_file, record):
+        """Read the data of the asset record from bsa_file and return it
+        decompressed."""
+        raise NotImplementedError
+
     # API - delegates to abstract methods above
     def has_assets(self, asset_paths):
-        return set(a.cs for a in asset_paths) & self.assets
+        """Return the lowercase paths of asset_paths that are in the bsa.
+        :type asset_paths: collections.Iterable[bolt.Path]"""
+        asset_hashes = self.asset_hashes
+        return set(a.cs for a in asset_paths if a.cs in asset_hashes)
+
+    @property
+    def asset_hashes(self):
+        """Compact version of assets, see AssetHashes.
+        :rtype: AssetHashes"""
+        if self._asset_hashes is self.__class__._asset_hashes:
+            self._asset_hashes = self._read_asset_hashes()
+        return self._asset_hashes
+
+    def _read_asset_hashes(self):
+        return AssetHashes(self._read_assets())
+
+    def resolve_hashes(self, hashes):
+        """Return the paths of the bsa assets with the given hashes - the name
+        tables are read again if the assets are not loaded.
+        :type hashes: set[str]
+        :rtype: set[unicode]"""
+        bsa_assets = self._assets or self._read_assets()
+        return {a for a in bsa_assets if asset_hash(a) in hashes}
 
     @property
     def assets(self):
@@ -401,11 +549,17 @@ def assets(self):
         :rtype: frozenset[unicode]
         """
         if self._assets is self.__class__._assets:
-            self.__load(names_only=True)
-            self._assets = frozenset(imap(os.path.normcase, self._filenames))
-            del self._filenames[:]
+            self._assets = self._read_assets()
         return self._assets
 
+    def _read_assets(self):
+        """Read the full paths of the bsa files from its name tables.
+        :rtype: frozenset[unicode]"""
+        self.__load(names_only=True)
+        bsa_assets = frozenset(imap(os.path.normcase, self._filenames))
+        del self._filenames[:]
+        return bsa_assets
+
 class BSA(ABsa):
     """Bsa file. Notes:
     - We assume that has_names_for_files() is True, although we allow for
@@ -432,13 +586,11 @@ def _load_bsa(self):
                 bsa_folder.folder_assets[filename] = rec
 
     @classmethod
-    def _read_file_records(cls, file_records, bsa_file, folder_path,
-                           folder_record, folders=None):
+    def _read_file_records(cls, file_records, dir_block, start, folder_path,
+                           folder_record, folders=None, buffer_pos=0):
         folders[folder_path] = BSAFolder(folder_record)
-        for __ in xrange(folder_record.files_count):
-            rec = cls.file_record_type()
-            rec.load_record(bsa_file)
-            file_records.append(rec)
+        file_records.extend(cls.file_record_type.load_records_from_buffer(
+            dir_block, start, folder_record.files_count, buffer_pos))
 
     def _load_bsa_light(self):
         folder_records = [] # we need those to parse the folder names
@@ -456,73 +608,163 @@ def _load_bsa_light(self):
         self._filenames = _filenames
 
     def _read_bsa_file(self, folder_records, read_file_records):
+        """Read the directory of the bsa - the folder records, the file
+        record blocks and the file names block - in one go and parse it from
+        a memoryview. For each folder read_file_records is called with the
+        directory buffer and the offset of the folder's file records in it.
+        Return the list of the file names."""
         total_names_length = 0
+        header = self.bsa_header
+        folder_record_type = self.__class__.folder_record_type
+        file_record_size = self.file_record_type.total_record_size()
         with open(u'%s' % self.abs_path, 'rb') as bsa_file: # accept string or Path
             # load the header from input stream
-            self.bsa_header.load_header(bsa_file)
-            # load the folder records from input stream
-            for __ in xrange(self.bsa_header.folder_count):
-                rec = self.__class__.folder_record_type()
-                rec.load_record(bsa_file)
-                folder_records.append(rec)
-            # load the file record block
+            header.load_header(bsa_file)
+            dir_pos = bsa_file.tell()
+            # the name lengths of the folders are prefixed to their names
+            dir_block = bsa_file.read(
+                header.folder_count * (folder_record_type.total_record_size()
+                                       + 1)
+                + header.total_folder_name_length
+                + header.file_count * file_record_size
+                + header.total_file_name_length)
+            def _ensure_read(end):
+                """The reported folder names length may be wrong - read the
+                rest of the directory if needed."""
+                if end > len(dir_block):
+                    return dir_block + bsa_file.read(end - len(dir_block))
+                return dir_block
+            dir_view = memoryview(dir_block)
+            # load the folder records
+            folder_records.extend(folder_record_type.load_records_from_buffer(
+                dir_view, 0, header.folder_count))
+            start = header.folder_count * \
+                    folder_record_type.total_record_size()
+            # load the file record blocks
+            has_names_for_folders = header.has_names_for_folders()
             for folder_record in folder_records:
                 folder_path = u'?%d' % folder_record.record_hash # hack - untested
-                if self.bsa_header.has_names_for_folders():
-                    name_size = unpack_byte(bsa_file)
+                if has_names_for_folders:
+                    dir_block = _ensure_read(start + 1)
+                    name_size = ord(dir_block[start])
+                    dir_block = _ensure_read(start + 1 + name_size +
+                        folder_record.files_count * file_record_size)
+                    if len(dir_view) != len(dir_block):
+                        dir_view = memoryview(dir_block)
+                    # discard the null terminator
                     folder_path = _decode_path(
-                        unpack_string(bsa_file, name_size - 1))
+                        dir_block[start + 1:start + name_size])
                     total_names_length += name_size
-                    bsa_file.read(1) # discard null terminator
-                read_file_records(bsa_file, folder_path, folder_record)
-            if total_names_length != self.bsa_header.total_folder_name_length:
+                    start += 1 + name_size
+                read_file_records(dir_view, start, folder_path, folder_record,
+                                  buffer_pos=dir_pos)
+                start += folder_record.files_count * file_record_size
+            if total_names_length != header.total_folder_name_length:
                 deprint(u'%s reports wrong folder names length %d'
                     u' - actual: %d (number of folders is %d)' % (
-                    self.abs_path, self.bsa_header.total_folder_name_length,
-                    total_names_length, self.bsa_header.folder_count))
+                    self.abs_path, header.total_folder_name_length,
+                    total_names_length, header.folder_count))
             self.total_names_length = total_names_length
-            file_names = bsa_file.read( # has an empty string at the end
-                self.bsa_header.total_file_name_length).split('\00')
+            dir_block = _ensure_read(start + header.total_file_name_length)
             # close the file
-        return file_names
+        # has an empty string at the end
+        return dir_block[start:start + header.total_file_name_length].split(
+            '\00')
 
-    def _discard_file_records(self, bsa_file, folder_path, folder_record,
-                              folders=None):
-        bsa_file.read(folder_record.files_count *
-            self.file_record_type.total_record_size())
+    @staticmethod
+    def _discard_file_records(dir_block, start, folder_path, folder_record,
+                              folders=None, buffer_pos=0):
         folders[folder_path] = folder_record
 
+    def _find_records(self, folder_files_dict):
+        # (index of first file name, folder path, file records) of the
+        # folders we need - the file records of the rest are skipped
+        needed_folders = []
+        files_before = [0]
+        def _read_needed_records(dir_block, start, folder_path, folder_record,
+                                 buffer_pos=0):
+            files_count = folder_record.files_count
+            if folder_path.lower() in folder_files_dict:
+                needed_folders.append((files_before[0], folder_path,
+                    self.file_record_type.load_records_from_buffer(
+                        dir_block, start, files_count, buffer_pos)))
+            files_before[0] += files_count
+        file_names = self._read_bsa_file([], _read_needed_records)
+        found = []
+        for first_name, folder_path, records in needed_folders:
+            filenames = folder_files_dict[folder_path.lower()]
+            for name_index, rec in enumerate(records, first_name):
+                filename = _decode_path(file_names[name_index])
+                if filename.lower() in filenames:
+                    found.append((folder_path, filename, rec))
+        return found
+
+    def _data_offset(self, record): return record.raw_file_data_offset
+
+    def _read_asset(self, bsa_file, record):
+        data_size = record.raw_data_size()
+        bsa_file.seek(record.raw_file_data_offset)
+        if self.bsa_header.embed_filenames(): # use len(filename) ?
+            filename_len = unpack_byte(bsa_file)
+            bsa_file.read(filename_len) # discard filename
+            data_size -= filename_len + 1
+        if not (bool(self.bsa_header.is_compressed()) ^
+                bool(record.compression_toggle())):
+            return bsa_file.read(data_size)
+        # compressed data is prefixed by its uncompressed size
+        uncompressed_size = unpack_int(bsa_file)
+        return self._decompress(bsa_file.read(data_size - 4),
+                                uncompressed_size)
+
+    _decompress = staticmethod(_zlib_decompress)
+
 class BA2(ABsa):
     header_type = Ba2Header
 
-    def extract_assets(self, asset_paths, dest_folder):
-        # map files to folders
-        folder_files_dict = self._map_files_to_folders(asset_paths)
-        del asset_paths # forget about this
-        # load the bsa - this should be reworked to load only needed records
-        self._load_bsa()
-        if self.bsa_header.b2a_files_type != 'GNRL':
-            raise BSANotImplemented(
-                u'Texture ba2 archives are not yet supported')
-        folder_to_assets = self._map_assets_to_folders(folder_files_dict)
-        # unload the bsa
-        self.bsa_folders.clear()
-        # get the data from the file
+    def _read_file_names(self, bsa_file):
+        """Read the file names block in one go and parse the names from a
+        memoryview - returns a list of the (decoded) file names."""
+        bsa_file.seek(self.bsa_header.b2a_name_table_offset)
+        file_names_block = bsa_file.read()
+        names_view = memoryview(file_names_block)
+        file_names = []
+        name_start = 0
+        for __ in xrange(self.bsa_header.b2a_num_files):
+            name_size, = struct.unpack_from('<H', names_view, name_start)
+            name_start += 2
+            file_names.append(_decode_path(
+                file_names_block[name_start:name_start + name_size]))
+            name_start += name_size
+        return file_names
+
+    def _find_records(self, folder_files_dict):
         with open(u'%s' % self.abs_path, 'rb') as bsa_file:
-            for folder, file_records in folder_to_assets.iteritems():
-                target_dir = os.path.join(dest_folder, folder)
-                _makedirs_exists_ok(target_dir)
-                for filename, record in file_records:
-                    if record.packed_size: # seems to signify compression
-                        raise BSANotImplemented(
-                            u'Compressed records are not yet supported (%s)' %
-                            self.abs_path)
-                    data_size = record.unpacked_size
-                    bsa_file.seek(record.offset)
-                    # get the data!
-                    raw_data = bsa_file.read(data_size)
-                    with open(os.path.join(target_dir, filename), 'wb') as out:
-                        out.write(raw_data)
+            self.bsa_header.load_header(bsa_file)
+            if self.bsa_header.b2a_files_type != 'GNRL':
+                raise BSANotImplemented(
+                    u'Texture ba2 archives are not yet supported')
+            # file records have a fixed size, so once we find the name of an
+            # asset we need we can seek to its record
+            record_size = B2aFileRecordGeneral.total_record_size()
+            found = []
+            for index, filename in enumerate(self._read_file_names(bsa_file)):
+                folder, __, filename = filename.rpartition(path_sep)
+                if filename.lower() in folder_files_dict.get(folder.lower(),
+                                                             ()):
+                    bsa_file.seek(Ba2Header.header_size + index * record_size)
+                    rec = B2aFileRecordGeneral()
+                    rec.load_record(bsa_file)
+                    found.append((folder, filename, rec))
+        return found
+
+    def _data_offset(self, record): return record.offset
+
+    def _read_asset(self, bsa_file, record):
+        bsa_file.seek(record.offset)
+        if record.packed_size: # zlib compressed
+            return _zlib_decompress(bsa_file.read(record.packed_size),
+                                    record.unpacked_size)
+        return bsa_file.read(record.unpacked_size)
 
     def _load_bsa(self):
         with open(u'%s' % self.abs_path, 'rb') as bsa_file:
@@ -539,15 +781,10 @@ def _load_bsa(self):
                 rec.load_record(bsa_file)
                 file_records.append(rec)
             # load the file names block
-            bsa_file.seek(self.bsa_header.b2a_name_table_offset)
-            file_names_block = memoryview(bsa_file.read())
+            file_names = self._read_file_names(bsa_file)
             # close the file
         current_folder_name = current_folder = None
-        for index in xrange(self.bsa_header.b2a_num_files):
-            name_size = struct.unpack_from('H', file_names_block)[0]
-            filename = _decode_path(
-                file_names_block[2:name_size + 2].tobytes())
-            file_names_block = file_names_block[name_size + 2:]
+        for index, filename in enumerate(file_names):
             folder_dex = filename.rfind(u'\\')
             if folder_dex == -1:
                 folder_name = u''
@@ -565,17 +802,8 @@ def _load_bsa_light(self):
             # load the header from input stream
             self.bsa_header.load_header(bsa_file)
             # load the file names block
-            bsa_file.seek(self.bsa_header.b2a_name_table_offset)
-            file_names_block = memoryview(bsa_file.read())
+            self._filenames = self._read_file_names(bsa_file)
             # close the file
-        _filenames = []
-        for index in xrange(self.bsa_header.b2a_num_files):
-            name_size = struct.unpack_from('H', file_names_block)[0]
-            filename = _decode_path(
-                file_names_block[2:name_size + 2].tobytes())
-            _filenames.append(filename)
-            file_names_block = file_names_block[name_size + 2:]
-        self._filenames = _filenames
 
 class OblivionBsa(BSA):
     header_type = OblivionBsaHeader
@@ -643,6 +871,7 @@ class SkyrimBsa(BSA):
 class SkyrimSeBsa(BSA):
     header_type = SkyrimSeBsaHeader
     folder_record_type = BSASkyrimSEFolderRecord
+    _decompress = staticmethod(_lz4_decompress)
 
 class Fallout4Ba2(BA2): pass
 
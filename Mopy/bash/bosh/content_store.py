@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash; if not, write to the Free Software Foundation,
+#  Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2019 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""BAIN content store - files installed by BAIN, kept by content so that
+identical files can be hard linked into Data instead of being extracted or
+copied again."""
+
+import errno
+import hashlib
+import os
+from binascii import crc32
+from functools import partial
+
+from .. import env
+from ..bolt import PickleDict, deprint, imap_parallel, pool_size
+
+def _store_file(abs_path_size_crc_store):
+    """Hard link the file at abs_path into the store dir, under its sha1,
+    and return (sha1, mtime) - or the exception raised. The file is not
+    stored if its size and crc are not the expected ones anymore. Runs on a
+    worker thread, see ContentStore.add."""
+    abs_path, size, crc, store_dir = abs_path_size_crc_store
+    try:
+        sha1, file_crc, file_size = hashlib.sha1(), 0, 0
+        with open(abs_path, 'rb') as ins:
+            for block in iter(partial(ins.read, 2097152), ''):
+                sha1.update(block)
+                file_crc = crc32(block, file_crc)
+                file_size += len(block)
+        if (file_size, file_crc & 0xFFFFFFFF) != (size, crc):
+            return ValueError(u'%s changed since it was installed' % abs_path)
+        sha1 = sha1.hexdigest()
+        store_path = os.path.join(store_dir, sha1[:2], sha1)
+        if not os.path.exists(store_path):
+            try:
+                os.makedirs(os.path.dirname(store_path))
+            except OSError as e:
+                if e.errno != errno.EEXIST: raise
+            env.hard_link(abs_path, store_path)
+        return sha1, int(os.path.getmtime(store_path))
+    except EnvironmentError as e:
+        return e
+
+class ContentStore(object):
+    """Store of the files installed by BAIN, hard linked under their sha1 in
+    the 'Content Store' dir and indexed by (size, crc) - the key BAIN knows
+    for every file of every package without reading it. The files are hard
+    links, so editing them in Data also edits them in the store: entries
+    whose size or mtime changed are dropped instead of being served. The
+    store is a cache, it can be deleted at any time."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self._index_file = PickleDict(store_dir.join(u'Store.dat'))
+        #--Persistent: (size, crc) -> (sha1, mtime of the stored file)
+        self.sizeCrc_entry = {}
+        #--Volatile
+        self.loaded = self.changed = False
+        self._can_link = True
+
+    def load(self):
+        if self.loaded: return
+        self._index_file.load()
+        self.sizeCrc_entry = self._index_file.data.get('sizeCrc_entry', {})
+        self.loaded = True
+
+    def save(self):
+        if not self.changed: return
+        self.store_dir.makedirs()
+        self._index_file.data['sizeCrc_entry'] = self.sizeCrc_entry
+        self._index_file.save()
+        self.changed = False
+
+    def _store_path(self, sha1):
+        return os.path.join(self.store_dir.s, sha1[:2], sha1)
+
+    def lookup(self, size, crc):
+        """Return the path of the stored file with this size and crc, or None
+        if there is none."""
+        self.load()
+        entry = self.sizeCrc_entry.get((size, crc))
+        if entry is None: return None
+        sha1, mtime = entry
+        store_path = self._store_path(sha1)
+        try:
+            st = os.stat(store_path)
+            if st.st_size == size and int(st.st_mtime) == mtime:
+                return store_path
+        except OSError:
+            pass
+        # deleted, or edited through one of its links in Data
+        del self.sizeCrc_entry[(size, crc)]
+        self.changed = True
+        return None
+
+    def add(self, files):
+        """Hard link the files into the store, unless files with the same
+        size and crc are already stored. The files are hashed in parallel.
+
+        :param files: iterable of (absolute path, size, crc) tuples"""
+        if not self._can_link: return
+        pending = [(abs_path, size, crc, self.store_dir.s) for
+                   abs_path, size, crc in files if
+                   self.lookup(size, crc) is None]
+        for (abs_path, size, crc, _store_dir), result in zip(pending,
+                imap_parallel(_store_file, pending, 2 * pool_size())):
+            if isinstance(result, EnvironmentError) and \
+                    result.errno == errno.EXDEV:
+                deprint(u'%s is on a different drive than Data - not using '
+                        u'it' % self.store_dir)
+                self._can_link = False
+                return
+            elif isinstance(result, Exception):
+                deprint(u'Failed to store %s: %r' % (abs_path, result))
+                continue
+            self.sizeCrc_entry[(size, crc)] = result
+            self.changed = True
+
+    def stats(self):
+        """Return the number and total size of the stored files and the size
+        of those no longer linked anywhere else (see prune)."""
+        self.load()
+        count = total = unlinked = 0
+        for (size, crc) in list(self.sizeCrc_entry):
+            store_path = self.lookup(size, crc)
+            if store_path is None: continue
+            count += 1
+            total += size
+            if env.link_count(store_path) == 1: unlinked += size
+        return count, total, unlinked
+
+    def prune(self):
+        """Delete the stored files that are not linked anywhere else anymore
+        and return their total size."""
+        self.load()
+        pruned = 0
+        for (size, crc) in list(self.sizeCrc_entry):
+            store_path = self.lookup(size, crc)
+            if store_path is None or env.link_count(store_path) != 1:
+                continue
+            try:
+                os.remove(store_path)
+            except OSError:
+                continue
+            del self.sizeCrc_entry[(size, crc)]
+            self.changed = True
+            pruned += size
+        return pruned
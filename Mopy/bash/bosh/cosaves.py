@@ -250,6 +250,19 @@ def chunk_length(self):
         if self._fully_decoded: raise AbstractError()
         return len(self.chunk_data)
 
+    def decoded(self):
+        """Return this chunk decoded by the class that implements its type -
+        chunks that are not remapped are kept as binary blobs when reading a
+        whole cosave, which is also how they are written back."""
+        ch_class = _xse_class_dict.get(self.chunk_type, _xSEChunk)
+        if type(self) is ch_class: return self
+        with sio() as buff:
+            _pack(buff, '=I', self.chunk_version)
+            _pack(buff, '=I', len(self.chunk_data))
+            buff.write(self.chunk_data)
+            buff.seek(0)
+            return ch_class(buff, self.chunk_type)
+
 class _xSEModListChunk(_xSEChunk, _Dumpable, _Remappable):
     """An abstract class for chunks that contain a list of mods (e.g. MODS or
     LIMD) """
@@ -643,18 +656,23 @@ def dump_to_log(self, log, save_masters):
     u'STVR': _xSEChunkSTVR,
 }
 
-def _get_xse_chunk(ins):
+def _get_xse_chunk(ins, decode=True):
     """Read a 4-byte string from the specified input stream and return an
     instance of a matching xSE chunk class for that string. If no matching
     class is found, an instance of the generic _xSEChunk class is returned
     instead.
 
     :param ins: The input stream to read from.
+    :param decode: If False, only remappable chunks are decoded - the rest
+        are kept as binary blobs and decoded when needed, see
+        _xSEChunk.decoded.
     :return: A instance of a matching chunk class, or the generic one if no
         matching class was found."""
     # The chunk type strings are reversed in the cosaves
     ch_type = _cosave_decode(unpack_4s(ins))[::-1]
     ch_class = _xse_class_dict.get(ch_type, _xSEChunk)
+    if not decode and not issubclass(ch_class, _Remappable):
+        ch_class = _xSEChunk
     return ch_class(ins, ch_type)
 
 class _xSEPluginChunk(_AChunk, _Remappable):
@@ -671,15 +689,16 @@ def __init__(self, ins, light=False):
             self._read_chunk(ins)
         else:
             for x in xrange(num_chunks):
-                self._read_chunk(ins)
+                self._read_chunk(ins, decode=False)
 
-    def _read_chunk(self, ins):
+    def _read_chunk(self, ins, decode=True):
         """Reads a single chunk from the specified input stream and appends it
         to self.chunks and, if the chunk is remappable, to
         self.remappable_chunks.
 
-        :param ins: The input stream to read from."""
-        new_chunk = _get_xse_chunk(ins)
+        :param ins: The input stream to read from.
+        :param decode: See _get_xse_chunk."""
+        new_chunk = _get_xse_chunk(ins, decode)
         self.chunks.append(new_chunk)
         if isinstance(new_chunk, _Remappable):
             self.remappable_chunks.append(new_chunk)
@@ -1396,6 +1415,7 @@ def dump_to_log(self, log, save_masters):
             log(_(u'  Type   Version  Size (in bytes)'))
             log(u'-' * 40)
             for chunk in plugin_chunk.chunks: # type: _xSEChunk
+                chunk = chunk.decoded()
                 log(u'  %4s  %-4u        %u' % (chunk.chunk_type,
                                                 chunk.chunk_version,
                                                 chunk.chunk_length()))
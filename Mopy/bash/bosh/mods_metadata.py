@@ -25,7 +25,7 @@
 import os
 import re
 
-from ._mergeability import is_esl_capable
+from ._mergeability import is_esl_capable, scan_plugins
 from .. import balt, bolt, bush, bass, load_order
 from ..bolt import GPath, deprint, sio, struct_pack, struct_unpack
 from ..brec import ModReader, MreRecord, RecordHeader
@@ -443,11 +443,13 @@ def checkMods(self, showModList=False, showRuleSets=False, showNotes=False,
             else:
                 shouldMerge = active & modInfos.mergeable
             if bush.game.check_esl:
-                for m, modinf in modInfos.items():
-                    if not modinf.is_esl():
-                        continue # we check .esl extension and ESL flagged mods
-                    if not is_esl_capable(modinf, modInfos, reasons=None):
-                        removeEslFlag.add(m)
+                # we check .esl extension and ESL flagged mods
+                esl_infos = [inf for inf in modInfos.values() if inf.is_esl()]
+                header_scans = scan_plugins(esl_infos)
+                for modinf in esl_infos:
+                    if not is_esl_capable(modinf, modInfos, reasons=None,
+                            header_scan=header_scans[modinf.name]):
+                        removeEslFlag.add(modinf.name)
             shouldDeactivateA, shouldDeactivateB = [], []
             for x in active:
                 tags = modInfos[x].getBashTags()
@@ -41,22 +41,34 @@
 from ..bolt import decode, cstrip, unpack_string, unpack_int, unpack_str8, \
     unpack_short, unpack_float, unpack_str16, unpack_byte, struct_pack, \
     struct_unpack, unpack_int_delim, unpack_str16_delim, unpack_byte_delim, \
-    unpack_many
+    unpack_many, lz4_decompress_block, Lz4BlockDecoder
 from ..exception import SaveHeaderError, raise_bolt_error
 
+# The screenshot thumbnails shown last, header -> (width, height, RGB data),
+# least recently used first - see SaveFileHeader.thumbnail
+_thumbnails = OrderedDict()
+_max_thumbnails = 64
+thumbnail_size = (256, 192) # native size of the saves details picture
+
 class SaveFileHeader(object):
     save_magic = 'OVERRIDE'
     # common slots Bash code expects from SaveHeader (added header_size and
     # turned image to a property)
     __slots__ = ('header_size', 'pcName', 'pcLevel', 'pcLocation', 'gameDays',
-                 'gameTicks', 'ssWidth', 'ssHeight', 'ssData', 'masters',
-                 '_mastersStart') # helper attribute to simplify writeMasters
+                 'gameTicks', 'ssWidth', 'ssHeight', 'masters',
+                 '_mastersStart', # helper attribute to simplify writeMasters
+                 # where the screenshot is, it's read when needed
+                 'save_path', '_image_pos', '_image_bpp')
     # map slots to (seek position, unpacker) - seek position negative means
     # seek relative to ins.tell(), otherwise to the beginning of the file
     unpackers = OrderedDict()
     canEditMasters = True
 
+    # slots not stored by cache_fields
+    _uncached = frozenset(('save_path',))
+
     def __init__(self, save_path):
+        self.save_path = save_path
         try:
             with save_path.open('rb') as ins:
                 self.load_header(ins)
@@ -85,15 +97,13 @@ def load_header(self, ins):
         self.masters = [bolt.GPath(decode(x)) for x in self.masters]
 
     def load_image_data(self, ins):
-        self.ssData = ins.read(3 * self.ssWidth * self.ssHeight)
+        self._skip_image(ins, 3)
 
-    def _drop_alpha(self, ins): ## TODO: Setup Bash to use the alpha data
-        # Game is in 32bit RGB, Bash is expecting 24bit RGB
-        ssData = ins.read(4 * self.ssWidth * self.ssHeight)
-        # pick out only every 3 bytes, drop the 4th (alpha channel)
-        #ssAlpha = ''.join(itertools.islice(ssData, 0, None, 4))
-        self.ssData = ''.join(
-            itertools.compress(ssData, itertools.cycle(reversed(range(4)))))
+    def _skip_image(self, ins, bytes_per_pixel):
+        """Skip the screenshot, remembering where it is - it is read and
+        decoded only when needed, see image."""
+        self._image_pos, self._image_bpp = ins.tell(), bytes_per_pixel
+        ins.seek(bytes_per_pixel * self.ssWidth * self.ssHeight, 1)
 
     def load_masters(self, ins):
         self._mastersStart = ins.tell()
@@ -106,7 +116,94 @@ def calc_time(self): pass
 
     @property
     def image(self):
-        return self.ssWidth, self.ssHeight, self.ssData
+        """Return the width, height and RGB data of the full size screenshot,
+        read from the save - see thumbnail for showing it."""
+        return self.ssWidth, self.ssHeight, self._read_image()
+
+    def thumbnail(self, cache_dir=None):
+        """Return the width, height and RGB data of the screenshot scaled down
+        to fit in thumbnail_size. The thumbnails shown last are kept in
+        memory and, if cache_dir is given, all of them on disk there."""
+        thumb = _thumbnails.pop(self, None)
+        if thumb is None:
+            thumb = self._load_thumbnail(cache_dir)
+            if len(_thumbnails) >= _max_thumbnails:
+                _thumbnails.popitem(last=False)
+        _thumbnails[self] = thumb
+        return thumb
+
+    def _load_thumbnail(self, cache_dir):
+        thumb_path = cache_dir and cache_dir.join(
+            self.save_path.tail + u'.thumb')
+        try:
+            save_stat = self.save_path.size_mtime()
+        except OSError:
+            save_stat = thumb_path = None
+        if thumb_path and thumb_path.exists():
+            try:
+                with thumb_path.open('rb') as ins:
+                    cached = unpack_many(ins, '=4I')
+                    thumb_data = ins.read()
+                width, height = cached[2:]
+                if cached[:2] == save_stat and len(
+                        thumb_data) == 3 * width * height:
+                    return width, height, thumb_data
+            except (OSError, IOError, struct.error):
+                bolt.deprint(u'Failed to read %s' % thumb_path,
+                             traceback=True)
+        thumb = _scale_down(self.ssWidth, self.ssHeight, self._read_image(),
+                            *thumbnail_size)
+        if thumb_path:
+            try:
+                thumb_path.head.makedirs()
+                with thumb_path.open('wb') as out:
+                    out.write(struct_pack('=4I', *(save_stat + thumb[:2])))
+                    out.write(thumb[2])
+            except (OSError, IOError):
+                bolt.deprint(u'Failed to write %s' % thumb_path,
+                             traceback=True)
+        return thumb
+
+    def _read_image(self):
+        num_pixels = self.ssWidth * self.ssHeight
+        try:
+            with self.save_path.open('rb') as ins:
+                ins.seek(self._image_pos)
+                ss_data = ins.read(self._image_bpp * num_pixels)
+        except (OSError, IOError):
+            bolt.deprint(u'Failed to read the screenshot of %s' %
+                         self.save_path, traceback=True)
+            ss_data = ''
+        if len(ss_data) != self._image_bpp * num_pixels:
+            return '\x00' * (3 * num_pixels)
+        if self._image_bpp == 4: ## TODO: Setup Bash to use the alpha data
+            # Game is in 32bit RGB, Bash is expecting 24bit RGB - pick out
+            # only every 3 bytes, drop the 4th (alpha channel)
+            ss_data = ''.join(itertools.compress(
+                ss_data, itertools.cycle(reversed(range(4)))))
+        return ss_data
+
+    def cache_fields(self):
+        """Return a dict of the header fields, except for the screenshot,
+        to be cached and passed to from_cache."""
+        fields = {}
+        for klass in type(self).__mro__:
+            for attr in getattr(klass, '__slots__', ()):
+                if attr not in self._uncached and hasattr(self, attr):
+                    fields[attr] = getattr(self, attr)
+        fields['masters'] = list(self.masters)
+        return fields
+
+    @classmethod
+    def from_cache(cls, save_path, fields):
+        """Return a header with the fields returned by cache_fields, without
+        reading the save - the screenshot is read when first needed."""
+        header = cls.__new__(cls)
+        for attr, value in fields.iteritems():
+            setattr(header, attr, value)
+        header.masters = list(header.masters)
+        header.save_path = save_path
+        return header
 
     def writeMasters(self, ins, out):
         """Rewrites masters of existing save file."""
@@ -188,7 +285,7 @@ class SkyrimSaveHeader(SaveFileHeader):
     save_magic = 'TESV_SAVEGAME'
     # extra slots - only version is really used, gameDate used once (calc_time)
     # _formVersion distinguish between old and new save formats
-    # _compressType of Skyrim SE saves - currently unused
+    # _compressType of Skyrim SE saves - 0 none, 1 zlib, 2 lz4
     __slots__ = ('gameDate', 'saveNumber', 'version', 'raceEid', 'pcSex',
                  'pcExp', 'pcLvlExp', 'filetime', '_formVersion',
                  '_compressType')
@@ -225,7 +322,7 @@ def load_image_data(self, ins):
                 ins.tell() - 17, self.header_size))
         #--Image Data
         if self.__is_sse():
-            self._drop_alpha(ins)
+            self._skip_image(ins, 4)
         else:
             super(SkyrimSaveHeader, self).load_image_data(ins)
 
@@ -280,60 +377,51 @@ def _decompress_masters_sse_lz4(ins):
         """Read the start of the LZ4 compressed data in the SSE savefile and
         stop when the whole master table is found.
         Return a file-like object that can be read by _load_masters_16
-        containing the now decompressed master table.
-        See https://fastcompression.blogspot.se/2011/05/lz4-explained.html
-        for an LZ4 explanation/specification."""
-        def _read_lsic_int():
-            # type: () -> int
-            """Read a compressed int from the stream.
-            In short, add every byte to the output until a byte lower than
-            255 is found, then add that as well and return the total sum.
-            LSIC stands for linear small-integer code, taken from
-            https://ticki.github.io/blog/how-lz4-works."""
-            result = 0
-            while True:  # there is no size limit to LSIC values
-                num = unpack_byte(ins)
-                result += num
-                if num != 255:
-                    return result
-        # Skip decompressed/compressed size, we only want the masters table
-        ins.seek(8, 1)
-        uncompressed = ''
-        masters_size = None  # type: int
-        while True:  # parse and decompress each block here
-            token = unpack_byte(ins)
-            # How many bytes long is the literals-field?
-            literal_length = token >> 4
-            if literal_length == 15:  # add more if we hit max value
-                literal_length += _read_lsic_int()
-            # Read all the literals (which are good ol' uncompressed bytes)
-            uncompressed += ins.read(literal_length)
-            # The offset is how many bytes back in the uncompressed string the
-            # start of the match-field (copied bytes) is
-            offset = unpack_short(ins)
-            # How many bytes long is the match-field?
-            match_length = token & 0b1111
-            if match_length == 15:
-                match_length += _read_lsic_int()
-            match_length += 4  # the match-field always gets an extra 4 bytes
-            # The boundary of the match-field
-            start_pos = len(uncompressed) - offset
-            end_pos = start_pos + match_length
-            # Matches can be overlapping (aka including not yet decompressed
-            # data) so we can't jump the whole match_length directly
-            while start_pos < end_pos:
-                uncompressed += uncompressed[start_pos:min(start_pos + offset,
-                                                           end_pos)]
-                start_pos += offset
-            # The masters table's size is found in bytes 1-5
-            if masters_size is None and len(uncompressed) >= 5:
-                masters_size = struct_unpack('I', uncompressed[1:5])[0]
-            # Stop when we have the whole masters table
-            if masters_size is not None:
-                if len(uncompressed) >= masters_size + 5:
-                    break
-        # Wrap the decompressed data in a file-like object and return it
-        return StringIO.StringIO(uncompressed)
+        containing the now decompressed master table."""
+        decompressed_size = unpack_int(ins)
+        remaining = unpack_int(ins) # compressed size
+        decoder = Lz4BlockDecoder(decompressed_size)
+        masters_end = 5 # the masters table size is in bytes 1-5
+        try:
+            while True:
+                decoded = decoder.decode(masters_end)
+                if masters_end == 5 and decoded >= 5:
+                    masters_end += struct_unpack('I', str(decoder.out[1:5]))[0]
+                    continue
+                if decoded >= masters_end:
+                    return StringIO.StringIO(str(decoder.out))
+                # the masters table is at the start - read the compressed
+                # data a chunk at a time, only as far as it goes
+                chunk = ins.read(min(0x10000, remaining))
+                if not chunk:
+                    raise SaveHeaderError(u'LZ4 compressed save data ended '
+                                          u'before the masters table')
+                remaining -= len(chunk)
+                decoder.feed(chunk)
+        except ValueError as e:
+            raise SaveHeaderError(u'%s' % e)
+
+    def read_body(self):
+        """Return the save data that follows the screenshot, decompressed if
+        this is a compressed SSE save."""
+        with self.save_path.open('rb') as ins:
+            ins.seek(self._image_pos + self._image_bpp * self.ssWidth *
+                     self.ssHeight)
+            if not (self.__is_sse() and self._compressType in (1, 2)):
+                return ins.read()
+            decompressed_size = unpack_int(ins)
+            compressed = ins.read(unpack_int(ins))
+        try:
+            if self._compressType == 2:
+                return lz4_decompress_block(compressed, decompressed_size)
+            body = zlib.decompress(compressed)
+        except (ValueError, zlib.error) as e:
+            raise SaveHeaderError(u'%s' % e)
+        if len(body) != decompressed_size:
+            raise SaveHeaderError(u'zlib-decompressed save data size '
+                u'incorrect - expected %u, but got %u.' % (
+                    decompressed_size, len(body)))
+        return body
 
     def calc_time(self):
         # gameDate format: hours.minutes.seconds
@@ -358,7 +446,7 @@ def load_image_data(self, ins):
             u'New Save game header size (%s) not as expected (%s).' % (
                 ins.tell() - 16, self.header_size))
         #--Image Data
-        self._drop_alpha(ins)
+        self._skip_image(ins, 4)
 
     def load_masters(self, ins):
         self._formVersion = unpack_byte(ins)
@@ -490,6 +578,24 @@ class Fallout3SaveHeader(FalloutNVSaveHeader):
     del unpackers['language']
 
 # Factory
+def _scale_down(width, height, rgb_data, max_width, max_height):
+    """Scale the RGB image down (nearest neighbour) to fit in max_width x
+    max_height and return its new width, height and RGB data."""
+    scale = min(1.0, float(max_width) / (width or 1),
+                float(max_height) / (height or 1))
+    new_width, new_height = int(width * scale), int(height * scale)
+    if (new_width, new_height) == (width, height) or not (
+            new_width and new_height):
+        return width, height, rgb_data
+    columns = [3 * (x * width // new_width) for x in xrange(new_width)]
+    row_size = 3 * width
+    rows = []
+    for y in xrange(new_height):
+        row_start = row_size * (y * height // new_height)
+        row = rgb_data[row_start:row_start + row_size]
+        rows.append(''.join([row[c:c + 3] for c in columns]))
+    return new_width, new_height, ''.join(rows)
+
 def get_save_header_type(game_fsName):
     """:rtype: type"""
     if game_fsName == u'Oblivion':
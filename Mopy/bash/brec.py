@@ -209,6 +209,75 @@ def __repr__(self):
             return u'<Record Header: %s v%u>' % (strFid(self.fid),
                                                   self.form_version)
 
+#------------------------------------------------------------------------------
+class RecordHeaderScan(object):
+    """Summary of the records of a plugin, as gathered by
+    scan_record_headers."""
+
+    def __init__(self):
+        self.top_types = set() # all top groups in the plugin
+        self.max_new_object_id = 0 # largest object index of a new record
+        self.new_top_types = set() # top groups with new, not deleted records
+        self.error = None # unicode message if the plugin could not be read
+
+def scan_record_headers(scan_args):
+    """Walk all the record and group headers of a plugin, seeking over the
+    record data, to gather the information mergeability and ESL checks need.
+    No subrecord is ever decoded. Meant to run on a worker thread, one
+    plugin per call, so it takes a single tuple of arguments as passed by
+    bolt.imap_parallel and only opens its own file handle.
+
+    :param scan_args: tuple of the path of the plugin (unicode), its number of
+        masters and the record header size of the game
+    :rtype: RecordHeaderScan"""
+    mod_path, num_masters, header_size = scan_args
+    scan = RecordHeaderScan()
+    try:
+        with open(mod_path, 'rb') as ins:
+            ins_read, ins_seek = ins.read, ins.seek
+            file_size = os.fstat(ins.fileno()).st_size
+            # skip the plugin header record, masters are passed in
+            pos = header_size + struct_unpack('=4sI', ins_read(8))[1]
+            group_ends = [] # end offsets of the groups we are inside of
+            top_label = None
+            while pos < file_size:
+                while group_ends and pos >= group_ends[-1]:
+                    group_ends.pop()
+                ins_seek(pos)
+                rec_head = ins_read(header_size)
+                if len(rec_head) != header_size:
+                    raise exception.ModReadError(GPath(mod_path), 'REC_HEADER',
+                        pos + header_size, file_size)
+                rec_type, size, arg1, arg2 = struct_unpack('=4s3I',
+                                                           rec_head[:16])
+                if rec_type == 'GRUP':
+                    if not group_ends:
+                        if arg2 != 0: # groupType
+                            raise exception.ModError(mod_path,
+                                u'Improperly grouped file.')
+                        top_label = rec_head[8:12]
+                        scan.top_types.add(top_label)
+                    group_ends.append(pos + size)
+                    pos += header_size
+                    continue
+                if not group_ends:
+                    raise exception.ModError(mod_path,
+                                             u'Improperly grouped file.')
+                # arg1 is flags1, arg2 the fid - 0x1000 is the ignored flag,
+                # 0x20 the deleted one
+                if arg2 >> 24 >= num_masters and not arg1 & 0x1000:
+                    scan.max_new_object_id = max(scan.max_new_object_id,
+                                                 arg2 & 0xFFFFFF)
+                    if len(group_ends) == 1 and not arg1 & 0x20:
+                        scan.new_top_types.add(top_label)
+                pos += header_size + size
+            if pos > file_size:
+                raise exception.ModReadError(GPath(mod_path), rec_type, pos,
+                                             file_size)
+    except (IOError, OSError, struct.error, exception.ModError) as e:
+        scan.error = u'%s' % e
+    return scan
+
 #------------------------------------------------------------------------------
 class ModReader(object):
     """Wrapper around a TES4 file in read mode.
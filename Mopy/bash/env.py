@@ -24,13 +24,15 @@
 
 """WIP module to encapsulate environment access - currently OS dependent stuff.
 """
+import ctypes
 import errno
 import os as _os
 import re as _re
 import shutil as _shutil
 import stat
 
-from bolt import GPath, deprint, Path, decode, struct_unpack
+from bolt import GPath, deprint, Path, decode, struct_unpack, \
+    imap_parallel, pool_size
 from exception import BoltError, CancelError, SkipError, AccessDeniedError, \
     DirectoryFileCollisionError, FileOperationError, NonExistentDriveError
 
@@ -662,6 +664,101 @@ def shellCopy(filesFrom, filesTo, parent=None, askOverwrite=False,
                           confirm=askOverwrite, renameOnCollision=autoRename,
                           silent=False, parent=parent)
 
+def hard_link(source, target):
+    """Create a hard link at target to the file at source."""
+    if hasattr(_os, 'link'):
+        _os.link(source, target)
+    elif not ctypes.windll.kernel32.CreateHardLinkW(target, source, None):
+        raise ctypes.WinError() # no os.link on windows before python 3.2
+
+def link_count(path):
+    """Return the number of hard links to the file at path. Python 2 always
+    reports 0 links on windows, so ask GetFileInformationByHandle there."""
+    if _os.name != 'nt': return _os.stat(path).st_nlink
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateFileW.restype = ctypes.c_void_p
+    # no access needed, share everything, OPEN_EXISTING, open dirs too
+    handle = kernel32.CreateFileW(path, 0, 7, None, 3, 0x02000000, None)
+    if handle is None or handle == ctypes.c_void_p(-1).value:
+        raise ctypes.WinError()
+    handle = ctypes.c_void_p(handle)
+    try:
+        info = ctypes.create_string_buffer(52) # BY_HANDLE_FILE_INFORMATION
+        if not kernel32.GetFileInformationByHandle(handle, info):
+            raise ctypes.WinError()
+        return struct_unpack('I', info.raw[40:44])[0] # nNumberOfLinks
+    finally:
+        kernel32.CloseHandle(handle)
+
+def _transfer_file(src_target_move_link):
+    """Copy (or move) a file, hard linking it instead of copying if
+    requested and possible, and return the mtime of the target - or the
+    exception raised. Runs on a worker thread, see transfer_files."""
+    source, target, move, link = src_target_move_link
+    try:
+        target_dir = _os.path.dirname(target)
+        if not _os.path.isdir(target_dir):
+            try:
+                _os.makedirs(target_dir)
+            except OSError as e: # another worker may have created it
+                if e.errno != errno.EEXIST: raise
+        # can't rename or link over files on windows - and copying over the
+        # target would write through it if it's a hard link, to a project
+        # file (hardLinkProjects) or to a stored file (bosh.content_store)
+        if _os.path.lexists(target):
+            clear_read_only(target)
+            _os.remove(target)
+        if move:
+            try:
+                _os.rename(source, target)
+            except OSError as e:
+                if e.errno != errno.EXDEV: raise
+                _shutil.move(source, target) # different file systems
+        else:
+            try:
+                if not link: raise OSError(errno.EXDEV, u'No link')
+                hard_link(source, target)
+            except OSError:
+                _shutil.copy2(source, target) # copies the mtime too
+        return int(_os.path.getmtime(target))
+    except (OSError, IOError, _shutil.Error) as e:
+        return e
+
+def transfer_files(sources, targets, move=False, hard_link=False,
+                   progress=None, parent=None, max_workers=None):
+    """Copy or move the files in sources to the paths in targets on a thread
+    pool, so that several transfers run at once on disks that can handle
+    it, creating target dirs as needed and overwriting existing targets.
+    Moves are renames on the same file system. If hard_link is True copies
+    are hard links instead, if source and target are on the same file
+    system. Transfers that fail (for instance because they need elevated
+    permissions) are retried by the shell at the end in one go.
+    Return the mtimes of the targets, in order.
+
+    :type sources: list[Path]
+    :type targets: list[Path]"""
+    if not sources: return []
+    jobs = [(src.s, target.s, move, hard_link) for src, target in
+            zip(sources, targets)]
+    mtimes, failed = [], []
+    if progress: progress.setFull(len(jobs))
+    for dex, result in enumerate(imap_parallel(_transfer_file, jobs,
+                                               max_workers or
+                                               2 * pool_size())):
+        if isinstance(result, EnvironmentError):
+            deprint(u'Failed to transfer %s to %s: %r - retrying with the '
+                    u'shell' % (jobs[dex][0], jobs[dex][1], result))
+            failed.append(dex)
+        if progress: progress(dex, sources[dex].stail)
+        mtimes.append(result)
+    if failed:
+        operation = FO_MOVE if move else FO_COPY
+        _fileOperation(operation, [sources[x] for x in failed],
+                       [targets[x] for x in failed], allowUndo=False,
+                       confirm=False, parent=parent)
+        for dex in failed: mtimes[dex] = targets[dex].mtime
+    return mtimes
+
 def shellMakeDirs(dirs, parent=None):
     if not dirs: return
     dirs = [dirs] if not isinstance(dirs, (list, tuple, set)) else dirs
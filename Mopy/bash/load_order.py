@@ -40,6 +40,9 @@
 
 __author__ = 'Utumno'
 
+import bisect
+import cPickle
+import difflib
 import sys
 import math
 import collections
@@ -53,6 +56,7 @@
 import _games_lo
 _game_handle = None # type: _games_lo.Game
 _plugins_txt_path = _loadorder_txt_path = _lord_pickle_path = None
+_lord_history_path = None
 # Load order locking
 locked = False
 warn_locked = False
@@ -77,10 +81,13 @@ def initialize_load_order_files():
         _dir = bass.dirs['app']
     else:
         _dir = bass.dirs['userApp']
-    global _plugins_txt_path, _loadorder_txt_path, _lord_pickle_path
+    global _plugins_txt_path, _loadorder_txt_path, _lord_pickle_path, \
+        _lord_history_path
     _plugins_txt_path = _dir.join(u'plugins.txt')
     _loadorder_txt_path = _dir.join(u'loadorder.txt')
     _lord_pickle_path = bass.dirs['saveBase'].join(u'BashLoadOrders.dat')
+    _lord_history_path = bass.dirs['saveBase'].join(
+        u'BashLoadOrderHistory.dat')
 
 def initialize_load_order_handle(mod_infos):
     global _game_handle
@@ -155,24 +162,230 @@ def __unicode__(self):
 
 # Saved load orders
 lo_entry = collections.namedtuple('lo_entry', ['date', 'lord'])
-_saved_load_orders = [] # type: list[lo_entry]
+
+def _lo_diff(old, new):
+    """Return the opcodes turning the old tuple of plugin ids into the new
+    one, as (old index, new index, old ids, new ids) tuples - they can be
+    applied both ways, see _LoHistory._apply."""
+    # SequenceMatcher is much faster on the part that actually changed
+    start, common = 0, min(len(old), len(new))
+    while start < common and old[start] == new[start]: start += 1
+    end = 0
+    while end < common - start and old[-1 - end] == new[-1 - end]: end += 1
+    old_mid, new_mid = old[start:len(old) - end], new[start:len(new) - end]
+    opcodes = difflib.SequenceMatcher(None, old_mid, new_mid,
+                                      autojunk=False).get_opcodes()
+    return tuple((start + i1, start + j1, old_mid[i1:i2], new_mid[j1:j2])
+                 for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+
+class _LoHistory(object):
+    """The saved load orders, a list of lo_entry used for undo/redo. Plugin
+    names are interned to ids and each entry is stored as the move and
+    activation diff against the entry it was created from, with a full
+    keyframe every _keyframe_interval diffs. New entries are appended to the
+    history file, which is rewritten only when compacted."""
+    _keyframe_interval = 32
+
+    def __init__(self, history_path):
+        self._history_path = history_path
+        self._names = [] # id -> bolt.Path
+        self._name_id = {} # bolt.Path -> id
+        self._order = [] # list index -> serial of the entry
+        self._date = [] # serial -> time
+        self._base = [] # serial -> serial of its base or None if a keyframe
+        self._depth = [] # serial -> diffs since the keyframe
+        self._payload = [] # serial -> (lo ids, active ids) or the diff
+        self._cache = collections.OrderedDict() # serial -> (lo ids,
+        # frozenset of active ids, LoadOrder), most recently used last
+        self._pending = [] # records not yet written
+        self._rewrite = False
+
+    def __len__(self): return len(self._order)
+
+    def __getitem__(self, index):
+        serial = self._order[index]
+        return lo_entry(self._date[serial], self._materialize(serial)[2])
+
+    def insert(self, index, entry):
+        """Insert an lo_entry - diffed against the entry used last."""
+        self._add(index, entry.date, entry.lord,
+                  next(reversed(self._cache), None))
+
+    # Storage -----------------------------------------------------------------
+    def _intern(self, paths):
+        new_names = [x for x in paths if x not in self._name_id]
+        if new_names:
+            for name in new_names:
+                self._name_id[name] = len(self._names)
+                self._names.append(name)
+            self._pending.append(('n', [x.s for x in new_names]))
+        return tuple(self._name_id[x] for x in paths)
+
+    def _add(self, index, date, lord, base):
+        lo_ids = self._intern(lord.loadOrder)
+        act_ids = frozenset(self._intern(lord.activeOrdered))
+        if base is not None and self._depth[
+                base] < self._keyframe_interval - 1:
+            base_lo, base_act, _base_lord = self._materialize(base)
+            payload = (_lo_diff(base_lo, lo_ids), tuple(act_ids - base_act),
+                       tuple(base_act - act_ids))
+            depth = self._depth[base] + 1
+        else:
+            payload, base, depth = (lo_ids, tuple(act_ids)), None, 0
+        self._pending.append(('e', index, date, base, payload))
+        self._append(index, date, base, payload, depth)
+        self._cache_entry(len(self._date) - 1, (lo_ids, act_ids, lord))
+
+    def _append(self, index, date, base, payload, depth):
+        self._order.insert(index, len(self._date))
+        self._date.append(date)
+        self._base.append(base)
+        self._depth.append(depth)
+        self._payload.append(payload)
+
+    def _cache_entry(self, serial, materialized, __max_cached=8):
+        self._cache.pop(serial, None)
+        self._cache[serial] = materialized
+        if len(self._cache) > __max_cached:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _apply(lo_ids, act_ids, payload, forward=True):
+        lo_diff, activated, deactivated = payload
+        lo_ids = list(lo_ids)
+        for i1, j1, old_ids, new_ids in reversed(lo_diff):
+            if forward: lo_ids[i1:i1 + len(old_ids)] = new_ids
+            else: lo_ids[j1:j1 + len(new_ids)] = old_ids
+        if not forward: activated, deactivated = deactivated, activated
+        return tuple(lo_ids), act_ids.difference(deactivated).union(activated)
+
+    def _materialize(self, serial):
+        """Return the (lo ids, active ids, LoadOrder) of an entry, applying
+        the diffs from its keyframe or, cheaper when undoing, reverting the
+        diffs of a descendant of it that was used recently."""
+        cached = self._cache.get(serial)
+        if cached is not None:
+            self._cache_entry(serial, cached)
+            return cached
+        chain = [serial] # serial and its ancestors up to a cached or keyframe
+        while self._base[chain[-1]] is not None and chain[-1] not in \
+                self._cache:
+            chain.append(self._base[chain[-1]])
+        descendant = None
+        for cached_serial in reversed(self._cache):
+            path, current = [], cached_serial
+            while current is not None and len(path) < len(chain) - 1 and \
+                    current != serial:
+                path.append(current)
+                current = self._base[current]
+            if current == serial and (descendant is None or len(path) < len(
+                    descendant)):
+                descendant = path
+        if descendant is not None: # revert the diffs down to serial
+            lo_ids, act_ids, _lord = self._cache[descendant[0]]
+            for current in descendant:
+                lo_ids, act_ids = self._apply(lo_ids, act_ids,
+                                              self._payload[current], False)
+        else:
+            start = chain.pop()
+            if start in self._cache:
+                lo_ids, act_ids, _lord = self._cache[start]
+            else:
+                lo_ids, act_ids = self._payload[start]
+                act_ids = frozenset(act_ids)
+            for current in reversed(chain):
+                lo_ids, act_ids = self._apply(lo_ids, act_ids,
+                                              self._payload[current])
+        names = self._names
+        materialized = (lo_ids, act_ids, LoadOrder(
+            [names[x] for x in lo_ids], [names[x] for x in act_ids]))
+        self._cache_entry(serial, materialized)
+        return materialized
+
+    def load(self):
+        """Read the history file - a truncated last record is dropped."""
+        if not self._history_path.exists(): return
+        history_size = self._history_path.size
+        with self._history_path.open('rb') as ins:
+            while ins.tell() < history_size:
+                try:
+                    record = cPickle.load(ins)
+                except Exception: # EOFError if truncated
+                    bolt.deprint(u'Load order history %s is corrupted' %
+                                 self._history_path, traceback=True)
+                    self._rewrite = True
+                    break
+                if record[0] == 'n':
+                    for name in record[1]:
+                        self._name_id[bolt.GPath(name)] = len(self._names)
+                        self._names.append(bolt.GPath(name))
+                else:
+                    _tag, index, date, base, payload = record
+                    self._append(index, date, base, payload, 0 if (
+                        base is None) else self._depth[base] + 1)
+
+    def save(self):
+        """Append the new entries to the history file, or rewrite it."""
+        if not self._pending and not self._rewrite: return
+        if self._rewrite:
+            out_path = self._history_path.temp
+            records = self._all_records()
+        else:
+            out_path, records = self._history_path, self._pending
+        with out_path.open('ab' if out_path is self._history_path else 'wb'
+                           ) as out:
+            for record in records:
+                cPickle.dump(record, out, -1)
+        if self._rewrite: self._history_path.untemp()
+        self._pending = []
+        self._rewrite = False
+
+    def _all_records(self):
+        records = [('n', [x.s for x in self._names])]
+        serial_index = {x: i for i, x in enumerate(self._order)}
+        # write the entries in serial order, so that bases come first, each
+        # one inserted among the ones written so far
+        written = []
+        for serial in xrange(len(self._date)):
+            index = bisect.bisect(written, serial_index[serial])
+            written.insert(index, serial_index[serial])
+            records.append(('e', index, self._date[serial], self._base[
+                serial], self._payload[serial]))
+        return records
+
+    def compact(self, start, stop):
+        """Keep only the entries in [start:stop]."""
+        self.reset([self[x] for x in xrange(start, stop)])
+
+    def reset(self, entries):
+        """Replace the history with a list of lo_entry, each one diffed
+        against the previous one."""
+        self.__init__(self._history_path)
+        for index, (date, lord) in enumerate(entries):
+            self._add(index, date, lord, index - 1 if index else None)
+        self._pending = []
+        self._rewrite = True
+
+_saved_load_orders = None # type: _LoHistory
 _current_list_index = -1
 
 def _new_entry():
-    _saved_load_orders[_current_list_index:_current_list_index] = [
-        lo_entry(time.time(), cached_lord)]
+    _saved_load_orders.insert(_current_list_index,
+                              lo_entry(time.time(), cached_lord))
 
 def persist_orders(__keep_max=256):
-    _lords_pickle.vdata['_lords_pickle_version'] = 2
+    """Save the load order history, keeping __keep_max entries around the
+    current one if it grew to twice that, and the active mods lists."""
+    global _current_list_index
+    _lords_pickle.vdata['_lords_pickle_version'] = 3
     length = len(_saved_load_orders)
-    if length > __keep_max:
+    if length > 2 * __keep_max:
         x, y = _keep_max(__keep_max, length)
-        _lords_pickle.data['_saved_load_orders'] = \
-            _saved_load_orders[_current_list_index - x:_current_list_index + y]
-        _lords_pickle.data['_current_list_index'] = x
-    else:
-        _lords_pickle.data['_saved_load_orders'] = _saved_load_orders
-        _lords_pickle.data['_current_list_index'] = _current_list_index
+        _saved_load_orders.compact(_current_list_index - x,
+                                   _current_list_index + y)
+        _current_list_index = x
+    _saved_load_orders.save()
+    _lords_pickle.data['_current_list_index'] = _current_list_index
     _lords_pickle.data['_active_mods_lists'] = _active_mods_lists
     ##: save them also in BashSettings.dat in case someone downgrades - drop !
     bass.settings['bash.loadLists.data'] = _active_mods_lists
@@ -325,8 +538,14 @@ def __load_pickled_load_orders():
         active_mods_list = __active_mods_sentinel
     else:
         active_mods_list = {}
-    _saved_load_orders = _lords_pickle.data.get('_saved_load_orders', [])
-    _current_list_index = _lords_pickle.data.get('_current_list_index', -1)
+    _saved_load_orders = _LoHistory(_lord_history_path)
+    _saved_load_orders.load()
+    # version 2 pickled the whole LoadOrder of every entry
+    pickled_orders = _lords_pickle.data.pop('_saved_load_orders', None)
+    if pickled_orders and not len(_saved_load_orders):
+        _saved_load_orders.reset(pickled_orders)
+    _current_list_index = min(_lords_pickle.data.get(
+        '_current_list_index', -1), len(_saved_load_orders) - 1)
     _active_mods_lists = _lords_pickle.data.get('_active_mods_lists',
                                                 active_mods_list)
     locked = bass.settings.get('bosh.modInfos.resetMTimes', False)
@@ -365,6 +584,11 @@ def __restore(index_move):
 # API helpers
 def swap(old_path, new_path): _game_handle.swap(old_path, new_path)
 
+def mods_changed():
+    """Plugins were added, removed, renamed or had their header flags changed
+    - the next load order validation must check all of them."""
+    if _game_handle is not None: _game_handle.mods_changed()
+
 def must_be_active_if_present():
     return set(_game_handle.must_be_active_if_present) | (
         set() if _game_handle.allow_deactivate_master else {
@@ -0,0 +1,212 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash; if not, write to the Free Software Foundation,
+#  Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2019 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+
+"""
+Benchmarks load order validation (_games_lo.Game) on a large fake plugin
+list - 2000 plugins by default, about a tenth of them active.
+
+Times a full validation, moving a single plugin and toggling a single
+plugin (which only check what changed since the last validated load order)
+and checks that those give the same results as a full validation.
+"""
+
+import argparse
+import gettext
+import os
+import random
+import sys
+import timeit
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+MOPY_PATH = os.path.abspath(os.path.join(SCRIPTS_PATH, u"..", u"Mopy"))
+sys.path.insert(0, MOPY_PATH)
+gettext.install("wrye_bash", unicode=True)
+
+from bash import _games_lo
+from bash.bolt import GPath
+
+
+class _Flags(object):
+    def __init__(self, esm):
+        self.esm, self.eslFile = esm, False
+
+    def __int__(self):
+        return int(self.esm)
+
+
+class _Header(object):
+    def __init__(self, esm):
+        self.flags1 = _Flags(esm)
+
+
+class _ModInfo(object):
+    """The bits of bosh.ModInfo that load order validation uses."""
+
+    def __init__(self, name):
+        self.name = name
+        self.header = _Header(name.cext == u".esm")
+
+    def get_extension(self):
+        return self.name.cext
+
+    def has_esm_flag(self):
+        return self.header.flags1.esm
+
+    def is_esl(self):
+        return False
+
+
+class _ModInfos(dict):
+    masterName = GPath(u"Skyrim.esm")
+
+
+class _Game(_games_lo.Skyrim):
+    """Never writes the load order files."""
+
+    def _persist_load_order(self, *args):
+        pass
+
+    def _persist_active_plugins(self, *args):
+        pass
+
+    def _backup_load_order(self):
+        pass
+
+    def _backup_active_plugins(self):
+        pass
+
+
+def make_game(num_plugins, num_masters=100):
+    mods = [_ModInfos.masterName]
+    mods.extend(GPath(u"Master%04d.esm" % i) for i in range(num_masters))
+    mods.extend(
+        GPath(u"Plugin%04d.esp" % i) for i in range(num_plugins - len(mods))
+    )
+    mod_infos = _ModInfos((mod, _ModInfo(mod)) for mod in mods)
+    nowhere = GPath(os.path.join(SCRIPTS_PATH, u"nowhere"))
+    return _Game(mod_infos, nowhere.join(u"plugins.txt"), nowhere.join(u"loadorder.txt"))
+
+
+def full_validation(game, lord, acti):
+    """Validate from scratch on a new game handle."""
+    fresh = _Game(game.mod_infos, game.plugins_txt_path, game.loadorder_txt_path)
+    lord, acti = list(lord), list(acti)
+    fresh._fix_load_order(lord, None)
+    fresh._fix_active_plugins(acti, lord, False, None)
+    return tuple(lord), tuple(acti)
+
+
+def _move(rand, lord, acti):
+    new = list(lord)
+    new.insert(rand.randrange(1, len(new)), new.pop(rand.randrange(1, len(new))))
+    return new, None, list(lord), list(acti)
+
+
+def _toggle(rand, lord, acti):
+    new, mod = list(acti), rand.choice(lord[1:])
+    if mod in new:
+        new.remove(mod)
+    else:
+        lo_index = {x: i for i, x in enumerate(lord)}
+        new.append(mod)
+        new.sort(key=lo_index.__getitem__)
+    return None, new, list(lord), list(acti)
+
+
+def main(args):
+    rand = random.Random(args.seed)
+    game = make_game(args.plugins)
+    lord = list(game.mod_infos)
+    rand.shuffle(lord)
+    acti = rand.sample(lord, min(args.plugins // 10, game.max_espms - 1))
+    lord, acti = full_validation(game, lord, acti)
+    game._fix_load_order(list(lord), None)
+    game._fix_active_plugins(list(acti), list(lord), False, None)
+    #--Correctness of the incremental validation
+    for step in range(args.checks):
+        change = _move if rand.random() < 0.5 else _toggle
+        new_lord, new_acti, prev_lord, prev_acti = change(rand, lord, acti)
+        lord_acti = tuple(
+            map(
+                tuple,
+                game.set_load_order(
+                    new_lord, new_acti, prev_lord, prev_acti, dry_run=True
+                ),
+            )
+        )
+        expected = full_validation(
+            game, new_lord or prev_lord, new_acti or prev_acti
+        )
+        assert lord_acti == expected, u"mismatch at step %d" % step
+        lord, acti = lord_acti
+    print(u"%d changes validated as by a full validation" % args.checks)
+    #--Flagging an esp as esm must move it to the masters block
+    mod = next(x for x in reversed(lord) if x.cext == u".esp")
+    game.mod_infos[mod].header.flags1.esm = True
+    game.mods_changed()
+    new_lord = list(lord)
+    game._fix_load_order(new_lord, None)
+    assert tuple(new_lord) == full_validation(game, lord, acti)[0] != lord
+    game.mod_infos[mod].header.flags1.esm = False
+    game.mods_changed()
+    #--Timings, of the validation only
+    timer = timeit.default_timer
+
+    def timed_change(change):
+        args = change(rand, *state["lo"])
+        start = timer()
+        state["lo"] = game.set_load_order(*args, dry_run=True)
+        return timer() - start
+
+    def timed_full():
+        lord, acti = list(state["lo"][0]), list(state["lo"][1])
+        start = timer()
+        game.mods_changed()
+        game._fix_load_order(lord, None)
+        game._fix_active_plugins(acti, lord, False, None)
+        return timer() - start
+
+    state = {"lo": (lord, acti)}
+    for name, func in (
+        (u"full validation", timed_full),
+        (u"move a plugin", lambda: timed_change(_move)),
+        (u"toggle a plugin", lambda: timed_change(_toggle)),
+    ):
+        best = min(sum(func() for _ in range(args.number)) for _ in range(5))
+        print(u"%s: %.2f ms" % (name, best / args.number * 1000))
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        "--plugins", type=int, default=2000, help="Number of plugins"
+    )
+    argparser.add_argument(
+        "--checks", type=int, default=300, help="Changes checked for correctness"
+    )
+    argparser.add_argument(
+        "--number", type=int, default=20, help="Runs per timing"
+    )
+    argparser.add_argument("--seed", type=int, default=42, help="Random seed")
+    main(argparser.parse_args())
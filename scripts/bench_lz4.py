@@ -0,0 +1,199 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash; if not, write to the Free Software Foundation,
+#  Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2019 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+
+"""
+Checks and benchmarks the pure python LZ4 block decoder used for SSE saves
+(bolt.lz4_decompress_block / bolt.Lz4BlockDecoder).
+
+The fixtures are generated with a minimal reference LZ4 block compressor so
+the script does not need the lz4 module. Every fixture is decoded whole, up
+to a random prefix and a chunk at a time, then the biggest one is timed.
+Pass SSE save paths to also time decompressing their full bodies.
+"""
+
+import argparse
+import gettext
+import os
+import random
+import struct
+import sys
+import time
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+MOPY_PATH = os.path.abspath(os.path.join(SCRIPTS_PATH, u"..", u"Mopy"))
+sys.path.insert(0, MOPY_PATH)
+gettext.install("wrye_bash", unicode=True)
+
+from bash import bolt
+
+
+def _length_bytes(length):
+    out = []
+    while length >= 255:
+        out.append("\xff")
+        length -= 255
+    out.append(chr(length))
+    return "".join(out)
+
+
+def compress_block(data):
+    """Greedy LZ4 block compressor - slow, but produces valid blocks with
+    long literals, long and overlapping matches."""
+    out, table = [], {}
+    pos, lit_start, end = 0, 0, len(data)
+    while pos < end - 12:
+        key = data[pos : pos + 4]
+        match, table[key] = table.get(key), pos
+        if match is None or pos - match > 0xFFFF:
+            pos += 1
+            continue
+        length = 4
+        while pos + length < end - 5 and data[match + length] == data[pos + length]:
+            length += 1
+        literals = data[lit_start:pos]
+        lit_len, match_len = len(literals), length - 4
+        out.append(chr(min(lit_len, 15) << 4 | min(match_len, 15)))
+        if lit_len >= 15:
+            out.append(_length_bytes(lit_len - 15))
+        out.append(literals)
+        out.append(struct.pack("<H", pos - match))
+        if match_len >= 15:
+            out.append(_length_bytes(match_len - 15))
+        pos += length
+        lit_start = pos
+    literals = data[lit_start:]
+    out.append(chr(min(len(literals), 15) << 4))
+    if len(literals) >= 15:
+        out.append(_length_bytes(len(literals) - 15))
+    out.append(literals)
+    return "".join(out)
+
+
+def make_fixtures(seed, count, big_size):
+    """Return (name, data, compressed data) tuples - random runs of random
+    words, plus one big_size block of save-like data to time."""
+    rand = random.Random(seed)
+    fixtures = [("empty", "", compress_block(""))]
+    for num in range(count):
+        words = [
+            "".join(chr(rand.randint(0, 255)) for _ in range(rand.randint(1, 30)))
+            for _ in range(20)
+        ]
+        data = "".join(
+            rand.choice(words) * rand.randint(1, 40)
+            for _ in range(rand.randint(1, 200))
+        )
+        fixtures.append(("random_%03d" % num, data, compress_block(data)))
+    # form ids, small ints and repeated strings, roughly like a save body
+    chunks, size = [], 0
+    while size < big_size:
+        chunk = (
+            struct.pack("<IH", rand.randint(0, 0xFFFFF), rand.randint(0, 8))
+            + rand.choice(["Skyrim.esm", "Update.esm", "\x00" * 8, "ACTOR"])
+            * rand.randint(1, 3)
+        )
+        chunks.append(chunk)
+        size += len(chunk)
+    data = "".join(chunks)[:big_size]
+    fixtures.append(("save_like", data, compress_block(data)))
+    return fixtures
+
+
+def check_fixture(name, data, compressed, rand):
+    size = len(data)
+    assert bolt.lz4_decompress_block(compressed, size) == data, name
+    stop_at = rand.randint(0, size)
+    prefix = bolt.lz4_decompress_block(compressed, size, stop_at=stop_at)
+    assert len(prefix) >= stop_at and data.startswith(prefix), name
+    cut = compressed[: rand.randint(0, len(compressed))]
+    prefix = bolt.lz4_decompress_block(cut, size, stop_at=size)
+    assert data.startswith(prefix), name
+    # a chunk at a time, like the SSE save masters are read
+    decoder, pos = bolt.Lz4BlockDecoder(size), 0
+    while pos < len(compressed):
+        chunk = rand.randint(1, 64)
+        decoder.feed(compressed[pos : pos + chunk])
+        pos += chunk
+        decoder.decode(rand.randint(0, size))
+    decoder.decode()
+    assert str(decoder.out) == data, name
+    try:
+        bolt.lz4_decompress_block(compressed[:-1], size)
+    except ValueError:
+        pass
+    else:
+        assert not size, name
+
+
+def _time(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def main(args):
+    rand = random.Random(args.seed)
+    fixtures = make_fixtures(args.seed, args.fixtures, args.size * 1024 * 1024)
+    for name, data, compressed in fixtures:
+        check_fixture(name, data, compressed, rand)
+    print(u"%d fixtures decoded correctly" % len(fixtures))
+    if bolt.lz4_block is not None:
+        print(u"lz4 module installed, whole blocks are decoded natively")
+    name, data, compressed = fixtures[-1]
+    result, elapsed = _time(
+        bolt.lz4_decompress_block, compressed, len(data), len(data)
+    )
+    assert result == data
+    print(
+        u"%s: %.1f MB in %.2fs - %.1f MB/s (pure python)"
+        % (name, len(data) / 1e6, elapsed, len(data) / 1e6 / elapsed)
+    )
+    if args.saves:
+        from bash.bosh import save_headers
+
+        for save_path in args.saves:
+            header = save_headers.SkyrimSaveHeader(bolt.GPath(save_path))
+            body, elapsed = _time(header.read_body)
+            print(
+                u"%s: %.1f MB body in %.2fs - %.1f MB/s"
+                % (save_path, len(body) / 1e6, elapsed, len(body) / 1e6 / elapsed)
+            )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        "saves", nargs="*", help="SSE saves to time decompressing the body of"
+    )
+    argparser.add_argument(
+        "--seed", type=int, default=42, help="Seed of the generated fixtures"
+    )
+    argparser.add_argument(
+        "--fixtures", type=int, default=200, help="Number of random fixtures"
+    )
+    argparser.add_argument(
+        "--size", type=int, default=8, help="MB of the timed fixture"
+    )
+    main(argparser.parse_args())